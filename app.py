@@ -4,14 +4,38 @@ MySQL 数据库互导程序 - Flask 后端主程序
 """
 
 import os
+import asyncio
+import gzip
+import itertools
 import json
+import operator
+import queue
+import shutil
 import threading
 import time
-from datetime import datetime
-from flask import Flask, render_template, request, jsonify
+import uuid
+from datetime import datetime, timedelta
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context
 import mysql.connector
 from mysql.connector import Error
-from config import SOURCE_DB, TARGET_DB, PAGE_SIZE, LOG_FILE, DEBUG, SECRET_KEY, IMPORT_MODES
+try:
+    from pymysqlreplication import BinLogStreamReader
+    from pymysqlreplication.event import HeartbeatLogEvent
+    from pymysqlreplication.row_event import WriteRowsEvent, UpdateRowsEvent, DeleteRowsEvent
+except ImportError:
+    BinLogStreamReader = None  # 未安装 mysql-replication 时不能使用 binlog 复制
+try:
+    import aiomysql
+except ImportError:
+    aiomysql = None  # 未安装 aiomysql 时不能使用 async 导入引擎
+from config import (SOURCE_DB, TARGET_DB, PAGE_SIZE, ADAPTIVE_PAGE_SIZE, PAGE_SIZE_MIN, PAGE_SIZE_MAX,
+                    STREAM_BUFFER_ROWS, PARALLEL_WORKERS, ASYNC_CONCURRENCY, PIPELINE_QUEUE_PAGES, PIPELINE_WRITERS,
+                    MULTI_ROW_MAX_BYTES, COMMIT_POLICY, COMMIT_ROWS, COMMIT_SECONDS, BULK_SESSION, ISOLATE_ERRORS,
+                    QUARANTINE_DIR, QUARANTINE_MAX_ROWS, LOAD_DATA_DIR, SERVER_COPY, SERVER_COPY_CHUNK_ROWS, POOL_SIZE,
+                    POOL_TIMEOUT, SCHEMA_CACHE_TTL, MAX_CONCURRENT_JOBS, MAX_JOBS_PER_SOURCE, MAX_JOBS_PER_TARGET,
+                    CHECKPOINT_DIR, REPLICATION_SERVER_ID, REPLICATION_BATCH_ROWS, REPLICATION_FLUSH_SECONDS,
+                    VERIFY_CHUNK_ROWS, VERIFY_MAX_KEYS, BACKUP_CHUNK_ROWS, RESTORE_KEEP_OLD, BACKUP_DIR, BACKUP_WORKERS,
+                    BACKUP_GZIP_LEVEL, LOG_FILE, LOG_CHUNK_BYTES, JOB_LOG_DIR, DEBUG, SECRET_KEY, IMPORT_MODES)
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = SECRET_KEY
@@ -23,8 +47,11 @@ os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
 # 导入历史记录文件
 HISTORY_FILE = 'logs/import_history.json'
 
-def get_db_connection(db_config):
-    """获取数据库连接"""
+# 增量同步水位文件
+WATERMARK_FILE = 'logs/watermarks.json'
+
+def open_db_connection(db_config):
+    """建立一个新的物理数据库连接"""
     try:
         print(f"尝试连接数据库: {db_config['host']}:{db_config['port']} - {db_config['database']}")
         
@@ -40,14 +67,7 @@ def get_db_connection(db_config):
         })
         
         connection = mysql.connector.connect(**connection_config)
-        
-        # 设置会话参数
-        cursor = connection.cursor()
-        cursor.execute("SET SESSION wait_timeout = 28800")  # 8小时
-        cursor.execute("SET SESSION interactive_timeout = 28800")  # 8小时
-        cursor.execute("SET SESSION net_read_timeout = 600")  # 10分钟读取超时
-        cursor.execute("SET SESSION net_write_timeout = 600")  # 10分钟写入超时
-        cursor.close()
+        init_session(connection)
         
         print(f"数据库连接成功: {db_config['database']}")
         return connection
@@ -56,6 +76,203 @@ def get_db_connection(db_config):
         print(f"连接配置: host={db_config['host']}, port={db_config['port']}, user={db_config['user']}, database={db_config['database']}")
         return None
 
+# 连接池：按数据库配置区分，每个物理连接只在建立时设置一次会话参数
+CONNECTION_POOLS = {}
+CONNECTION_POOLS_LOCK = threading.Lock()
+
+class PooledConnection:
+    """从连接池借出的连接，close() 时归还连接池而不是断开，其余属性透传给物理连接"""
+    
+    def __init__(self, pool, connection):
+        self._pool = pool
+        self._connection = connection
+    
+    def __getattr__(self, name):
+        if self._connection is None:
+            raise Error("连接已归还连接池")
+        return getattr(self._connection, name)
+    
+    def close(self):
+        if self._connection is not None:
+            release_pooled_connection(self._pool, self._connection)
+            self._connection = None
+    
+    def discard(self):
+        """断开物理连接并从连接池移除，用于会话状态无法恢复的连接"""
+        if self._connection is not None:
+            release_pooled_connection(self._pool, self._connection, reusable=False)
+            self._connection = None
+    
+    def __del__(self):
+        # 调用方遗漏 close() 时兜底归还，避免连接池被耗尽
+        try:
+            self.close()
+        except Exception:
+            pass
+
+def get_pool_key(db_config):
+    """连接池键：配置内容完全相同的连接共用一个池"""
+    return json.dumps(db_config, sort_keys=True, default=str)
+
+def get_connection_pool(db_config):
+    """获取（必要时创建）数据库配置对应的连接池"""
+    key = get_pool_key(db_config)
+    with CONNECTION_POOLS_LOCK:
+        pool = CONNECTION_POOLS.get(key)
+        if pool is None:
+            pool = {
+                'name': f"{db_config.get('user')}@{db_config.get('host')}:{db_config.get('port')}/{db_config.get('database')}",
+                'config': dict(db_config),
+                'size': POOL_SIZE,
+                'idle': [],
+                'created': 0,
+                'in_use': 0,
+                'waits': 0,
+                'checkouts': 0,
+                'checkout_seconds': 0.0,
+                'max_checkout_seconds': 0.0,
+                'health_check_failures': 0,
+                'retired': False,
+                'condition': threading.Condition()
+            }
+            CONNECTION_POOLS[key] = pool
+        return pool
+
+def get_db_connection(db_config):
+    """从连接池获取数据库连接，借出前做健康检查；连接池耗尽时等待 POOL_TIMEOUT 秒"""
+    pool = get_connection_pool(db_config)
+    started = time.time()
+    connection = None
+    waited = False
+    
+    with pool['condition']:
+        while True:
+            if pool['idle']:
+                connection = pool['idle'].pop()
+                break
+            if pool['created'] < pool['size']:
+                pool['created'] += 1
+                break
+            remaining = POOL_TIMEOUT - (time.time() - started)
+            if remaining <= 0:
+                print(f"连接池已满，等待超时: {pool['name']}")
+                return None
+            if not waited:
+                pool['waits'] += 1
+                waited = True
+            pool['condition'].wait(remaining)
+        pool['in_use'] += 1
+    
+    # 健康检查：空闲连接可能已被服务器断开，失效则换一个新连接
+    if connection is not None:
+        try:
+            connection.ping(reconnect=False)
+        except Error as e:
+            print(f"连接池健康检查失败，重新建立连接: {e}")
+            with pool['condition']:
+                pool['health_check_failures'] += 1
+            close_quietly(connection)
+            connection = None
+    
+    if connection is None:
+        connection = open_db_connection(pool['config'])
+        if connection is None:
+            with pool['condition']:
+                pool['created'] -= 1
+                pool['in_use'] -= 1
+                pool['condition'].notify()
+            return None
+    
+    elapsed = time.time() - started
+    with pool['condition']:
+        pool['checkouts'] += 1
+        pool['checkout_seconds'] += elapsed
+        pool['max_checkout_seconds'] = max(pool['max_checkout_seconds'], elapsed)
+    
+    return PooledConnection(pool, connection)
+
+def release_pooled_connection(pool, connection, reusable=True):
+    """归还连接：回滚未提交事务；连接已失效、还有未读结果、reusable 为 False 或连接池已重建时直接关闭
+    
+    未读结果只会来自中途放弃的无缓冲游标（如失败的流式导入），剩余数据量可能是整个表，
+    读完再归还代价太大，直接关闭物理连接。
+    """
+    if reusable:
+        try:
+            if connection.unread_result:
+                reusable = False
+            else:
+                connection.rollback()
+        except Error:
+            reusable = False
+    
+    with pool['condition']:
+        pool['in_use'] -= 1
+        if reusable and not pool['retired']:
+            pool['idle'].append(connection)
+            connection = None
+        else:
+            pool['created'] -= 1
+        pool['condition'].notify()
+    
+    if connection is not None:
+        close_quietly(connection)
+
+def close_quietly(connection):
+    """关闭物理连接，忽略错误"""
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+def reset_connection_pools():
+    """数据库配置变更后重建连接池：关闭空闲连接，借出中的连接归还时关闭"""
+    with CONNECTION_POOLS_LOCK:
+        pools = list(CONNECTION_POOLS.values())
+        CONNECTION_POOLS.clear()
+    
+    for pool in pools:
+        with pool['condition']:
+            pool['retired'] = True
+            idle = pool['idle']
+            pool['idle'] = []
+            pool['created'] -= len(idle)
+            pool['condition'].notify_all()
+        for connection in idle:
+            close_quietly(connection)
+
+def get_pool_stats():
+    """连接池统计：容量、已建立、借出、空闲、等待次数和借出耗时"""
+    with CONNECTION_POOLS_LOCK:
+        pools = list(CONNECTION_POOLS.values())
+    
+    stats = []
+    for pool in pools:
+        with pool['condition']:
+            checkouts = pool['checkouts']
+            stats.append({
+                'name': pool['name'],
+                'size': pool['size'],
+                'created': pool['created'],
+                'in_use': pool['in_use'],
+                'idle': len(pool['idle']),
+                'waits': pool['waits'],
+                'checkouts': checkouts,
+                'health_check_failures': pool['health_check_failures'],
+                'avg_checkout_ms': round(pool['checkout_seconds'] / checkouts * 1000, 2) if checkouts else 0,
+                'max_checkout_ms': round(pool['max_checkout_seconds'] * 1000, 2)
+            })
+    return stats
+
+def init_session(connection):
+    """设置会话参数（新建连接或断线重连后调用）"""
+    cursor = connection.cursor()
+    cursor.execute("SET SESSION wait_timeout = 28800")  # 8小时
+    cursor.execute("SET SESSION interactive_timeout = 28800")  # 8小时
+    cursor.execute("SET SESSION net_read_timeout = 600")  # 10分钟读取超时
+    cursor.execute("SET SESSION net_write_timeout = 600")  # 10分钟写入超时
+    cursor.close()
+
 def get_tables(connection):
     """获取数据库中的所有表"""
     try:
@@ -222,64 +439,3534 @@ def get_table_fields(connection, table_name):
         print(f"获取字段信息错误: {e}")
         return []
 
-def write_log(message):
-    """写入日志文件"""
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    log_message = f"[{timestamp}] {message}\n"
+def get_pagination_key(connection, table_name):
+    """获取键集分页使用的字段列表（优先主键，其次非空唯一索引），无可用键时返回空列表"""
+    fields = get_table_fields(connection, table_name)
+    key_columns = [field['name'] for field in fields if field['key'] == 'PRI']
+    
+    if len(key_columns) > 1:
+        # 复合主键按索引中的列顺序排列，保证 ORDER BY 能走主键索引
+        try:
+            cursor = connection.cursor()
+            cursor.execute(f"SHOW INDEX FROM `{table_name}` WHERE Key_name = 'PRIMARY'")
+            index_rows = cursor.fetchall()
+            column_index = [desc[0] for desc in cursor.description].index('Column_name')
+            seq_index = [desc[0] for desc in cursor.description].index('Seq_in_index')
+            cursor.close()
+            key_columns = [row[column_index] for row in sorted(index_rows, key=lambda row: row[seq_index])]
+        except Error as e:
+            print(f"获取主键索引顺序错误: {e}")
+    
+    if key_columns:
+        return key_columns
+    
+    # 没有主键时使用单列非空唯一索引（DESCRIBE 中 UNI 仅标记单列唯一索引）
+    for field in fields:
+        if field['key'] == 'UNI' and field['null'] == 'NO':
+            return [field['name']]
+    
+    return []
+
+def get_filter_sql(source_filter):
+    """源表过滤条件的 SQL 片段和参数，没有过滤条件时返回 (None, ())"""
+    if not source_filter:
+        return None, ()
+    return source_filter['sql'], tuple(source_filter['params'])
+
+def combine_filters(*source_filters):
+    """用 AND 合并多个过滤条件（如水位条件和用户条件），都为空时返回 None"""
+    source_filters = [item for item in source_filters if item]
+    if len(source_filters) <= 1:
+        return source_filters[0] if source_filters else None
+    return {
+        'sql': ' AND '.join(f"({item['sql']})" for item in source_filters),
+        'params': [param for item in source_filters for param in item['params']]
+    }
+
+# 用户过滤条件允许的运算符
+FILTER_OPERATORS = ('=', '!=', '<', '<=', '>', '>=', 'LIKE', 'NOT LIKE', 'IN', 'NOT IN', 'BETWEEN',
+                    'IS NULL', 'IS NOT NULL')
+
+def build_user_filter(conditions, source_field_names):
+    """由用户条件构造源表过滤条件，条件不合法时抛出 Error
+    
+    conditions 为 [{'column': 字段, 'op': 运算符, 'value': 值}, ...]，各条件之间为 AND；
+    字段必须是源表中存在的字段，运算符限定为 FILTER_OPERATORS，值全部作为参数传递。
+    """
+    if not conditions:
+        return None
+    if not isinstance(conditions, list):
+        raise Error("过滤条件格式错误，应为条件列表")
+    clauses = []
+    params = []
+    for condition in conditions:
+        if not isinstance(condition, dict):
+            raise Error(f"过滤条件格式错误: {condition}")
+        column = condition.get('column')
+        op = str(condition.get('op') or '=').strip().upper()
+        value = condition.get('value')
+        if column not in source_field_names:
+            raise Error(f"过滤条件中的源字段 {column} 不存在")
+        if op not in FILTER_OPERATORS:
+            raise Error(f"不支持的过滤运算符: {op}，可选: {', '.join(FILTER_OPERATORS)}")
+        
+        if op in ('IS NULL', 'IS NOT NULL'):
+            clauses.append(f"`{column}` {op}")
+        elif op in ('IN', 'NOT IN'):
+            if not isinstance(value, list) or not value:
+                raise Error(f"{column} {op} 需要非空的值列表")
+            clauses.append(f"`{column}` {op} ({', '.join(['%s'] * len(value))})")
+            params.extend(value)
+        elif op == 'BETWEEN':
+            if not isinstance(value, list) or len(value) != 2:
+                raise Error(f"{column} BETWEEN 需要两个值")
+            clauses.append(f"`{column}` BETWEEN %s AND %s")
+            params.extend(value)
+        else:
+            if value is None or isinstance(value, (list, dict)):
+                raise Error(f"{column} {op} 需要一个值（比较 NULL 请使用 IS NULL）")
+            clauses.append(f"`{column}` {op} %s")
+            params.append(value)
+    return {'sql': ' AND '.join(clauses), 'params': params}
+
+def describe_user_filter(conditions):
+    """用户过滤条件的说明文字（用于日志）"""
+    parts = []
+    for condition in conditions or []:
+        op = str(condition.get('op') or '=').strip().upper()
+        parts.append(f"{condition.get('column')} {op}" if 'NULL' in op and 'LIKE' not in op
+                     else f"{condition.get('column')} {op} {condition.get('value')!r}")
+    return ' AND '.join(parts)
+
+def get_source_columns(source_field_names, field_mapping, key_columns=None):
+    """列投影：只读取字段映射用到的源字段和分页键，按源表字段顺序排列
+    
+    映射中引用的源字段不存在时不选取（该目标字段按默认值处理，与转换计划一致）。
+    """
+    needed = set(field_mapping.values()) | set(key_columns or [])
+    return [field for field in source_field_names if field in needed]
+
+def build_select_list(columns):
+    """SELECT 字段列表，未指定列投影时为 *"""
+    return ', '.join(f"`{column}`" for column in columns) if columns else '*'
+
+def build_key_condition(key_columns, comparison):
+    """构造键比较条件，复合键使用行值比较"""
+    if len(key_columns) == 1:
+        return f"`{key_columns[0]}` {comparison} %s"
+    key_list = ', '.join([f"`{column}`" for column in key_columns])
+    return f"({key_list}) {comparison} ({', '.join(['%s'] * len(key_columns))})"
+
+def build_keyset_query(source_table, key_columns, page_size, has_last_key, has_upper_key=False, filter_sql=None,
+                       columns=None):
+    """构造键集分页查询语句，可选地限制在键区间 (last_key, upper_key] 内
+    
+    filter_sql 为附加的过滤条件，columns 为列投影（None 时读取全部字段）。
+    """
+    key_list = ', '.join([f"`{column}`" for column in key_columns])
+    conditions = []
+    if has_last_key:
+        conditions.append(build_key_condition(key_columns, '>'))
+    if has_upper_key:
+        conditions.append(build_key_condition(key_columns, '<='))
+    if filter_sql:
+        conditions.append(f"({filter_sql})")
+    where_clause = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+    return f"SELECT {build_select_list(columns)} FROM `{source_table}`{where_clause} ORDER BY {key_list} LIMIT {page_size}"
+
+def iter_source_pages(source_cursor, source_table, page_size, total_pages, key_columns=None, max_retries=3,
+                      start_key=None, upper_key=None, log_pages=True, job=None, start_page=0, source_filter=None,
+                      page_size_controller=None, columns=None):
+    """分页读取源表数据
+    
+    有可用键时按 WHERE key > last_seen ORDER BY key LIMIT n 逐页推进，
+    每页只扫描本页数据；没有可用键时回退到 LIMIT/OFFSET 分页。
+    start_key / upper_key 把读取范围限制在键区间 (start_key, upper_key] 内；
+    从断点继续时，键集分页从 start_key 之后读取，OFFSET 分页从第 start_page 页读取。
+    source_filter 为附加的过滤条件（如增量同步的水位条件、用户过滤条件），columns 为列投影。
+    传入 page_size_controller 时（仅键集分页）每页的记录数取自控制器的当前值。
+    依次返回 (页码, 本页数据)，读取进度记入 job。
+    """
+    page = start_page
+    last_key = tuple(start_key) if start_key is not None else None
+    key_indexes = None
+    filter_sql, filter_params = get_filter_sql(source_filter)
+    
+    while True:
+        if page_size_controller and key_columns:
+            page_size = page_size_controller['size']
+            if log_pages:
+                write_log(f"正在导入第 {page + 1} 页（每页 {page_size} 条）...")
+        elif log_pages:
+            display_total = max(total_pages, page + 1)
+            progress_percent = int((page / display_total) * 100)
+            write_log(f"正在导入第 {page + 1}/{display_total} 页... (进度: {progress_percent}%)")
+        
+        if key_columns:
+            sql = build_keyset_query(source_table, key_columns, page_size, last_key is not None, upper_key is not None,
+                                     filter_sql, columns)
+            params = (last_key or ()) + (tuple(upper_key) if upper_key is not None else ()) + filter_params
+        else:
+            where_clause = f" WHERE {filter_sql}" if filter_sql else ''
+            sql = (f"SELECT {build_select_list(columns)} FROM `{source_table}`{where_clause} "
+                   f"LIMIT {page_size} OFFSET {page * page_size}")
+            params = filter_params
+        
+        # 重试机制
+        for retry in range(max_retries):
+            try:
+                source_cursor.execute(sql, params or None)
+                source_data = source_cursor.fetchall()
+                break  # 成功则跳出重试循环
+            except Error as e:
+                if retry < max_retries - 1:
+                    write_log(f"第 {page + 1} 页查询失败，重试 {retry + 1}/{max_retries}: {e}")
+                    add_job_progress(job, retries=1)
+                    record_job_error(job, f"第 {page + 1} 页查询失败: {e}")
+                    time.sleep(2)  # 等待2秒后重试
+                    continue
+                else:
+                    raise e  # 最后一次重试失败，抛出异常
+        
+        if not source_data:
+            return
+        
+        if key_columns:
+            # 记录本页最后一行的键值，作为下一页的起点
+            if key_indexes is None:
+                column_names = [desc[0] for desc in source_cursor.description]
+                key_indexes = [column_names.index(column) for column in key_columns]
+            last_row = source_data[-1]
+            last_key = tuple(last_row[index] for index in key_indexes)
+            update_job(job, current_key=[str(value) for value in last_key])
+        
+        add_job_progress(job, pages_read=1, rows_read=len(source_data))
+        yield page, source_data
+        
+        if len(source_data) < page_size:
+            return
+        page += 1
+
+def split_key_ranges(connection, table_name, key_columns, total_records, chunk_count, source_filter=None):
+    """把源表按分页键切分为互不重叠的键区间
+    
+    返回 [(下界(不含), 上界(含)), ...]，None 表示不设边界，首尾区间不设边界以覆盖全部数据。
+    单列整数键按 MIN/MAX 等宽切分；其他键沿索引按行数采样边界（只扫描键列）。
+    total_records 和边界都只统计满足 source_filter 的记录。
+    """
+    if chunk_count <= 1 or total_records == 0:
+        return [(None, None)]
+    
+    cursor = connection.cursor()
+    key_list = ', '.join([f"`{column}`" for column in key_columns])
+    filter_sql, filter_params = get_filter_sql(source_filter)
+    boundaries = []
+    
+    if len(key_columns) == 1:
+        where_clause = f" WHERE {filter_sql}" if filter_sql else ''
+        cursor.execute(f"SELECT MIN({key_list}), MAX({key_list}) FROM `{table_name}`{where_clause}", filter_params or None)
+        min_key, max_key = cursor.fetchone()
+        if isinstance(min_key, int) and isinstance(max_key, int):
+            step = (max_key - min_key) // chunk_count + 1
+            boundaries = [(min_key + step * i - 1,) for i in range(1, chunk_count) if min_key + step * i - 1 < max_key]
+            cursor.close()
+            return build_key_ranges(boundaries)
+    
+    # 按索引顺序采样：每次从上一个边界向后跳过 step 行取下一个边界
+    step = (total_records + chunk_count - 1) // chunk_count
+    last_key = None
+    for _ in range(chunk_count - 1):
+        conditions = [build_key_condition(key_columns, '>')] if last_key else []
+        if filter_sql:
+            conditions.append(f"({filter_sql})")
+        where_clause = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+        cursor.execute(f"SELECT {key_list} FROM `{table_name}`{where_clause} ORDER BY {key_list} LIMIT 1 OFFSET {step - 1}",
+                       ((last_key or ()) + filter_params) or None)
+        row = cursor.fetchone()
+        if not row:
+            break
+        last_key = tuple(row)
+        boundaries.append(last_key)
+    cursor.close()
+    return build_key_ranges(boundaries)
+
+def build_key_ranges(boundaries):
+    """由有序的边界键列表生成首尾相接的键区间"""
+    lower_keys = [None] + boundaries
+    upper_keys = boundaries + [None]
+    return list(zip(lower_keys, upper_keys))
+
+def prepare_key_chunks(source_table, key_columns, total_records, chunk_count, checkpoint=None, source_filter=None):
+    """切分源表键区间，返回区间列表 [{'lower', 'upper', 'last_key', 'done'}, ...]
+    
+    区间划分记入检查点；检查点中已有区间划分时（从断点继续）沿用原区间。
+    """
+    if checkpoint and checkpoint['chunks']:
+        chunks = checkpoint['chunks']
+        write_log(f"从检查点继续，剩余 {sum(1 for chunk in chunks if not chunk['done'])}/{len(chunks)} 个键区间")
+        return chunks
+    
+    source_conn = get_db_connection(SOURCE_DB)
+    if not source_conn:
+        raise Error("源数据库连接失败，无法切分键区间")
     try:
-        with open(LOG_FILE, 'a', encoding='utf-8') as f:
-            f.write(log_message)
-    except Exception as e:
-        print(f"写入日志错误: {e}")
+        key_ranges = split_key_ranges(source_conn, source_table, key_columns, total_records, chunk_count, source_filter)
+    finally:
+        source_conn.close()
+    chunks = [{'lower': encode_checkpoint_key(lower_key), 'upper': encode_checkpoint_key(upper_key),
+               'last_key': None, 'done': False} for lower_key, upper_key in key_ranges]
+    if checkpoint is not None:
+        checkpoint['chunks'] = chunks
+        save_checkpoint(checkpoint)
+    return chunks
+
+def run_parallel_import(source_table, target_table, target_fields, field_mapping, default_values, import_mode,
+                        write_method, key_columns, page_size, worker_count, total_records, write_stats, max_retries=3,
+                        job=None, checkpoint=None, source_filter=None, commit_policy=None, bulk_session=False,
+                        columns=None, quarantine=None):
+    """多连接并行导入
+    
+    源表按键区间切分后放入队列，每个工作线程使用独立的源库/目标库连接
+    领取区间并在区间内键集分页导入，各区间互不重叠。每个区间结束时提交该区间剩余的记录。
+    区间划分和每个区间已提交的位置记入检查点，从断点继续时沿用原区间、跳过已完成的区间。
+    返回本次导入记录数，各线程的写入统计累加到 write_stats。
+    """
+    # 区间数多于线程数，避免数据分布不均时个别线程拖慢整体
+    chunks = prepare_key_chunks(source_table, key_columns, total_records, worker_count * 4, checkpoint, source_filter)
+    write_log(f"源表已切分为 {len(chunks)} 个键区间，使用 {worker_count} 个并行线程导入")
+    update_job(job, total_chunks=len(chunks), chunks_done=sum(1 for chunk in chunks if chunk['done']))
+    
+    chunk_queue = queue.Queue()
+    for chunk_index, chunk in enumerate(chunks):
+        if not chunk['done']:
+            chunk_queue.put((chunk_index, chunk))
+    
+    start_records = checkpoint['rows_done'] if checkpoint else 0
+    progress = {'imported': start_records, 'chunks_done': sum(1 for chunk in chunks if chunk['done']), 'errors': []}
+    progress_lock = threading.Lock()
+    stop_event = threading.Event()
+    log_file = get_current_log_file()
+    
+    def worker():
+        bind_job_log(log_file)
+        worker_source = get_db_connection(SOURCE_DB)
+        worker_target = get_db_connection(get_target_db_config(import_mode))
+        writer = None
+        try:
+            if not worker_source or not worker_target:
+                raise Error("并行导入线程数据库连接失败")
+            
+            source_cursor = worker_source.cursor()
+            writer = create_batch_writer(worker_target, target_table, target_fields, import_mode, write_method, job,
+                                         commit_policy, bulk_session, quarantine)
+            mapping_plan = None
+            
+            def commit_chunk_progress(rows, last_key):
+                """提交成功后推进区间在检查点中的位置"""
+                if checkpoint is not None:
+                    with progress_lock:
+                        chunk['last_key'] = last_key
+                        checkpoint['rows_done'] += rows
+                        save_checkpoint(checkpoint)
+            
+            while not stop_event.is_set():
+                try:
+                    chunk_index, chunk = chunk_queue.get_nowait()
+                except queue.Empty:
+                    return
+                
+                # 区间内已提交过的部分从检查点记录的位置之后继续
+                lower_key = decode_checkpoint_key(chunk['last_key'] or chunk['lower'])
+                upper_key = decode_checkpoint_key(chunk['upper'])
+                chunk_records = 0
+                pending_rows = 0
+                pending_key = None
+                pages = iter_source_pages(source_cursor, source_table, page_size, 0, key_columns, max_retries,
+                                          start_key=lower_key, upper_key=upper_key, log_pages=False, job=job,
+                                          source_filter=source_filter, columns=columns)
+                for page, source_data in pages:
+                    if stop_event.is_set():
+                        return
+                    if mapping_plan is None:
+                        source_fields = [desc[0] for desc in source_cursor.description]
+                        mapping_plan = build_mapping_plan(source_fields, target_fields, field_mapping, default_values)
+                        key_indexes = [source_fields.index(column) for column in key_columns]
+                    
+                    converted_data = apply_mapping_plan(mapping_plan, source_data)
+                    label = f"第 {chunk_index + 1} 块第 {page + 1} 页"
+                    committed = write_batch(writer, converted_data, label, max_retries)
+                    chunk_records += len(converted_data)
+                    pending_rows += len(converted_data)
+                    pending_key = encode_checkpoint_key([source_data[-1][index] for index in key_indexes])
+                    with progress_lock:
+                        progress['imported'] += len(converted_data)
+                    if committed:
+                        commit_chunk_progress(pending_rows, pending_key)
+                        pending_rows = 0
+                
+                if flush_batch_writer(writer, f"第 {chunk_index + 1} 块", max_retries):
+                    commit_chunk_progress(pending_rows, pending_key)
+                
+                with progress_lock:
+                    chunk['done'] = True
+                    if checkpoint is not None:
+                        save_checkpoint(checkpoint)
+                    progress['chunks_done'] += 1
+                    imported = progress['imported']
+                    chunks_done = progress['chunks_done']
+                add_job_progress(job, chunks_done=1)
+                progress_percent = int(imported / total_records * 100) if total_records else 100
+                write_log(f"第 {chunk_index + 1}/{len(chunks)} 块导入完成，共 {chunk_records} 条记录，"
+                          f"已完成 {chunks_done}/{len(chunks)} 块，累计导入 {imported}/{total_records} 条 (进度: {progress_percent}%)")
+        except Exception as e:
+            with progress_lock:
+                progress['errors'].append(e)
+            stop_event.set()
+        finally:
+            if writer:
+                close_batch_writer(writer)
+                with progress_lock:
+                    merge_write_stats(write_stats, writer['stats'])
+            if worker_source:
+                worker_source.close()
+            if worker_target:
+                worker_target.close()
+    
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(min(worker_count, chunk_queue.qsize()))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    if progress['errors']:
+        raise progress['errors'][0]
+    
+    return progress['imported'] - start_records
+
+def get_async_connect_args(db_config):
+    """aiomysql 连接参数"""
+    return {
+        'host': db_config['host'],
+        'port': int(db_config.get('port', 3306)),
+        'user': db_config['user'],
+        'password': db_config['password'],
+        'db': db_config['database'],
+        'charset': db_config.get('charset', 'utf8mb4')
+    }
+
+async def async_fetch_page(pool, sql, params, label, job=None, max_retries=3):
+    """异步查询一页源表数据，返回 (字段名列表, 数据)，失败时重试"""
+    for retry in range(max_retries):
+        try:
+            async with pool.acquire() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(sql, params or None)
+                    return [desc[0] for desc in cursor.description], await cursor.fetchall()
+        except aiomysql.Error as e:
+            if retry >= max_retries - 1:
+                raise
+            write_log(f"{label}查询失败，重试 {retry + 1}/{max_retries}: {e}")
+            add_job_progress(job, retries=1)
+            record_job_error(job, f"{label}查询失败: {e}")
+            await asyncio.sleep(2)
 
-def save_import_history(source_table, target_table, field_mapping, import_mode, status, records_count, duration):
-    """保存导入历史记录"""
+async def async_write_batch(pool, sql_template, rows, label, stats, job=None, max_retries=3):
+    """异步批量写入目标表并提交，失败时回滚重试（aiomysql 的 executemany 会合并为多行 INSERT）"""
+    retry = 0
+    while True:
+        started = time.time()
+        try:
+            async with pool.acquire() as conn:
+                try:
+                    async with conn.cursor() as cursor:
+                        await cursor.executemany(sql_template, rows)
+                    await conn.commit()
+                except aiomysql.Error:
+                    await conn.rollback()
+                    raise
+            stats['statements'] += 1
+            stats['commits'] += 1
+            stats['rows'] += len(rows)
+            stats['bytes'] += sum(map(estimate_row_size, rows))
+            stats['seconds'] += time.time() - started
+            add_job_progress(job, rows_written=len(rows))
+            return
+        except aiomysql.Error as e:
+            retry += 1
+            record_job_error(job, f"{label}插入失败: {e}")
+            if not is_transient_error(e):
+                write_log(f"{label}插入失败（数据或约束错误，重试不会成功）: {e}")
+                raise
+            if retry >= max_retries:
+                write_log(f"{label}插入最终失败: {e}")
+                raise
+            add_job_progress(job, retries=1)
+            write_log(f"{label}插入失败，重试 {retry}/{max_retries}: {e}")
+            await asyncio.sleep(2)
+
+async def async_import_chunks(chunks, source_table, target_table, target_fields, field_mapping, default_values,
+                              import_mode, key_columns, page_size, concurrency, total_records, write_stats,
+                              max_retries=3, job=None, checkpoint=None, source_filter=None, columns=None):
+    """在一个事件循环中同时处理 concurrency 个键区间，返回本次导入记录数"""
+    target_fields_str = ', '.join([f"`{field}`" for field in target_fields])
+    verb = 'REPLACE' if is_overwrite_mode(import_mode) else 'INSERT IGNORE'
+    sql_template = f"{verb} INTO `{target_table}` ({target_fields_str}) VALUES ({', '.join(['%s'] * len(target_fields))})"
+    filter_sql, filter_params = get_filter_sql(source_filter)
+    
+    pending = [(chunk_index, chunk) for chunk_index, chunk in enumerate(chunks) if not chunk['done']]
+    start_records = checkpoint['rows_done'] if checkpoint else 0
+    progress = {'imported': start_records, 'chunks_done': len(chunks) - len(pending), 'plan': None, 'key_indexes': None,
+                'failed': False}
+    stats = new_write_stats()
+    
+    source_pool = await aiomysql.create_pool(minsize=1, maxsize=concurrency, **get_async_connect_args(SOURCE_DB))
+    target_pool = await aiomysql.create_pool(minsize=1, maxsize=concurrency, autocommit=False,
+                                             **get_async_connect_args(get_target_db_config(import_mode)))
+    
+    async def import_chunk(chunk_index, chunk):
+        last_key = decode_checkpoint_key(chunk['last_key'] or chunk['lower'])
+        upper_key = decode_checkpoint_key(chunk['upper'])
+        page = 0
+        while not progress['failed']:
+            sql = build_keyset_query(source_table, key_columns, page_size, last_key is not None, upper_key is not None,
+                                     filter_sql, columns)
+            params = (last_key or ()) + (tuple(upper_key) if upper_key is not None else ()) + filter_params
+            label = f"第 {chunk_index + 1} 块第 {page + 1} 页"
+            source_fields, source_data = await async_fetch_page(source_pool, sql, params, label, job, max_retries)
+            if not source_data:
+                break
+            add_job_progress(job, pages_read=1, rows_read=len(source_data))
+            
+            if progress['plan'] is None:
+                progress['plan'] = build_mapping_plan(source_fields, target_fields, field_mapping, default_values)
+                progress['key_indexes'] = [source_fields.index(column) for column in key_columns]
+            last_key = tuple(source_data[-1][index] for index in progress['key_indexes'])
+            update_job(job, current_key=[str(value) for value in last_key])
+            
+            converted_data = apply_mapping_plan(progress['plan'], source_data)
+            await async_write_batch(target_pool, sql_template, converted_data, label, stats, job, max_retries)
+            progress['imported'] += len(converted_data)
+            if checkpoint is not None:
+                chunk['last_key'] = encode_checkpoint_key(last_key)
+                checkpoint['rows_done'] += len(converted_data)
+                save_checkpoint(checkpoint)
+            
+            if len(source_data) < page_size:
+                break
+            page += 1
+        
+        if progress['failed']:
+            return
+        chunk['done'] = True
+        if checkpoint is not None:
+            save_checkpoint(checkpoint)
+        progress['chunks_done'] += 1
+        add_job_progress(job, chunks_done=1)
+        progress_percent = int(progress['imported'] / total_records * 100) if total_records else 100
+        write_log(f"第 {chunk_index + 1}/{len(chunks)} 块导入完成，已完成 {progress['chunks_done']}/{len(chunks)} 块，"
+                  f"累计导入 {progress['imported']}/{total_records} 条 (进度: {progress_percent}%)")
+    
+    async def worker():
+        # 所有协程在同一线程中运行，从共享列表领取区间不需要加锁
+        while pending and not progress['failed']:
+            chunk_index, chunk = pending.pop(0)
+            try:
+                await import_chunk(chunk_index, chunk)
+            except Exception:
+                progress['failed'] = True
+                raise
+    
     try:
-        history_entry = {
-            'timestamp': datetime.now().isoformat(),
-            'source_table': source_table,
-            'target_table': target_table,
-            'field_mapping': field_mapping,
-            'import_mode': import_mode,
-            'status': status,
-            'records_count': records_count,
-            'duration': duration
-        }
+        results = await asyncio.gather(*[worker() for _ in range(min(concurrency, len(pending)))], return_exceptions=True)
+    finally:
+        merge_write_stats(write_stats, stats)
+        for pool in (source_pool, target_pool):
+            pool.close()
+            await pool.wait_closed()
+    
+    errors = [result for result in results if isinstance(result, Exception)]
+    if errors:
+        # 转换为 mysql.connector 的 Error，由导入线程统一处理（保存检查点、记录历史）
+        raise Error(str(errors[0])) from errors[0]
+    return progress['imported'] - start_records
+
+def run_async_import(source_table, target_table, target_fields, field_mapping, default_values, import_mode, key_columns,
+                     page_size, concurrency, total_records, write_stats, max_retries=3, job=None, checkpoint=None,
+                     source_filter=None, columns=None):
+    """异步导入：源表按键区间切分，在导入线程内运行事件循环，用 aiomysql 同时保持 concurrency 个区间的读写在途
+    
+    与 parallel 引擎的区间划分、检查点格式和字段映射规则相同，但只占用一个线程；
+    源库、目标库各使用一个最多 concurrency 个连接的 aiomysql 连接池（不占用 POOL_SIZE 连接池）。
+    返回本次导入记录数，写入统计累加到 write_stats。
+    """
+    chunks = prepare_key_chunks(source_table, key_columns, total_records, concurrency * 4, checkpoint, source_filter)
+    write_log(f"源表已切分为 {len(chunks)} 个键区间，异步导入，同时处理 {concurrency} 个区间")
+    update_job(job, total_chunks=len(chunks), chunks_done=sum(1 for chunk in chunks if chunk['done']))
+    return asyncio.run(async_import_chunks(chunks, source_table, target_table, target_fields, field_mapping,
+                                           default_values, import_mode, key_columns, page_size, concurrency,
+                                           total_records, write_stats, max_retries, job, checkpoint, source_filter,
+                                           columns))
+
+def is_same_server(source_conn, target_conn):
+    """源库和目标库是否在同一个 MySQL 实例上（比较 @@server_uuid，不支持时比较主机和端口）"""
+    try:
+        server_uuids = []
+        for connection in (source_conn, target_conn):
+            cursor = connection.cursor()
+            cursor.execute("SELECT @@server_uuid")
+            server_uuids.append(cursor.fetchone()[0])
+            cursor.close()
+        return server_uuids[0] == server_uuids[1]
+    except Error:
+        local_hosts = ('localhost', '127.0.0.1', '::1')
+        def address(db_config):
+            host = 'localhost' if db_config['host'] in local_hosts else db_config['host']
+            return host, int(db_config.get('port', 3306))
+        return address(SOURCE_DB) == address(TARGET_DB)
+
+def choose_server_copy(options, import_mode, source_conn, target_conn, source_table, target_table, key_columns):
+    """判断导入任务能否使用同服务器复制
+    
+    需要同一 MySQL 实例、源表有分页键（按键分块）、源表和目标表不是同一张表，且目标库账号能读取源表。
+    options['server_copy'] 为 False 时不使用；不指定时取 SERVER_COPY，且只在调用方没有指定导入引擎、
+    写入方式，也没有选择 LOAD DATA 导入模式时自动使用。
+    """
+    server_copy = options.get('server_copy')
+    explicit = server_copy is not None
+    if not explicit:
+        server_copy = SERVER_COPY and not (options.get('engine') or options.get('write_method') or
+                                           is_load_data_mode(import_mode))
+    if not server_copy:
+        return False
+    if SOURCE_DB['database'] == TARGET_DB['database'] and source_table == target_table:
+        write_log("源表和目标表是同一张表，不使用同服务器复制")
+        return False
+    if not key_columns:
+        if explicit:
+            write_log("源表没有主键或非空唯一索引，不能按键分块，不使用同服务器复制")
+        return False
+    if not is_same_server(source_conn, target_conn):
+        if explicit:
+            write_log("源库和目标库不在同一 MySQL 实例上，不使用同服务器复制")
+        return False
+    
+    # 复制语句在目标库连接上执行，需要目标库账号有源表的 SELECT 权限
+    cursor = target_conn.cursor()
+    try:
+        cursor.execute(f"SELECT 1 FROM `{SOURCE_DB['database']}`.`{source_table}` LIMIT 0")
+        cursor.fetchall()
+    except Error as e:
+        write_log(f"目标库账号无法读取源表，不使用同服务器复制: {e}")
+        return False
+    finally:
+        cursor.close()
+        # 目标库连接不是自动提交，探测查询会开启事务；事务中不能再设置 sql_log_bin，
+        # 这里结束事务，后面 apply_bulk_session 才能修改会话变量
+        target_conn.rollback()
+    return True
+
+def build_server_copy_statement(source_table, target_table, target_fields, field_mapping, default_values,
+                                source_field_names, import_mode, key_columns, has_last_key, filter_sql=None):
+    """构造按键区间 (last_key, upper_key] 复制的 INSERT ... SELECT 语句，返回 (语句, 默认值参数)
+    
+    字段映射规则与转换计划一致：映射的源字段不存在时使用默认值，默认值作为参数传入 SELECT 列表。
+    """
+    select_items = []
+    constants = []
+    for target_field in target_fields:
+        source_field = field_mapping.get(target_field)
+        if source_field and source_field in source_field_names:
+            select_items.append(f"`{source_field}`")
+        else:
+            select_items.append('%s')
+            constants.append(coerce_default_value(default_values.get(target_field, '')))
+    
+    conditions = [build_key_condition(key_columns, '<=')]
+    if has_last_key:
+        conditions.insert(0, build_key_condition(key_columns, '>'))
+    if filter_sql:
+        conditions.append(f"({filter_sql})")
+    verb = 'REPLACE' if is_overwrite_mode(import_mode) else 'INSERT IGNORE'
+    target_fields_str = ', '.join([f"`{field}`" for field in target_fields])
+    statement = (f"{verb} INTO `{TARGET_DB['database']}`.`{target_table}` ({target_fields_str}) "
+                 f"SELECT {', '.join(select_items)} FROM `{SOURCE_DB['database']}`.`{source_table}` "
+                 f"WHERE {' AND '.join(conditions)}")
+    return statement, tuple(constants)
+
+def run_server_copy(source_conn, target_conn, source_table, target_table, target_fields, field_mapping, default_values,
+                    source_field_names, import_mode, key_columns, chunk_rows, total_records, write_stats, max_retries=3,
+                    job=None, checkpoint=None, start_key=None, source_filter=None):
+    """同服务器复制：按分页键分块执行 INSERT ... SELECT，数据只在 MySQL 服务器内部复制
+    
+    每块先在源库沿索引读取 chunk_rows 个键确定区间上界，再在目标库连接上复制该区间并提交，
+    进度和检查点按块推进。返回本次复制记录数（按源表记录计），写入统计累加到 write_stats。
+    """
+    filter_sql, filter_params = get_filter_sql(source_filter)
+    total_chunks = (total_records + chunk_rows - 1) // chunk_rows
+    update_job(job, total_pages=(checkpoint['pages_done'] if checkpoint else 0) + total_chunks)
+    write_log(f"源库和目标库在同一 MySQL 实例上，使用服务器端 INSERT ... SELECT 复制，每块 {chunk_rows} 条记录")
+    
+    source_cursor = source_conn.cursor()
+    target_cursor = target_conn.cursor()
+    last_key = tuple(start_key) if start_key is not None else None
+    imported_records = 0
+    chunk = 0
+    while True:
+        # 沿分页键索引只读取本块的键，最后一个键为区间上界
+        source_cursor.execute(build_keyset_query(source_table, key_columns, chunk_rows, last_key is not None,
+                                                 filter_sql=filter_sql, columns=key_columns),
+                              ((last_key or ()) + filter_params) or None)
+        keys = source_cursor.fetchall()
+        if not keys:
+            break
+        upper_key = tuple(keys[-1])
+        sql, constants = build_server_copy_statement(source_table, target_table, target_fields, field_mapping,
+                                                     default_values, source_field_names, import_mode, key_columns,
+                                                     last_key is not None, filter_sql)
+        params = constants + (last_key or ()) + upper_key + filter_params
+        label = f"第 {chunk + 1} 块"
         
-        # 读取现有历史记录
-        history = []
-        if os.path.exists(HISTORY_FILE):
-            with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
-                history = json.load(f)
+        retry = 0
+        while True:
+            started = time.time()
+            try:
+                target_cursor.execute(sql, params)
+                target_conn.commit()
+                break
+            except Error as e:
+                try:
+                    target_conn.rollback()
+                except Error:
+                    pass
+                retry += 1
+                record_job_error(job, f"{label}复制失败: {e}")
+                if not is_transient_error(e):
+                    write_log(f"{label}复制失败（数据或约束错误，重试不会成功）: {e}")
+                    raise
+                if retry >= max_retries:
+                    write_log(f"{label}复制最终失败: {e}")
+                    raise
+                add_job_progress(job, retries=1)
+                write_log(f"{label}复制失败，重试 {retry}/{max_retries}: {e}")
+                time.sleep(2)
+                if not target_conn.is_connected():
+                    target_conn.reconnect(attempts=3, delay=2)
+                    init_session(target_conn)
+                    target_cursor = target_conn.cursor()
         
-        # 添加新记录
-        history.insert(0, history_entry)  # 最新的记录在前面
+        write_stats['statements'] += 1
+        write_stats['commits'] += 1
+        write_stats['rows'] += len(keys)
+        write_stats['seconds'] += time.time() - started
+        imported_records += len(keys)
+        last_key = upper_key
+        add_job_progress(job, pages_read=1, rows_read=len(keys), rows_written=len(keys))
+        update_job(job, current_key=[str(value) for value in last_key])
+        if checkpoint is not None:
+            checkpoint['last_key'] = encode_checkpoint_key(last_key)
+            checkpoint['pages_done'] += 1
+            checkpoint['rows_done'] += len(keys)
+            save_checkpoint(checkpoint)
+        
+        progress_percent = int(imported_records / total_records * 100) if total_records else 100
+        write_log(f"{label}复制完成，共 {len(keys)} 条记录，累计复制 {imported_records}/{total_records} 条 "
+                  f"(进度: {min(progress_percent, 100)}%)")
+        chunk += 1
+        if len(keys) < chunk_rows:
+            break
+    
+    source_cursor.close()
+    target_cursor.close()
+    return imported_records
+
+def iter_source_stream(stream_cursor, source_table, buffer_rows, total_batches, job=None, key_columns=None,
+                       start_key=None, start_batch=0, source_filter=None, columns=None):
+    """流式读取源表数据
+    
+    使用无缓冲游标发出一次整表查询，再按 fetchmany 逐批从网络读取，
+    内存中最多只保留 buffer_rows 条源记录。依次返回 (批次号, 本批数据)。
+    有分页键时按键排序读取，使已提交的位置可以记入检查点，从断点继续时从 start_key 之后读取。
+    注意：结果集读完之前该连接不能执行其他查询。
+    """
+    filter_sql, filter_params = get_filter_sql(source_filter)
+    conditions = [f"({filter_sql})"] if filter_sql else []
+    if key_columns:
+        key_list = ', '.join([f"`{column}`" for column in key_columns])
+        if start_key is not None:
+            conditions.insert(0, build_key_condition(key_columns, '>'))
+        where_clause = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+        params = (tuple(start_key) if start_key is not None else ()) + filter_params
+        stream_cursor.execute(f"SELECT {build_select_list(columns)} FROM `{source_table}`{where_clause} ORDER BY {key_list}",
+                              params or None)
+    else:
+        where_clause = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+        stream_cursor.execute(f"SELECT {build_select_list(columns)} FROM `{source_table}`{where_clause}",
+                              filter_params or None)
+    batch = start_batch
+    
+    while True:
+        display_total = max(total_batches, batch + 1)
+        progress_percent = int((batch / display_total) * 100)
+        write_log(f"正在导入第 {batch + 1}/{display_total} 页... (进度: {progress_percent}%)")
         
-        # 只保留最近50条记录
-        history = history[:50]
+        source_data = stream_cursor.fetchmany(buffer_rows)
+        if not source_data:
+            return
         
-        # 保存历史记录
-        with open(HISTORY_FILE, 'w', encoding='utf-8') as f:
-            json.dump(history, f, ensure_ascii=False, indent=2)
-            
+        add_job_progress(job, pages_read=1, rows_read=len(source_data))
+        yield batch, source_data
+        batch += 1
+
+def coerce_default_value(default_value):
+    """把前端传入的默认值字符串转换为写入用的值"""
+    # 如果默认值为空字符串，转换为None（让数据库使用字段默认值）
+    if default_value == '':
+        return None
+    
+    # 尝试转换默认值的类型
+    try:
+        # 如果是数字字符串，转换为数字
+        if default_value.isdigit():
+            return int(default_value)
+        elif default_value.replace('.', '').isdigit():
+            return float(default_value)
+        return default_value
     except Exception as e:
-        print(f"保存导入历史错误: {e}")
+        return default_value
 
-def get_import_history():
-    """获取导入历史记录"""
+def build_mapping_plan(source_fields, target_fields, field_mapping, default_values):
+    """编译行转换计划
+    
+    每个任务只构建一次：预先算好每个目标字段对应的源列下标，默认值只转换一次。
+    常量追加在源行末尾，整行转换只需一次 itemgetter 调用。
+    """
+    source_positions = {field: index for index, field in enumerate(source_fields)}
+    constants = []
+    indexes = []
+    
+    for target_field in target_fields:
+        source_field = field_mapping.get(target_field)
+        if source_field and source_field in source_positions:
+            indexes.append(source_positions[source_field])
+        else:
+            constants.append(coerce_default_value(default_values.get(target_field, '')))
+            indexes.append(len(source_fields) + len(constants) - 1)
+    
+    constants = tuple(constants)
+    getter = operator.itemgetter(*indexes)
+    
+    if len(indexes) == 1:
+        # 单个下标时 itemgetter 返回标量，需要包装成元组
+        if constants:
+            transform_row = lambda row: (constants[0],)
+        else:
+            transform_row = lambda row: (getter(row),)
+    elif constants:
+        transform_row = lambda row: getter(tuple(row) + constants)
+    else:
+        transform_row = getter
+    
+    return {
+        'source_fields': list(source_fields),
+        'target_fields': list(target_fields),
+        'indexes': indexes,
+        'constants': constants,
+        'transform_row': transform_row
+    }
+
+def apply_mapping_plan(plan, source_data):
+    """用编译好的转换计划转换一批源数据"""
+    return list(map(plan['transform_row'], source_data))
+
+def get_max_allowed_packet(connection):
+    """读取服务器的 max_allowed_packet（字节）"""
+    cursor = connection.cursor()
+    cursor.execute("SHOW VARIABLES LIKE 'max_allowed_packet'")
+    row = cursor.fetchone()
+    cursor.close()
+    return int(row[1]) if row else 4 * 1024 * 1024
+
+def estimate_sql_value_size(value):
+    """估算一个参数转义后在 SQL 语句中占用的字节数"""
+    if value is None:
+        return 4
+    if isinstance(value, str):
+        return len(value.encode('utf-8')) + 3
+    if isinstance(value, (bytes, bytearray)):
+        # 二进制数据中需要转义的字节按 1/8 估算
+        return len(value) + len(value) // 8 + 10
+    return len(str(value)) + 2
+
+def estimate_row_size(row):
+    """估算一行 VALUES 元组在 SQL 语句中占用的字节数"""
+    return sum(map(estimate_sql_value_size, row)) + 2 * len(row) + 4
+
+def new_write_stats():
+    """创建写入统计"""
+    return {'statements': 0, 'rows': 0, 'bytes': 0, 'seconds': 0.0, 'commits': 0}
+
+def merge_write_stats(total, part):
+    """把一个写入器的统计累加到任务统计"""
+    for key in total:
+        total[key] += part[key]
+
+def format_write_stats(stats):
+    """格式化写入统计，用于日志"""
+    seconds = stats['seconds'] or 1e-9
+    return (f"{stats['statements']} 条语句，{stats['commits']} 次提交，{stats['bytes'] / 1024 / 1024:.2f} MB，"
+            f"{stats['statements'] / seconds:.1f} 语句/秒，{stats['bytes'] / 1024 / 1024 / seconds:.2f} MB/秒")
+
+def get_commit_policy(options, import_engine):
+    """导入任务的提交策略 {'mode', 'value'}：page 每页提交 / rows 每 N 条 / seconds 每 N 秒 / chunk 每个键区间"""
+    mode = options.get('commit_policy') or COMMIT_POLICY
+    if mode not in COMMIT_POLICIES:
+        raise Error(f"不支持的提交策略: {mode}，可选: {', '.join(COMMIT_POLICIES)}")
+    if mode == 'chunk' and import_engine != 'parallel':
+        write_log("按键区间提交只用于并行导入，改为每页提交")
+        mode = 'page'
+    value = options.get('commit_value') or {'rows': COMMIT_ROWS, 'seconds': COMMIT_SECONDS}.get(mode)
+    return {'mode': mode, 'value': float(value) if value else None}
+
+def format_commit_policy(policy):
+    """提交策略说明文字"""
+    if policy['mode'] == 'rows':
+        return f"每 {int(policy['value'])} 条记录提交一次"
+    if policy['mode'] == 'seconds':
+        return f"每 {policy['value']:g} 秒提交一次"
+    if policy['mode'] == 'chunk':
+        return "每个键区间提交一次"
+    return "每批提交一次"
+
+def apply_bulk_session(connection):
+    """批量加载会话：关闭唯一性检查和外键检查，有权限时不写 binlog，返回修改前的值"""
+    cursor = connection.cursor()
     try:
-        if os.path.exists(HISTORY_FILE):
-            with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return []
+        cursor.execute(f"SELECT {', '.join(f'@@SESSION.{name}' for name in BULK_SESSION_VARIABLES)}")
+        original = dict(zip(BULK_SESSION_VARIABLES, cursor.fetchone()))
+        changed = {}
+        for name in BULK_SESSION_VARIABLES:
+            try:
+                cursor.execute(f"SET SESSION {name} = 0")
+                changed[name] = original[name]
+            except Error as e:
+                # sql_log_bin 需要 SUPER / SYSTEM_VARIABLES_ADMIN 权限，没有权限时保持原值
+                write_log(f"无法设置 {name} = 0，保持原值: {e}")
+    finally:
+        cursor.close()
+    if changed:
+        write_log(f"批量加载会话已启用: {', '.join(f'{name}=0' for name in changed)}")
+    return changed
+
+def restore_session_variables(connection, saved):
+    """恢复 apply_bulk_session 修改前的会话变量，连接归还连接池前调用
+    
+    恢复失败时断开该连接，避免仍关闭着检查的连接回到连接池被其他任务使用。
+    """
+    try:
+        cursor = connection.cursor()
+        try:
+            for name, value in saved.items():
+                cursor.execute(f"SET SESSION {name} = %s", (value,))
+        finally:
+            cursor.close()
+    except Error as e:
+        write_log(f"恢复会话变量失败，断开该连接: {e}")
+        connection.discard()
+
+def create_batch_writer(target_conn, target_table, target_fields, import_mode, write_method='executemany', job=None,
+                        commit_policy=None, bulk_session=False, quarantine=None):
+    """创建目标表批量写入器
+    
+    write_method 为 executemany 时使用连接器的 executemany；为 multi_row 时自行拼装
+    多行 VALUES 语句，按估算字节数切分，单条语句不超过目标库 max_allowed_packet。
+    commit_policy 决定多少数据提交一次（默认每批提交），bulk_session 为 True 时启用批量加载会话，
+    用完后需调用 close_batch_writer 恢复会话变量。传入 quarantine（见 new_quarantine）时开启失败隔离。
+    写入行数和重试次数记入 job。
+    """
+    target_fields_str = ', '.join([f"`{field}`" for field in target_fields])
+    verb = 'REPLACE' if is_overwrite_mode(import_mode) else 'INSERT IGNORE'
+    statement_prefix = f"{verb} INTO `{target_table}` ({target_fields_str}) VALUES "
+    row_placeholder = f"({', '.join(['%s'] * len(target_fields))})"
+    
+    writer = {
+        'conn': target_conn,
+        'cursor': target_conn.cursor(),
+        'method': write_method,
+        'sql_template': statement_prefix + row_placeholder,
+        'statement_prefix': statement_prefix,
+        'row_placeholder': row_placeholder,
+        'max_bytes': 0,
+        'stats': new_write_stats(),
+        'job': job,
+        'commit_policy': commit_policy or {'mode': 'page', 'value': None},
+        'pending': [],  # 已发送、未提交的批次，失败时整体重新发送
+        'pending_rows': 0,
+        'window_started': None,
+        'saved_session': apply_bulk_session(target_conn) if bulk_session else {},
+        'quarantine': quarantine
+    }
+    
+    if is_load_data_mode(import_mode):
+        # LOAD DATA 模式：二进制类型的目标列以十六进制传输，加载时用 UNHEX 还原
+        writer['method'] = 'load_data'
+        binary_fields = {field['name'] for field in get_table_fields(target_conn, target_table)
+                         if field['type'].lower().split('(')[0] in BINARY_COLUMN_TYPES}
+        writer['hex_indexes'] = {index for index, field in enumerate(target_fields) if field in binary_fields}
+        writer['load_data_sql'] = build_load_data_sql(target_table, target_fields, import_mode, writer['hex_indexes'])
+        write_log(f"使用 LOAD DATA LOCAL INFILE 批量加载（{'命名管道' if hasattr(os, 'mkfifo') else '临时文件'}）")
+    elif write_method == 'multi_row':
+        # 预留 10% 余量给估算误差，同时不超过配置的单条语句上限
+        max_packet = get_max_allowed_packet(target_conn)
+        writer['max_bytes'] = min(int(max_packet * 0.9), MULTI_ROW_MAX_BYTES)
+        write_log(f"使用多行 INSERT 写入，max_allowed_packet={max_packet}，单条语句上限 {writer['max_bytes']} 字节")
+    
+    return writer
+
+def close_batch_writer(writer):
+    """回滚未提交的记录并恢复批量加载会话修改的会话变量（连接归还连接池前调用）"""
+    try:
+        if writer['pending']:
+            writer['conn'].rollback()
+    except Error as e:
+        print(f"回滚写入连接错误: {e}")
+    if writer['saved_session']:
+        restore_session_variables(writer['conn'], writer['saved_session'])
+
+def iter_multi_row_statements(writer, rows):
+    """把一批记录按字节上限拆分为多条多行 VALUES 语句，依次返回 (语句, 参数, 估算字节数)"""
+    prefix_size = len(writer['statement_prefix'].encode('utf-8'))
+    statement_rows = []
+    statement_size = prefix_size
+    
+    for row in rows:
+        row_size = estimate_row_size(row)
+        if statement_rows and statement_size + row_size > writer['max_bytes']:
+            yield build_multi_row_statement(writer, statement_rows), [value for r in statement_rows for value in r], statement_size
+            statement_rows = []
+            statement_size = prefix_size
+        statement_rows.append(row)
+        statement_size += row_size
+    
+    if statement_rows:
+        yield build_multi_row_statement(writer, statement_rows), [value for r in statement_rows for value in r], statement_size
+
+def build_multi_row_statement(writer, rows):
+    """拼装多行 VALUES 语句"""
+    return writer['statement_prefix'] + ', '.join([writer['row_placeholder']] * len(rows))
+
+def is_packet_too_large(error):
+    """判断是否为语句超过 max_allowed_packet 的错误"""
+    return getattr(error, 'errno', None) in (1153, 2020) or 'max_allowed_packet' in str(error)
+
+def ensure_writer_connection(writer):
+    """目标库连接断开时重连并恢复会话参数"""
+    if not writer['conn'].is_connected():
+        writer['conn'].reconnect(attempts=3, delay=2)
+        init_session(writer['conn'])
+        if writer['saved_session']:
+            apply_bulk_session(writer['conn'])
+        writer['cursor'] = writer['conn'].cursor()
+
+def is_overwrite_mode(import_mode):
+    """导入模式是否覆盖已存在的记录（REPLACE）"""
+    return import_mode in ('overwrite', 'load_overwrite')
+
+def is_load_data_mode(import_mode):
+    """导入模式是否使用 LOAD DATA LOCAL INFILE"""
+    return import_mode in ('load_overwrite', 'load_insert')
+
+def get_target_db_config(import_mode):
+    """目标库连接配置；LOAD DATA 模式只允许读取本程序临时目录下的文件"""
+    if is_load_data_mode(import_mode):
+        os.makedirs(LOAD_DATA_DIR, exist_ok=True)
+        return dict(TARGET_DB, allow_local_infile_in_path=os.path.abspath(LOAD_DATA_DIR))
+    return TARGET_DB
+
+# 以十六进制传输的二进制列类型
+BINARY_COLUMN_TYPES = {'binary', 'varbinary', 'tinyblob', 'blob', 'mediumblob', 'longblob'}
+
+# LOAD DATA 默认格式（ESCAPED BY '\\'）下需要转义的字节
+LOAD_DATA_ESCAPES = {
+    ord('\\'): b'\\\\',
+    ord('\t'): b'\\t',
+    ord('\n'): b'\\n',
+    ord('\r'): b'\\r',
+    0: b'\\0'
+}
+
+def build_load_data_sql(target_table, target_fields, import_mode, hex_indexes):
+    """构造 LOAD DATA LOCAL INFILE 语句模板（文件路径留空待填）"""
+    columns = []
+    assignments = []
+    for index, field in enumerate(target_fields):
+        if index in hex_indexes:
+            columns.append(f"@hex_{index}")
+            assignments.append(f"`{field}` = UNHEX(@hex_{index})")
+        else:
+            columns.append(f"`{field}`")
+    
+    duplicate = 'REPLACE' if is_overwrite_mode(import_mode) else 'IGNORE'
+    sql = (f"LOAD DATA LOCAL INFILE '{{path}}' {duplicate} INTO TABLE `{target_table}` CHARACTER SET utf8mb4 "
+           f"FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' ({', '.join(columns)})")
+    if assignments:
+        sql += f" SET {', '.join(assignments)}"
+    return sql
+
+def format_load_data_value(value, as_hex=False):
+    """把一个值序列化为 LOAD DATA 文本格式的字节串"""
+    if value is None:
+        return b'\\N'
+    if isinstance(value, (bytes, bytearray)):
+        if as_hex:
+            return value.hex().encode('ascii')
+        data = bytes(value)
+    elif isinstance(value, bool):
+        return b'1' if value else b'0'
+    elif isinstance(value, timedelta):
+        # TIME 列：超过 24 小时时 str(timedelta) 会带上 "x days"
+        seconds = int(value.total_seconds())
+        sign = '-' if seconds < 0 else ''
+        seconds = abs(seconds)
+        data = f"{sign}{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}".encode('ascii')
+    elif isinstance(value, (set, frozenset)):
+        data = ','.join(sorted(value)).encode('utf-8')
+    else:
+        data = str(value).encode('utf-8')
+    
+    if as_hex:
+        return data.hex().encode('ascii')
+    if any(byte in LOAD_DATA_ESCAPES for byte in data):
+        data = b''.join(LOAD_DATA_ESCAPES.get(byte, bytes((byte,))) for byte in data)
+    return data
+
+def iter_load_data_lines(rows, hex_indexes):
+    """逐行生成 LOAD DATA 文本（制表符分隔、换行结尾）"""
+    for row in rows:
+        yield b'\t'.join(format_load_data_value(value, index in hex_indexes) for index, value in enumerate(row)) + b'\n'
+
+def execute_load_data(writer, rows):
+    """把一批记录写入命名管道（不支持时写临时文件）并执行 LOAD DATA LOCAL INFILE，返回传输字节数"""
+    def feed(file_obj):
+        sent = 0
+        for line in iter_load_data_lines(rows, writer['hex_indexes']):
+            file_obj.write(line)
+            sent += len(line)
+        return sent
+    
+    return run_load_data(writer['cursor'], writer['load_data_sql'], feed)
+
+def run_load_data(cursor, load_data_sql, feed):
+    """执行 LOAD DATA LOCAL INFILE，数据由 feed(文件对象) 写入命名管道（不支持时写临时文件），返回 feed 写入的字节数"""
+    os.makedirs(LOAD_DATA_DIR, exist_ok=True)
+    path = os.path.abspath(os.path.join(LOAD_DATA_DIR, f"load_{os.getpid()}_{threading.get_ident()}_{time.time_ns()}.tsv"))
+    sql = load_data_sql.replace('{path}', path.replace('\\', '\\\\').replace("'", "\\'"))
+    sent = {'bytes': 0, 'error': None}
+    
+    if not hasattr(os, 'mkfifo'):
+        try:
+            with open(path, 'wb') as f:
+                sent['bytes'] = feed(f)
+            cursor.execute(sql)
+            return sent['bytes']
+        finally:
+            os.remove(path)
+    
+    # 命名管道：写线程边序列化边写入，服务器边读边加载，数据不落盘
+    os.mkfifo(path, 0o600)
+    
+    def pipe_writer():
+        try:
+            with open(path, 'wb') as f:
+                sent['bytes'] = feed(f)
+        except Exception as e:
+            sent['error'] = e
+    
+    feeder = threading.Thread(target=pipe_writer, daemon=True)
+    feeder.start()
+    try:
+        cursor.execute(sql)
+    finally:
+        if feeder.is_alive():
+            # LOAD DATA 未读完管道就失败时，打开读端并丢弃剩余数据，让写线程结束
+            try:
+                reader_fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+                while feeder.is_alive():
+                    try:
+                        if not os.read(reader_fd, 65536):
+                            feeder.join(timeout=0.01)
+                    except BlockingIOError:
+                        feeder.join(timeout=0.01)
+                os.close(reader_fd)
+            except OSError:
+                pass
+        feeder.join()
+        os.remove(path)
+    
+    if sent['error']:
+        raise Error(f"写入 LOAD DATA 数据管道失败: {sent['error']}")
+    return sent['bytes']
+
+# 自适应页面大小：按每页“读取 + 转换 + 写入”的实测吞吐逐步增大页面，吞吐不再提升时回到最佳大小，
+# 延迟突增、锁等待超时、死锁或语句超过 max_allowed_packet 时减半
+MAX_PAGE_SIZE_HISTORY = 50  # 任务中保留的页面大小调整记录数
+PAGE_SIZE_GROWTH = 1.5  # 吞吐提升时页面放大的倍数
+PAGE_SIZE_SPIKE_RATIO = 3  # 单条记录耗时超过平均值的倍数视为延迟突增
+PAGE_SIZE_HOLD_PAGES = 3  # 减小页面后保持不变的页数，避免立即又放大
+BACKOFF_ERRNOS = {1205, 1213}  # 锁等待超时、死锁
+# 重试可能成功的错误：连接数过多、服务器关闭、锁等待超时、死锁、查询被中断、连接失败/断开、空闲超时被服务器断开
+TRANSIENT_ERRNOS = {1040, 1053, 1205, 1213, 1317, 2003, 2006, 2013, 2055, 4031}
+COMMIT_POLICIES = ('page', 'rows', 'seconds', 'chunk')
+BULK_SESSION_VARIABLES = ('unique_checks', 'foreign_key_checks', 'sql_log_bin')
+
+def new_page_size_controller(initial_size, job=None):
+    """创建页面大小控制器，初始值限制在 PAGE_SIZE_MIN ~ PAGE_SIZE_MAX 之间"""
+    size = min(max(int(initial_size), PAGE_SIZE_MIN), PAGE_SIZE_MAX)
+    controller = {
+        'size': size,
+        'best_size': size,
+        'best_rate': 0,
+        'seconds_per_row': None,
+        'hold_pages': 0,
+        'history': [],
+        'lock': threading.Lock(),
+        'job': job
+    }
+    set_page_size(controller, size, '初始值')
+    return controller
+
+def set_page_size(controller, size, reason):
+    """设置下一页的大小，调整记录写入任务进度（调用方持有锁或尚未共享控制器）"""
+    controller['size'] = size
+    controller['history'].append({'time': datetime.now().isoformat(), 'size': size, 'reason': reason})
+    del controller['history'][:-MAX_PAGE_SIZE_HISTORY]
+    update_job(controller['job'], page_size=size, page_size_history=list(controller['history']))
+    if reason != '初始值':
+        write_log(f"页面大小调整为 {size} 条（{reason}）")
+
+def observe_page(controller, rows, seconds, sent_bytes=0):
+    """记录一页的记录数、读写总耗时和字节数，据此决定下一页的大小"""
+    with controller['lock']:
+        size = controller['size']
+        if rows < size or seconds <= 0:
+            # 不满一页（最后一页或页面刚调整过）的耗时没有可比性
+            return
+        rate = rows / seconds
+        seconds_per_row = seconds / rows
+        average = controller['seconds_per_row']
+        controller['seconds_per_row'] = seconds_per_row if average is None else average * 0.7 + seconds_per_row * 0.3
+        # 最佳吞吐缓慢衰减，数据分布或负载变化后仍会重新尝试更大的页面
+        controller['best_rate'] *= 0.98
+        
+        if average is not None and seconds_per_row > average * PAGE_SIZE_SPIKE_RATIO:
+            new_size = max(size // 2, PAGE_SIZE_MIN)
+            if new_size != size:
+                controller['best_size'] = new_size
+                controller['best_rate'] = 0
+                controller['hold_pages'] = PAGE_SIZE_HOLD_PAGES
+                set_page_size(controller, new_size, f"延迟突增，本页耗时 {seconds:.2f} 秒")
+        elif controller['hold_pages']:
+            controller['hold_pages'] -= 1
+            controller['best_rate'] = max(controller['best_rate'], rate)
+        elif rate > controller['best_rate'] * 1.05:
+            controller['best_rate'] = rate
+            controller['best_size'] = size
+            new_size = min(int(size * PAGE_SIZE_GROWTH), PAGE_SIZE_MAX)
+            if new_size != size:
+                set_page_size(controller, new_size, f"吞吐 {rate:.0f} 条/秒，{sent_bytes / 1024:.0f} KB/页")
+        elif rate < controller['best_rate'] * 0.9 and size != controller['best_size']:
+            set_page_size(controller, controller['best_size'], f"吞吐下降到 {rate:.0f} 条/秒，回到最佳大小")
+
+def back_off_page_size(controller, error):
+    """写入遇到锁等待超时、死锁或语句过大时把页面大小减半，返回是否已调整"""
+    if controller is None or not (getattr(error, 'errno', None) in BACKOFF_ERRNOS or is_packet_too_large(error)):
+        return False
+    with controller['lock']:
+        new_size = max(controller['size'] // 2, PAGE_SIZE_MIN)
+        controller['best_size'] = new_size
+        controller['best_rate'] = 0
+        controller['hold_pages'] = PAGE_SIZE_HOLD_PAGES
+        if new_size == controller['size']:
+            return False
+        set_page_size(controller, new_size, f"写入错误: {error}")
+    return True
+
+def execute_rows(writer, rows):
+    """按写入方式发送一批记录（不提交），返回 (语句数, 估算字节数)"""
+    if writer['method'] == 'load_data':
+        return 1, execute_load_data(writer, rows)
+    if writer['method'] == 'multi_row':
+        statements = 0
+        sent_bytes = 0
+        for statement, params, statement_size in iter_multi_row_statements(writer, rows):
+            writer['cursor'].execute(statement, params)
+            statements += 1
+            sent_bytes += statement_size
+        return statements, sent_bytes
+    writer['cursor'].executemany(writer['sql_template'], rows)
+    return 1, sum(map(estimate_row_size, rows))
+
+def should_commit(writer):
+    """按提交策略判断未提交窗口是否应该提交"""
+    policy = writer['commit_policy']
+    if policy['mode'] == 'rows':
+        return writer['pending_rows'] >= policy['value']
+    if policy['mode'] == 'seconds':
+        return time.time() - writer['window_started'] >= policy['value']
+    if policy['mode'] == 'chunk':
+        return False  # 由调用方在键区间结束时调用 flush_batch_writer
+    return True
+
+def is_transient_error(error):
+    """判断写入错误是否可能在重试后消失，只有连接断开、超时、锁冲突等 TRANSIENT_ERRNOS 中的错误才重试
+    
+    约束冲突、数据不合法，以及没有错误码的连接器错误（mysql-connector 记为 -1，如参数转换失败、
+    不支持的类型）重试也不会成功，按确定性错误处理，交给失败隔离或直接失败。
+    """
+    errno = getattr(error, 'errno', None)
+    if errno in (None, -1) and error.args and isinstance(error.args[0], int):
+        errno = error.args[0]  # aiomysql 的错误码在 args[0]
+    return errno in TRANSIENT_ERRNOS
+
+def new_quarantine(job, target_table, target_fields):
+    """创建任务的隔离文件信息，写入失败的记录逐行追加到 QUARANTINE_DIR/<任务ID>.jsonl"""
+    os.makedirs(QUARANTINE_DIR, exist_ok=True)
+    name = job['job_id'] if job else f"{target_table}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    return {
+        'path': os.path.join(QUARANTINE_DIR, f"{name}.jsonl"),
+        'target_table': target_table,
+        'target_fields': list(target_fields),
+        'rows': 0,
+        'lock': threading.Lock(),
+        'job': job
+    }
+
+def quarantine_rows(quarantine, failed_rows, label):
+    """把写入失败的记录和 MySQL 错误追加到隔离文件"""
+    if not failed_rows:
+        return
+    lines = []
+    for row, error in failed_rows:
+        lines.append(json.dumps({
+            'table': quarantine['target_table'],
+            'batch': label,
+            'errno': getattr(error, 'errno', None),
+            'error': str(error),
+            'row': dict(zip(quarantine['target_fields'], encode_checkpoint_key(row))),
+            'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }, ensure_ascii=False, default=str))
+    with quarantine['lock']:
+        with open(quarantine['path'], 'a', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        quarantine['rows'] += len(failed_rows)
+    add_job_progress(quarantine['job'], rows_quarantined=len(failed_rows))
+
+def write_window_isolated(writer, label):
+    """二分重写未提交窗口：失败的一半继续二分，直到定位到单条失败记录
+    
+    k 条失败记录只需 O(k log n) 条额外语句。确定性错误只回滚出错的语句（InnoDB 语句级回滚），
+    已成功的部分留在事务中；全部发送后提交，失败记录写入隔离文件。
+    临时错误和语句过大错误直接抛出，由 send_window 回滚后整体重试。
+    """
+    started = time.time()
+    failed_rows = []
+    statements = 0
+    sent_bytes = 0
+    parts = [[row for rows in writer['pending'] for row in rows]]
+    while parts:
+        rows = parts.pop()
+        try:
+            part_statements, part_bytes = execute_rows(writer, rows)
+            statements += part_statements
+            sent_bytes += part_bytes
+        except Error as e:
+            if is_transient_error(e) or is_packet_too_large(e):
+                raise
+            statements += 1
+            if len(rows) == 1:
+                failed_rows.append((rows[0], e))
+                continue
+            middle = len(rows) // 2
+            parts.append(rows[middle:])
+            parts.append(rows[:middle])
+    writer['conn'].commit()
+    
+    written = writer['pending_rows'] - len(failed_rows)
+    stats = writer['stats']
+    stats['statements'] += statements
+    stats['bytes'] += sent_bytes
+    stats['seconds'] += time.time() - started
+    stats['commits'] += 1
+    stats['rows'] += written
+    add_job_progress(writer['job'], rows_written=written)
+    write_log(f"{label}二分定位到 {len(failed_rows)} 条失败记录并隔离，其余 {written} 条已写入（{statements} 条语句）")
+    writer['pending'] = []
+    writer['pending_rows'] = 0
+    writer['window_started'] = None
+    quarantine_rows(writer['quarantine'], failed_rows, label)
+
+def send_window(writer, batches, label, max_retries=3, force_commit=False):
+    """发送若干批记录并按提交策略提交，返回是否已提交
+    
+    失败时回滚，整个未提交窗口（writer['pending'] 中的所有批次）重新发送，而不只是最后一批。
+    多行 INSERT 语句超过 max_allowed_packet 时把单条语句字节上限减半后重试，
+    该上限在整个任务内保持，不计入重试次数。
+    只有临时错误（死锁、断线等）等待后重试；确定性错误不重试，开启失败隔离时
+    改为二分重写整个窗口并隔离失败记录（窗口随即提交），否则直接抛出。
+    """
+    retry = 0
+    isolating = False
+    while True:
+        started = time.time()
+        try:
+            if isolating:
+                write_window_isolated(writer, label)
+                break
+            statements = 0
+            sent_bytes = 0
+            for rows in batches:
+                batch_statements, batch_bytes = execute_rows(writer, rows)
+                statements += batch_statements
+                sent_bytes += batch_bytes
+            committed = force_commit or should_commit(writer)
+            if committed:
+                writer['conn'].commit()
+            
+            stats = writer['stats']
+            stats['statements'] += statements
+            stats['bytes'] += sent_bytes
+            stats['seconds'] += time.time() - started
+            if committed:
+                stats['commits'] += 1
+                stats['rows'] += writer['pending_rows']
+                add_job_progress(writer['job'], rows_written=writer['pending_rows'])
+                writer['pending'] = []
+                writer['pending_rows'] = 0
+                writer['window_started'] = None
+            return committed
+        except Error as e:
+            try:
+                writer['conn'].rollback()  # 回滚事务
+            except Error:
+                pass
+            # 自适应页面大小：下一页开始使用更小的页面，本批仍按原大小重试
+            back_off_page_size(writer.get('page_size_controller'), e)
+            # 回滚后之前已发送、未提交的批次也要重新发送
+            batches = list(writer['pending'])
+            
+            if writer['method'] == 'multi_row' and is_packet_too_large(e) and writer['max_bytes'] > 1024:
+                writer['max_bytes'] //= 2
+                write_log(f"{label}语句超过 max_allowed_packet，单条语句上限降为 {writer['max_bytes']} 字节后重试")
+                ensure_writer_connection(writer)
+                continue
+            
+            if not is_transient_error(e) and not isolating:
+                if writer['quarantine'] is not None:
+                    write_log(f"{label}插入失败，二分定位失败记录: {e}")
+                    isolating = True
+                    ensure_writer_connection(writer)
+                    continue
+                record_job_error(writer['job'], f"{label}插入失败: {e}")
+                write_log(f"{label}插入失败（数据或约束错误，重试不会成功）: {e}")
+                raise e
+            
+            retry += 1
+            record_job_error(writer['job'], f"{label}插入失败: {e}")
+            if retry < max_retries:
+                add_job_progress(writer['job'], retries=1)
+                if len(batches) > 1:
+                    write_log(f"{label}插入失败，重新发送未提交的 {len(batches)} 批共 {writer['pending_rows']} 条记录，"
+                              f"重试 {retry}/{max_retries}: {e}")
+                else:
+                    write_log(f"{label}插入失败，重试 {retry}/{max_retries}: {e}")
+                time.sleep(2)  # 等待2秒后重试
+                ensure_writer_connection(writer)
+                continue
+            else:
+                write_log(f"{label}插入最终失败: {e}")
+                raise e  # 最后一次重试失败，抛出异常
+    
+    # 只有隔离后才会执行到这里；隔离的记录过多说明不是个别坏数据（如表结构不匹配），停止导入
+    quarantine = writer['quarantine']
+    if quarantine['rows'] > QUARANTINE_MAX_ROWS:
+        raise Error(f"隔离的失败记录已有 {quarantine['rows']} 条，超过上限 {QUARANTINE_MAX_ROWS}，"
+                    f"停止导入（详见 {quarantine['path']}）")
+    return True
+
+def write_batch(writer, rows, label, max_retries=3):
+    """写入一批记录，按写入器的提交策略决定是否提交，返回是否已提交（之前未提交的批次一并提交）"""
+    writer['pending'].append(rows)
+    writer['pending_rows'] += len(rows)
+    if writer['window_started'] is None:
+        writer['window_started'] = time.time()
+    return send_window(writer, [rows], label, max_retries)
+
+def flush_batch_writer(writer, label, max_retries=3):
+    """提交未提交窗口中的全部记录，返回是否有记录被提交"""
+    if not writer['pending']:
+        return False
+    return send_window(writer, [], label, max_retries, force_commit=True)
+
+def import_source_batches(source_batches, source_cursor, writer, target_fields, field_mapping, default_values,
+                          total_records, max_retries=3, key_columns=None, checkpoint=None, page_size_controller=None):
+    """读取 -> 转换 -> 写入，逐批处理单线程导入，返回本次导入记录数
+    
+    每次提交后把已提交的最后一批末尾的分页键（无分页键时为已完成页数）记入检查点，
+    按写入器的提交策略累积的批次在全部读取完后统一提交。
+    传入 page_size_controller 时把每批读取到写入的总耗时交给控制器调整下一页大小。
+    """
+    imported_records = checkpoint['rows_done'] if checkpoint else 0
+    start_records = imported_records
+    mapping_plan = None
+    key_indexes = []
+    writer['page_size_controller'] = page_size_controller
+    batch_started = time.time()
+    for page, source_data in source_batches:
+        # 首批数据到达时根据源表字段名编译转换计划
+        if mapping_plan is None:
+            source_fields = [desc[0] for desc in source_cursor.description]
+            mapping_plan = build_mapping_plan(source_fields, target_fields, field_mapping, default_values)
+            key_indexes = [source_fields.index(column) for column in key_columns or []]
+        
+        # 转换数据
+        converted_data = apply_mapping_plan(mapping_plan, source_data)
+        
+        # 批量插入目标表 - 添加重试机制
+        if converted_data:
+            sent_bytes = writer['stats']['bytes']
+            committed = write_batch(writer, converted_data, f"第 {page + 1} 页", max_retries)
+            if page_size_controller:
+                observe_page(page_size_controller, len(source_data), time.time() - batch_started,
+                             writer['stats']['bytes'] - sent_bytes)
+            imported_records += len(converted_data)
+            write_log(f"第 {page + 1} 页导入完成，共 {len(converted_data)} 条记录，累计导入 {imported_records}/{total_records} 条")
+            
+            if checkpoint is not None:
+                if key_indexes:
+                    last_key = encode_checkpoint_key([source_data[-1][index] for index in key_indexes])
+                pages_done = page + 1
+                if committed:
+                    save_batch_checkpoint(checkpoint, last_key if key_indexes else None, pages_done, imported_records)
+        batch_started = time.time()
+    
+    if flush_batch_writer(writer, "最后一批", max_retries) and checkpoint is not None:
+        save_batch_checkpoint(checkpoint, last_key if key_indexes else None, pages_done, imported_records)
+    
+    return imported_records - start_records
+
+def save_batch_checkpoint(checkpoint, last_key, pages_done, rows_done):
+    """单线程导入提交后记录检查点位置"""
+    if last_key is not None:
+        checkpoint['last_key'] = last_key
+    checkpoint['pages_done'] = pages_done
+    checkpoint['rows_done'] = rows_done
+    save_checkpoint(checkpoint)
+
+def import_source_batches_pipelined(source_batches, source_cursor, target_table, target_fields, field_mapping,
+                                    default_values, import_mode, write_method, writer_count, total_records, write_stats,
+                                    max_retries=3, key_columns=None, checkpoint=None, job=None, start_page=0,
+                                    commit_policy=None, bulk_session=False, quarantine=None):
+    """流水线导入：当前线程读取并转换，writer_count 个写入线程并发写入，返回本次导入记录数
+    
+    读取和写入通过最多 PIPELINE_QUEUE_PAGES 页的有界队列衔接，目标库写入较慢时队列填满，
+    读取随之暂停（背压），内存中最多保留队列长度加写入线程数的页面。
+    每个写入线程使用独立的目标库连接，各页可能乱序提交，检查点只推进到从头连续提交的最后一页；
+    按提交策略累积多页时，页面在所在窗口提交后才登记为已提交。
+    各线程的写入统计累加到 write_stats。
+    """
+    page_queue = queue.Queue(maxsize=PIPELINE_QUEUE_PAGES)
+    stop_event = threading.Event()
+    errors = []
+    progress_lock = threading.Lock()
+    progress = {'imported': checkpoint['rows_done'] if checkpoint else 0, 'next_page': start_page, 'committed': {}}
+    start_records = progress['imported']
+    log_file = get_current_log_file()
+    
+    def writer_worker():
+        bind_job_log(log_file)
+        target_conn = get_db_connection(get_target_db_config(import_mode))
+        writer = None
+        try:
+            if not target_conn:
+                raise Error("流水线写入线程目标数据库连接失败")
+            writer = create_batch_writer(target_conn, target_table, target_fields, import_mode, write_method, job,
+                                         commit_policy, bulk_session, quarantine)
+            uncommitted = []  # 本线程已写入、所在窗口尚未提交的页
+            
+            def register_committed():
+                """已提交的页先登记，前面的页都提交后才推进检查点"""
+                if checkpoint is None:
+                    uncommitted.clear()
+                    return
+                with progress_lock:
+                    for page, rows, last_key in uncommitted:
+                        progress['committed'][page] = (rows, last_key)
+                    while progress['next_page'] in progress['committed']:
+                        rows, page_last_key = progress['committed'].pop(progress['next_page'])
+                        progress['next_page'] += 1
+                        if page_last_key is not None:
+                            checkpoint['last_key'] = page_last_key
+                        checkpoint['pages_done'] = progress['next_page']
+                        checkpoint['rows_done'] += rows
+                    save_checkpoint(checkpoint)
+                uncommitted.clear()
+            
+            while True:
+                try:
+                    item = page_queue.get(timeout=1)
+                except queue.Empty:
+                    if stop_event.is_set():
+                        return
+                    continue
+                if stop_event.is_set():
+                    return
+                if item is None:
+                    if flush_batch_writer(writer, "最后一批", max_retries):
+                        register_committed()
+                    return
+                
+                page, converted_data, last_key = item
+                committed = write_batch(writer, converted_data, f"第 {page + 1} 页", max_retries)
+                uncommitted.append((page, len(converted_data), last_key))
+                if committed:
+                    register_committed()
+                with progress_lock:
+                    progress['imported'] += len(converted_data)
+                    imported = progress['imported']
+                write_log(f"第 {page + 1} 页导入完成，共 {len(converted_data)} 条记录，累计导入 {imported}/{total_records} 条")
+        except Exception as e:
+            with progress_lock:
+                errors.append(e)
+            stop_event.set()
+        finally:
+            if writer:
+                close_batch_writer(writer)
+                with progress_lock:
+                    merge_write_stats(write_stats, writer['stats'])
+            if target_conn:
+                target_conn.close()
+    
+    threads = [threading.Thread(target=writer_worker, daemon=True) for _ in range(writer_count)]
+    for thread in threads:
+        thread.start()
+    
+    def put_page(item):
+        """放入队列，队列满时等待；写入线程出错退出后不再等待"""
+        while not stop_event.is_set():
+            try:
+                page_queue.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    try:
+        mapping_plan = None
+        key_indexes = []
+        for page, source_data in source_batches:
+            if mapping_plan is None:
+                source_fields = [desc[0] for desc in source_cursor.description]
+                mapping_plan = build_mapping_plan(source_fields, target_fields, field_mapping, default_values)
+                key_indexes = [source_fields.index(column) for column in key_columns or []]
+            
+            converted_data = apply_mapping_plan(mapping_plan, source_data)
+            if not converted_data:
+                continue
+            last_key = encode_checkpoint_key([source_data[-1][index] for index in key_indexes]) if key_indexes else None
+            if not put_page((page, converted_data, last_key)):
+                break
+    except Exception as e:
+        errors.append(e)
+        stop_event.set()
+    finally:
+        for _ in threads:
+            put_page(None)
+        for thread in threads:
+            thread.join()
+    
+    if errors:
+        raise errors[0]
+    return progress['imported'] - start_records
+
+# 表结构元数据缓存：每个数据库一份快照，由一次 information_schema.COLUMNS 查询填充
+SCHEMA_CACHE = {}
+SCHEMA_CACHE_LOCK = threading.Lock()
+
+def load_schema_snapshot(connection, database):
+    """一次查询读取整个数据库所有表的字段信息，格式与 get_table_fields 相同"""
+    cursor = connection.cursor()
+    cursor.execute(
+        "SELECT TABLE_NAME, COLUMN_NAME, COLUMN_TYPE, IS_NULLABLE, COLUMN_KEY, COLUMN_DEFAULT, EXTRA "
+        "FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = %s ORDER BY TABLE_NAME, ORDINAL_POSITION",
+        (database,)
+    )
+    columns = {}
+    for table_name, name, column_type, nullable, key, default, extra in cursor.fetchall():
+        columns.setdefault(table_name, []).append({
+            'name': name,
+            'type': column_type,
+            'null': nullable,
+            'key': key,
+            'default': default,
+            'extra': extra
+        })
+    cursor.close()
+    return {'loaded_at': time.time(), 'tables': sorted(columns), 'columns': columns}
+
+def get_schema_snapshot(db_config, refresh=False):
+    """获取数据库的表结构快照（过期或 refresh 时重新加载），连接失败返回 None"""
+    key = get_pool_key(db_config)
+    with SCHEMA_CACHE_LOCK:
+        snapshot = SCHEMA_CACHE.get(key)
+    if snapshot and not refresh and time.time() - snapshot['loaded_at'] < SCHEMA_CACHE_TTL:
+        return snapshot
+    
+    connection = get_db_connection(db_config)
+    if not connection:
+        return None
+    try:
+        snapshot = load_schema_snapshot(connection, db_config['database'])
+    except Error as e:
+        print(f"加载表结构缓存错误: {e}")
+        return None
+    finally:
+        connection.close()
+    
+    print(f"已加载表结构缓存: {db_config['database']}，共 {len(snapshot['tables'])} 个表")
+    with SCHEMA_CACHE_LOCK:
+        SCHEMA_CACHE[key] = snapshot
+    return snapshot
+
+def get_cached_tables(db_config):
+    """获取表列表（走缓存），连接失败返回 None"""
+    snapshot = get_schema_snapshot(db_config)
+    return list(snapshot['tables']) if snapshot is not None else None
+
+def get_cached_table_fields(db_config, table_name):
+    """获取表字段信息（走缓存），连接失败返回 None，表不存在返回空列表
+    
+    快照中没有的表（新建的表或被单独失效的表）单独 DESCRIBE 一次并补进快照。
+    """
+    snapshot = get_schema_snapshot(db_config)
+    if snapshot is None:
+        return None
+    if table_name in snapshot['columns']:
+        return snapshot['columns'][table_name]
+    
+    connection = get_db_connection(db_config)
+    if not connection:
+        return None
+    try:
+        fields = get_table_fields(connection, table_name)
+    finally:
+        connection.close()
+    
+    if fields:
+        with SCHEMA_CACHE_LOCK:
+            snapshot['columns'][table_name] = fields
+            if table_name not in snapshot['tables']:
+                snapshot['tables'] = sorted(snapshot['tables'] + [table_name])
+    return fields
+
+def invalidate_schema_cache(db_config=None, table_name=None):
+    """使表结构缓存失效：不传参数清空全部；只传 db_config 清空该库；同时传表名只失效该表"""
+    with SCHEMA_CACHE_LOCK:
+        if db_config is None:
+            SCHEMA_CACHE.clear()
+            return
+        key = get_pool_key(db_config)
+        if table_name is None:
+            SCHEMA_CACHE.pop(key, None)
+            return
+        snapshot = SCHEMA_CACHE.get(key)
+        if snapshot:
+            snapshot['columns'].pop(table_name, None)
+            snapshot['tables'] = [table for table in snapshot['tables'] if table != table_name]
+
+# 导入任务登记：job_id -> 任务进度，导入线程更新计数，/jobs 接口读取快照
+IMPORT_JOBS = {}
+IMPORT_JOBS_LOCK = threading.Lock()
+
+# 内存中最多保留的已结束任务数，每个任务最多保留的错误信息数
+MAX_FINISHED_JOBS = 100
+MAX_JOB_ERRORS = 20
+
+def create_import_job(source_table, target_table, import_mode, options=None, priority=0, job_id=None):
+    """登记一个导入任务，返回任务进度字典，任务日志写入 JOB_LOG_DIR 下单独的文件
+    
+    指定 job_id 时（从断点继续）沿用原任务ID和日志文件。
+    """
+    job_id = job_id or uuid.uuid4().hex[:12]
+    os.makedirs(JOB_LOG_DIR, exist_ok=True)
+    job = {
+        'job_id': job_id,
+        'kind': 'table',  # table 单表导入 / migration 库级迁移 / replication binlog 复制 / verify 数据校验 / backup 备份 / restore 恢复
+        'parent_id': None,
+        'source_table': source_table,
+        'target_table': target_table,
+        'import_mode': import_mode,
+        'engine': (options or {}).get('engine') or 'paged',
+        'priority': priority,
+        'log_file': get_job_log_file(job_id),
+        'status': 'pending',  # pending 排队中 / running 运行中 / success 成功 / failed 失败
+        'created_at': time.time(),
+        'started_at': None,
+        'finished_at': None,
+        'total_records': 0,
+        'total_pages': 0,
+        'pages_read': 0,
+        'rows_read': 0,
+        'rows_written': 0,
+        'current_key': None,
+        'total_chunks': 0,
+        'chunks_done': 0,
+        'retries': 0,
+        'rows_quarantined': 0,
+        'errors': [],
+        'message': ''
+    }
+    with IMPORT_JOBS_LOCK:
+        IMPORT_JOBS[job['job_id']] = job
+        # 清理最早结束的任务，避免长期运行时内存增长
+        finished = [item for item in IMPORT_JOBS.values() if item['finished_at']]
+        if len(finished) > MAX_FINISHED_JOBS:
+            finished.sort(key=lambda item: item['finished_at'])
+            for item in finished[:len(finished) - MAX_FINISHED_JOBS]:
+                del IMPORT_JOBS[item['job_id']]
+                # 任务日志随任务一起清理
+                try:
+                    os.remove(item['log_file'])
+                except OSError:
+                    pass
+    return job
+
+def update_job(job, **fields):
+    """设置任务进度字段，job 为 None 时不做任何事"""
+    if job is None:
+        return
+    with IMPORT_JOBS_LOCK:
+        job.update(fields)
+
+def add_job_progress(job, **counters):
+    """累加任务计数（rows_read、rows_written、retries 等），并行线程可同时调用"""
+    if job is None:
+        return
+    with IMPORT_JOBS_LOCK:
+        for key, value in counters.items():
+            job[key] += value
+
+def record_job_error(job, message):
+    """记录任务错误信息，只保留最近 MAX_JOB_ERRORS 条"""
+    if job is None:
+        return
+    with IMPORT_JOBS_LOCK:
+        job['errors'].append({'time': datetime.now().isoformat(), 'message': str(message)})
+        del job['errors'][:-MAX_JOB_ERRORS]
+
+def finish_job(job, status, message=''):
+    """标记任务结束"""
+    update_job(job, status=status, message=message, finished_at=time.time())
+
+def format_job_timestamp(timestamp):
+    """把时间戳转换为 ISO 格式字符串"""
+    return datetime.fromtimestamp(timestamp).isoformat() if timestamp else None
+
+def get_job_snapshot(job):
+    """生成任务进度快照，附带耗时、速度、预计剩余时间和百分比"""
+    with IMPORT_JOBS_LOCK:
+        snapshot = dict(job)
+        snapshot['errors'] = list(job['errors'])
+        if 'child_jobs' in job:
+            # 库级迁移：已结束的子任务在结束时累加，这里再加上运行中子任务的实时行数
+            snapshot['child_jobs'] = list(job['child_jobs'])
+            for child_id in job['child_jobs']:
+                child = IMPORT_JOBS.get(child_id)
+                if child and child['status'] == 'running':
+                    snapshot['rows_read'] += child['rows_read']
+                    snapshot['rows_written'] += child['rows_written']
+    
+    if snapshot['started_at']:
+        elapsed = (snapshot['finished_at'] or time.time()) - snapshot['started_at']
+    else:
+        elapsed = 0
+    # 校验任务不写入数据，按已校验的行数计算进度
+    rows_done = snapshot['rows_read'] if snapshot['kind'] == 'verify' else snapshot['rows_written']
+    rows_per_sec = rows_done / elapsed if elapsed > 0 else 0
+    remaining = max(snapshot['total_records'] - rows_done, 0)
+    
+    if snapshot['status'] == 'success':
+        percent = 100
+    elif snapshot['total_records']:
+        percent = min(int(rows_done / snapshot['total_records'] * 100), 100)
+    else:
+        percent = 0
+    
+    snapshot.update({
+        'created_at': format_job_timestamp(snapshot['created_at']),
+        'started_at': format_job_timestamp(snapshot['started_at']),
+        'finished_at': format_job_timestamp(snapshot['finished_at']),
+        'elapsed': round(elapsed, 2),
+        'rows_per_sec': round(rows_per_sec, 1),
+        'eta_seconds': round(remaining / rows_per_sec, 1) if snapshot['status'] == 'running' and rows_per_sec else None,
+        'percent': percent
+    })
+    return snapshot
+
+def get_job(job_id):
+    """按 ID 查找任务"""
+    with IMPORT_JOBS_LOCK:
+        return IMPORT_JOBS.get(job_id)
+
+def get_job_log_file(job_id):
+    """任务日志文件路径"""
+    return os.path.join(JOB_LOG_DIR, f"{job_id}.log")
+
+# 导入任务调度：固定数量的调度线程从优先级队列中领取任务，
+# 同一源库、同一目标库上同时运行的任务数分别受 MAX_JOBS_PER_SOURCE / MAX_JOBS_PER_TARGET 限制
+SCHEDULER_CONDITION = threading.Condition()
+SCHEDULER_QUEUE = []
+SCHEDULER_RUNNING = {}  # 'source:主机:端口/库' 或 'target:...' -> 运行中任务数
+SCHEDULER_THREADS = []
+SCHEDULER_SEQUENCE = itertools.count()
+
+def get_db_label(db_config):
+    """数据库标识，用于按库统计并发任务数"""
+    return f"{db_config.get('host')}:{db_config.get('port', 3306)}/{db_config.get('database')}"
+
+def submit_import_job(job, target, args):
+    """把任务放入调度队列，优先级高的先执行，同优先级按提交顺序执行"""
+    entry = {
+        'job': job,
+        'target': target,
+        'args': args,
+        'sequence': next(SCHEDULER_SEQUENCE),
+        'source_db': 'source:' + get_db_label(SOURCE_DB),
+        'target_db': 'target:' + get_db_label(TARGET_DB)
+    }
+    with SCHEDULER_CONDITION:
+        SCHEDULER_QUEUE.append(entry)
+        # 调度线程按需启动，最多 MAX_CONCURRENT_JOBS 个
+        if len(SCHEDULER_THREADS) < MAX_CONCURRENT_JOBS:
+            thread = threading.Thread(target=scheduler_worker, daemon=True)
+            SCHEDULER_THREADS.append(thread)
+            thread.start()
+        SCHEDULER_CONDITION.notify_all()
+
+def take_next_job():
+    """取出优先级最高、且源库/目标库并发数未满的任务（调用方持有 SCHEDULER_CONDITION）"""
+    for entry in sorted(SCHEDULER_QUEUE, key=lambda item: (-item['job']['priority'], item['sequence'])):
+        if (SCHEDULER_RUNNING.get(entry['source_db'], 0) < MAX_JOBS_PER_SOURCE and
+                SCHEDULER_RUNNING.get(entry['target_db'], 0) < MAX_JOBS_PER_TARGET):
+            SCHEDULER_QUEUE.remove(entry)
+            for key in (entry['source_db'], entry['target_db']):
+                SCHEDULER_RUNNING[key] = SCHEDULER_RUNNING.get(key, 0) + 1
+            return entry
+    return None
+
+def scheduler_worker():
+    """调度线程：循环领取并执行任务，执行期间日志写入该任务的日志文件"""
+    while True:
+        with SCHEDULER_CONDITION:
+            entry = take_next_job()
+            while entry is None:
+                SCHEDULER_CONDITION.wait()
+                entry = take_next_job()
+        
+        bind_job_log(entry['job']['log_file'])
+        try:
+            entry['target'](*entry['args'])
+        except Exception as e:
+            print(f"导入任务 {entry['job']['job_id']} 异常: {e}")
+        finally:
+            bind_job_log(None)
+            with SCHEDULER_CONDITION:
+                for key in (entry['source_db'], entry['target_db']):
+                    SCHEDULER_RUNNING[key] -= 1
+                    if not SCHEDULER_RUNNING[key]:
+                        del SCHEDULER_RUNNING[key]
+                SCHEDULER_CONDITION.notify_all()
+
+def get_scheduler_stats():
+    """调度器状态：排队任务数和各数据库运行中任务数"""
+    with SCHEDULER_CONDITION:
+        return {
+            'max_concurrent_jobs': MAX_CONCURRENT_JOBS,
+            'max_jobs_per_source': MAX_JOBS_PER_SOURCE,
+            'max_jobs_per_target': MAX_JOBS_PER_TARGET,
+            'queued': len(SCHEDULER_QUEUE),
+            'running': dict(SCHEDULER_RUNNING)
+        }
+
+# 检查点：每批数据提交后把已提交的位置写入 CHECKPOINT_DIR/<job_id>.json，
+# 任务失败或程序重启后可通过 /resume/<job_id> 从断点继续
+CHECKPOINT_LOCK = threading.Lock()
+
+def get_checkpoint_file(job_id):
+    """检查点文件路径"""
+    return os.path.join(CHECKPOINT_DIR, f"{job_id}.json")
+
+def encode_checkpoint_key(key):
+    """把键值转换为可写入 JSON 的形式（二进制转十六进制，日期、小数等转字符串）"""
+    if key is None:
+        return None
+    encoded = []
+    for value in key:
+        if isinstance(value, (bytes, bytearray)):
+            encoded.append({'hex': bytes(value).hex()})
+        elif value is None or isinstance(value, (int, float, str)):
+            encoded.append(value)
+        else:
+            encoded.append(str(value))
+    return encoded
+
+def decode_checkpoint_key(encoded):
+    """还原 encode_checkpoint_key 转换的键值"""
+    if encoded is None:
+        return None
+    return tuple(bytes.fromhex(value['hex']) if isinstance(value, dict) else value for value in encoded)
+
+def new_checkpoint(job, source_table, target_table, field_mapping, default_values, import_mode, page_size, options):
+    """创建检查点，记录重新启动任务所需的全部参数"""
+    return {
+        'job_id': job['job_id'],
+        'status': 'running',
+        'params': {
+            'source_table': source_table,
+            'target_table': target_table,
+            'field_mapping': field_mapping,
+            'default_values': default_values,
+            'import_mode': import_mode,
+            'page_size': page_size,
+            'options': options,
+            'priority': job['priority']
+        },
+        'engine': None,
+        'key_columns': [],
+        'last_key': None,  # 键集分页/流式：最后一批已提交数据的末尾键值
+        'pages_done': 0,   # OFFSET 分页：已提交的页数
+        'rows_done': 0,
+        'chunks': None,    # 并行导入：各键区间及其已提交位置
+        'sync': None,      # 增量同步：本次同步的水位区间，继续时沿用
+        'message': '',
+        'updated_at': None
+    }
+
+def save_checkpoint(checkpoint):
+    """原子地写入检查点文件（先写临时文件再替换），进程中途退出也不会留下半个文件"""
+    if checkpoint is None:
+        return
+    with CHECKPOINT_LOCK:
+        checkpoint['updated_at'] = datetime.now().isoformat()
+        os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+        path = get_checkpoint_file(checkpoint['job_id'])
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+
+def load_checkpoint(job_id):
+    """读取检查点，不存在时返回 None"""
+    path = get_checkpoint_file(job_id)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def delete_checkpoint(job_id):
+    """任务成功后删除检查点"""
+    try:
+        os.remove(get_checkpoint_file(job_id))
+    except OSError:
+        pass
+
+def list_checkpoints():
+    """列出所有可继续的检查点（按更新时间倒序）"""
+    checkpoints = []
+    if os.path.isdir(CHECKPOINT_DIR):
+        for name in os.listdir(CHECKPOINT_DIR):
+            if name.endswith('.json'):
+                try:
+                    checkpoints.append(load_checkpoint(name[:-5]))
+                except (OSError, ValueError) as e:
+                    print(f"读取检查点 {name} 错误: {e}")
+    checkpoints.sort(key=lambda item: item.get('updated_at') or '', reverse=True)
+    return checkpoints
+
+# 日志写入通知：/log_stream 在此等待新日志
+LOG_CONDITION = threading.Condition()
+
+# 当前线程正在执行的任务的日志文件，并发任务的日志互不混杂
+JOB_LOG_CONTEXT = threading.local()
+
+def bind_job_log(log_file):
+    """设置当前线程的日志文件，None 表示写入公共日志 LOG_FILE"""
+    JOB_LOG_CONTEXT.log_file = log_file
+
+def get_current_log_file():
+    """当前线程的日志文件"""
+    return getattr(JOB_LOG_CONTEXT, 'log_file', None) or LOG_FILE
+
+def write_log(message):
+    """写入日志文件（任务线程中写入该任务的日志文件）"""
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    log_message = f"[{timestamp}] {message}\n"
+    try:
+        with open(get_current_log_file(), 'a', encoding='utf-8') as f:
+            f.write(log_message)
+    except Exception as e:
+        print(f"写入日志错误: {e}")
+    with LOG_CONDITION:
+        LOG_CONDITION.notify_all()
+
+def decode_log_bytes(data):
+    """解码日志内容，兼容旧版本可能写入的其他编码"""
+    for encoding in ('utf-8', 'gbk', 'utf-8-sig'):
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return data.decode('utf-8', errors='replace')
+
+def read_log_since(offset, max_bytes=LOG_CHUNK_BYTES, log_file=LOG_FILE):
+    """读取日志文件中 offset 之后的完整行
+    
+    返回 {'log': 新内容, 'offset': 新偏移, 'reset': 是否从头读取}。
+    日志被清空（文件比 offset 短）时从头读取并标记 reset；只返回到最后一个换行符，
+    避免把正在写入的半行或被截断的多字节字符发给客户端。单行超过 max_bytes 时
+    继续读到该行的换行符，offset 始终停在行首。
+    """
+    if not os.path.exists(log_file):
+        return {'log': '', 'offset': 0, 'reset': offset > 0}
+    
+    reset = False
+    with open(log_file, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if offset > size:
+            offset = 0
+            reset = True
+        f.seek(offset)
+        data = f.read(max_bytes)
+        end = data.rfind(b'\n') + 1
+        # 一整块都没有换行符：这一行比 max_bytes 长，读到行尾为止
+        while not end and len(data) >= max_bytes:
+            more = f.read(max_bytes)
+            if not more:
+                break
+            newline = more.find(b'\n')
+            if newline >= 0:
+                data += more[:newline + 1]
+                end = len(data)
+            else:
+                data += more
+    
+    return {'log': decode_log_bytes(data[:end]), 'offset': offset + end, 'reset': reset}
+
+# 并发任务同时结束时保护历史文件的读-改-写
+HISTORY_LOCK = threading.Lock()
+
+def save_import_history(source_table, target_table, field_mapping, import_mode, status, records_count, duration, extra=None):
+    """保存导入历史记录，extra 中的附加信息（如写入统计）一并记录"""
+    try:
+        history_entry = {
+            'timestamp': datetime.now().isoformat(),
+            'source_table': source_table,
+            'target_table': target_table,
+            'field_mapping': field_mapping,
+            'import_mode': import_mode,
+            'status': status,
+            'records_count': records_count,
+            'duration': duration
+        }
+        history_entry.update(extra or {})
+        
+        with HISTORY_LOCK:
+            # 读取现有历史记录
+            history = []
+            if os.path.exists(HISTORY_FILE):
+                with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
+                    history = json.load(f)
+            
+            # 添加新记录
+            history.insert(0, history_entry)  # 最新的记录在前面
+            
+            # 只保留最近50条记录
+            history = history[:50]
+            
+            # 保存历史记录
+            with open(HISTORY_FILE, 'w', encoding='utf-8') as f:
+                json.dump(history, f, ensure_ascii=False, indent=2)
+            
+    except Exception as e:
+        print(f"保存导入历史错误: {e}")
+
+def get_import_history():
+    """获取导入历史记录"""
+    try:
+        if os.path.exists(HISTORY_FILE):
+            with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return []
+    except Exception as e:
+        print(f"读取导入历史错误: {e}")
+        return []
+
+# 增量同步：按水位列只复制上次同步之后变化的记录，每个 源表 -> 目标表 的水位保存在 WATERMARK_FILE
+WATERMARK_LOCK = threading.Lock()
+
+# 自动识别水位列时依次尝试的列名，更新时间优先于创建时间；都没有时使用自增列
+WATERMARK_COLUMN_CANDIDATES = ['updatetime', 'edittime', 'update_time', 'updated_at', 'modifytime', 'modified',
+                               'addtime', 'inputtime', 'createtime', 'create_time', 'created_at']
+
+def get_watermark_key(source_table, target_table):
+    """水位标识：源库.源表 -> 目标库.目标表"""
+    return f"{get_db_label(SOURCE_DB)}.{source_table} -> {get_db_label(TARGET_DB)}.{target_table}"
+
+def load_watermarks():
+    """读取全部水位"""
+    try:
+        if os.path.exists(WATERMARK_FILE):
+            with open(WATERMARK_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+    except Exception as e:
+        print(f"读取增量同步水位错误: {e}")
+    return {}
+
+def save_watermark(source_table, target_table, column, value):
+    """保存一次成功同步后的水位（value 为 encode_checkpoint_key 编码后的值）"""
+    with WATERMARK_LOCK:
+        watermarks = load_watermarks()
+        watermarks[get_watermark_key(source_table, target_table)] = {
+            'source_table': source_table,
+            'target_table': target_table,
+            'column': column,
+            'value': value,
+            'updated_at': datetime.now().isoformat()
+        }
+        with open(WATERMARK_FILE, 'w', encoding='utf-8') as f:
+            json.dump(watermarks, f, ensure_ascii=False, indent=2)
+
+def reset_watermark(source_table, target_table):
+    """删除水位，下次增量同步复制全部记录；返回是否存在该水位"""
+    with WATERMARK_LOCK:
+        watermarks = load_watermarks()
+        if watermarks.pop(get_watermark_key(source_table, target_table), None) is None:
+            return False
+        with open(WATERMARK_FILE, 'w', encoding='utf-8') as f:
+            json.dump(watermarks, f, ensure_ascii=False, indent=2)
+        return True
+
+def detect_watermark_column(fields):
+    """从表字段中识别水位列：优先更新时间类字段，其次自增列，没有时返回 None"""
+    names = {field['name'].lower(): field['name'] for field in fields}
+    for candidate in WATERMARK_COLUMN_CANDIDATES:
+        if candidate in names:
+            return names[candidate]
+    for field in fields:
+        if 'auto_increment' in (field['extra'] or '').lower():
+            return field['name']
+    return None
+
+def prepare_incremental_sync(connection, source_table, target_table, watermark_column=None):
+    """确定本次增量同步的水位区间
+    
+    下界为上次同步保存的水位（水位列变化或首次同步时为空，即复制全部记录），
+    上界为此刻源表中水位列的最大值，同步期间新写入的记录留给下一次同步。
+    自增列严格大于下界；时间类列包含下界，避免遗漏与上次水位同一时刻写入的记录。
+    """
+    fields = get_table_fields(connection, source_table)
+    field_info = {field['name']: field for field in fields}
+    if watermark_column:
+        if watermark_column not in field_info:
+            raise Error(f"水位列 {watermark_column} 在源表 {source_table} 中不存在")
+        column = watermark_column
+    else:
+        column = detect_watermark_column(fields)
+        if not column:
+            raise Error(f"源表 {source_table} 没有可用的水位列（更新时间列或自增列），请指定 watermark_column")
+    
+    saved = load_watermarks().get(get_watermark_key(source_table, target_table))
+    low = saved['value'] if saved and saved['column'] == column else None
+    
+    cursor = connection.cursor()
+    cursor.execute(f"SELECT MAX(`{column}`) FROM `{source_table}`")
+    high = cursor.fetchone()[0]
+    cursor.close()
+    
+    return {
+        'column': column,
+        'strict': 'auto_increment' in (field_info[column]['extra'] or '').lower(),
+        'low': low,
+        'high': encode_checkpoint_key([high])[0] if high is not None else None
+    }
+
+def get_incremental_mode_error(import_mode, fields, watermark_column=None):
+    """检查增量同步能否使用该导入模式，不能时返回错误信息
+    
+    水位列不是自增列（如更新时间列）时，同步区间内包含修改过的已有记录；仅新增模式 (INSERT IGNORE)
+    会跳过这些记录，水位却照常推进，这些修改以后再也不会同步，因此只允许覆盖模式。
+    水位列不存在时返回 None，由 prepare_incremental_sync 报错。
+    """
+    if is_overwrite_mode(import_mode):
+        return None
+    column = watermark_column or detect_watermark_column(fields)
+    field = next((field for field in fields if field['name'] == column), None)
+    if field is None or 'auto_increment' in (field['extra'] or '').lower():
+        return None
+    return (f"增量同步的水位列 {column} 不是自增列，同步区间内包含修改过的记录，"
+            f"仅新增模式会跳过这些修改而水位照常推进，请使用覆盖模式")
+
+def build_watermark_filter(sync):
+    """由水位区间构造源表过滤条件；首次同步时水位列为 NULL 的记录也一并复制"""
+    column = f"`{sync['column']}`"
+    low, high = decode_checkpoint_key([sync['low'], sync['high']])
+    if low is None:
+        return {'sql': f"{column} <= %s OR {column} IS NULL", 'params': [high]}
+    comparison = '>' if sync['strict'] else '>='
+    return {'sql': f"{column} {comparison} %s AND {column} <= %s", 'params': [low, high]}
+
+def find_saved_mapping(source_table, target_table, source_field_names, target_field_names):
+    """从导入历史中找出该表对最近一次成功导入使用的字段映射，字段已不存在时返回 None"""
+    for entry in get_import_history():
+        if (entry.get('source_table') == source_table and entry.get('target_table') == target_table
+                and entry.get('status') == '成功' and entry.get('field_mapping')):
+            field_mapping = entry['field_mapping']
+            if (all(field in target_field_names for field in field_mapping) and
+                    all(field in source_field_names for field in field_mapping.values())):
+                return field_mapping
+            return None
+    return None
+
+def get_foreign_key_dependencies(connection, database):
+    """读取外键依赖：返回 {表: {被引用的表, ...}}，忽略自引用"""
+    cursor = connection.cursor()
+    cursor.execute(
+        "SELECT TABLE_NAME, REFERENCED_TABLE_NAME FROM information_schema.KEY_COLUMN_USAGE "
+        "WHERE TABLE_SCHEMA = %s AND REFERENCED_TABLE_SCHEMA = %s AND REFERENCED_TABLE_NAME IS NOT NULL",
+        (database, database)
+    )
+    dependencies = {}
+    for table_name, referenced_table in cursor.fetchall():
+        if table_name != referenced_table:
+            dependencies.setdefault(table_name, set()).add(referenced_table)
+    cursor.close()
+    return dependencies
+
+def get_table_sizes(connection, database):
+    """读取各表的数据大小和估算行数：返回 {表: (DATA_LENGTH, TABLE_ROWS)}"""
+    cursor = connection.cursor()
+    cursor.execute(
+        "SELECT TABLE_NAME, DATA_LENGTH, TABLE_ROWS FROM information_schema.TABLES "
+        "WHERE TABLE_SCHEMA = %s AND TABLE_TYPE = 'BASE TABLE'",
+        (database,)
+    )
+    sizes = {table_name: (int(data_length or 0), int(table_rows or 0))
+             for table_name, data_length, table_rows in cursor.fetchall()}
+    cursor.close()
+    return sizes
+
+def build_migration_plans(tables, table_mappings):
+    """为库级迁移的每个源表确定目标表和字段映射
+    
+    字段映射优先使用请求中指定的映射，其次是导入历史中该表对最近一次成功使用的映射，
+    最后使用智能匹配。返回 (计划列表, 跳过的表及原因)。
+    """
+    source_snapshot = get_schema_snapshot(SOURCE_DB)
+    target_snapshot = get_schema_snapshot(TARGET_DB)
+    if source_snapshot is None or target_snapshot is None:
+        raise Error("无法连接源数据库或目标数据库")
+    
+    plans = []
+    skipped = []
+    for source_table in tables:
+        table_mapping = table_mappings.get(source_table) or {}
+        target_table = table_mapping.get('target_table') or source_table
+        source_fields = [field['name'] for field in source_snapshot['columns'].get(source_table, [])]
+        target_fields = [field['name'] for field in target_snapshot['columns'].get(target_table, [])]
+        if not source_fields:
+            skipped.append({'table': source_table, 'reason': '源表不存在'})
+            continue
+        if not target_fields:
+            skipped.append({'table': source_table, 'reason': f'目标表 {target_table} 不存在'})
+            continue
+        
+        if table_mapping.get('field_mapping'):
+            field_mapping, mapping_source = table_mapping['field_mapping'], '指定'
+        else:
+            field_mapping = find_saved_mapping(source_table, target_table, source_fields, target_fields)
+            mapping_source = '历史'
+            if not field_mapping:
+                field_mapping, mapping_source = auto_match_fields(source_fields, target_fields), '智能匹配'
+        
+        invalid_fields = [field for field in field_mapping if field not in target_fields]
+        if invalid_fields:
+            skipped.append({'table': source_table, 'reason': f'字段映射中包含不存在的目标字段: {invalid_fields}'})
+            continue
+        if not field_mapping:
+            skipped.append({'table': source_table, 'reason': '没有可映射的字段'})
+            continue
+        
+        plans.append({
+            'source_table': source_table,
+            'target_table': target_table,
+            'field_mapping': field_mapping,
+            'default_values': table_mapping.get('default_values') or {},
+            'mapping_source': mapping_source
+        })
+    return plans, skipped
+
+def order_migration_plans(plans):
+    """计算库级迁移的依赖关系和调度权重
+    
+    依赖关系取自目标库外键（被引用的表先导入），只保留本次迁移范围内的表。
+    权重为表自身数据量加上所有直接、间接依赖它的表的数据量，就绪的表按权重从大到小提交，
+    使大表和大表所在的依赖链尽早开始，缩短总耗时。
+    """
+    source_conn = get_db_connection(SOURCE_DB)
+    target_conn = get_db_connection(TARGET_DB)
+    try:
+        if not source_conn or not target_conn:
+            raise Error("无法连接源数据库或目标数据库")
+        target_dependencies = get_foreign_key_dependencies(target_conn, TARGET_DB['database'])
+        sizes = get_table_sizes(source_conn, SOURCE_DB['database'])
+    finally:
+        close_quietly(source_conn)
+        close_quietly(target_conn)
+    
+    source_by_target = {plan['target_table']: plan['source_table'] for plan in plans}
+    dependencies = {}
+    for plan in plans:
+        parents = target_dependencies.get(plan['target_table'], set())
+        dependencies[plan['source_table']] = {source_by_target[table] for table in parents if table in source_by_target}
+        plan['data_length'], plan['estimated_rows'] = sizes.get(plan['source_table'], (0, 0))
+    
+    dependents = {plan['source_table']: set() for plan in plans}
+    for table, parents in dependencies.items():
+        for parent in parents:
+            dependents[parent].add(table)
+    
+    own_sizes = {plan['source_table']: plan['data_length'] for plan in plans}
+    weights = {}
+    for table in own_sizes:
+        # 沿依赖链收集所有下游表（外键可能成环，用 seen 防止死循环）
+        seen = set()
+        stack = [table]
+        while stack:
+            current = stack.pop()
+            if current in seen:
+                continue
+            seen.add(current)
+            stack.extend(dependents[current])
+        weights[table] = sum(own_sizes[item] for item in seen)
+    
+    return dependencies, weights
+
+def migration_thread(job, plans, dependencies, weights, import_mode, page_size, options):
+    """库级迁移协调线程
+    
+    依赖的表全部导入成功后，把该表作为子任务提交给调度器，同时就绪的表按权重从大到小提交，
+    实际并发由调度器的并发限制控制。某个表失败时，依赖它的表不再导入。
+    """
+    bind_job_log(job['log_file'])
+    start_time = time.time()
+    update_job(job, status='running', started_at=start_time)
+    write_log(f"开始库级迁移，共 {len(plans)} 个表")
+    
+    plans_by_table = {plan['source_table']: plan for plan in plans}
+    pending = set(plans_by_table)
+    running = set()
+    succeeded = set()
+    failed = set()
+    condition = threading.Condition()
+    
+    def run_table(plan, child):
+        try:
+            import_data_thread(plan['source_table'], plan['target_table'], plan['field_mapping'], plan['default_values'],
+                               import_mode, page_size, options, child)
+        finally:
+            snapshot = get_job_snapshot(child)
+            add_job_progress(job, rows_read=snapshot['rows_read'], rows_written=snapshot['rows_written'],
+                             retries=snapshot['retries'], tables_done=1)
+            with condition:
+                running.discard(plan['source_table'])
+                if snapshot['status'] == 'success':
+                    succeeded.add(plan['source_table'])
+                else:
+                    failed.add(plan['source_table'])
+                    record_job_error(job, f"表 {plan['source_table']} 导入失败: {snapshot['message']}")
+                condition.notify_all()
+    
+    def submit(table):
+        plan = plans_by_table[table]
+        child = create_import_job(plan['source_table'], plan['target_table'], import_mode, options, job['priority'])
+        update_job(child, parent_id=job['job_id'])
+        with IMPORT_JOBS_LOCK:
+            job['child_jobs'].append(child['job_id'])
+        pending.discard(table)
+        running.add(table)
+        write_log(f"提交表 {table} -> {plan['target_table']}（字段映射: {plan['mapping_source']}，"
+                  f"数据量约 {plan['data_length'] / 1024 / 1024:.1f} MB），任务ID: {child['job_id']}")
+        submit_import_job(child, run_table, (plan, child))
+    
+    try:
+        with condition:
+            while pending or running:
+                # 依赖的表失败或被跳过时，本表也跳过
+                blocked = [table for table in pending if dependencies[table] & failed]
+                for table in blocked:
+                    pending.discard(table)
+                    failed.add(table)
+                    add_job_progress(job, tables_skipped=1)
+                    write_log(f"表 {table} 依赖的表导入失败，跳过")
+                
+                ready = [table for table in pending if dependencies[table] <= succeeded]
+                if not ready and pending and not running:
+                    # 剩余的表之间存在循环外键，无法排出先后，按权重提交一个打破循环
+                    table = max(pending, key=lambda item: weights[item])
+                    write_log(f"表 {table} 处于循环外键依赖中，忽略依赖顺序直接导入")
+                    ready = [table]
+                
+                for table in sorted(ready, key=lambda item: weights[item], reverse=True):
+                    submit(table)
+                
+                if pending or running:
+                    condition.wait()
+    except Exception as e:
+        write_log(f"库级迁移调度异常: {e}")
+        record_job_error(job, e)
+        failed.update(pending)
+    
+    duration = time.time() - start_time
+    failed_tables = sorted(failed)
+    write_log(f"库级迁移结束，成功 {len(succeeded)} 个表，失败或跳过 {len(failed_tables)} 个表，耗时 {duration:.1f} 秒")
+    if failed_tables:
+        finish_job(job, 'failed', f"以下表未完成: {', '.join(failed_tables)}")
+    else:
+        finish_job(job, 'success', f"库级迁移完成，共 {len(succeeded)} 个表")
+    bind_job_log(None)
+
+# binlog 复制：按任务ID登记停止标志和正在读取的 binlog 流，/stop_replication 通过它结束复制
+REPLICATION_STREAMS = {}
+REPLICATION_LOCK = threading.Lock()
+
+def check_binlog_settings(connection):
+    """检查源库 binlog 设置：必须为 ROW 格式且记录整行，否则无法还原每行的变化"""
+    cursor = connection.cursor()
+    try:
+        settings = {}
+        for name in ('log_bin', 'binlog_format', 'binlog_row_image'):
+            cursor.execute(f"SHOW VARIABLES LIKE '{name}'")
+            row = cursor.fetchone()
+            settings[name] = str(row[1]).upper() if row else ''
+    finally:
+        cursor.close()
+    if settings['log_bin'] in ('OFF', '0'):
+        raise Error("源库未开启 binlog（log_bin=OFF）")
+    if settings['binlog_format'] != 'ROW':
+        raise Error(f"binlog 复制要求 binlog_format=ROW，当前为 {settings['binlog_format'] or '未知'}")
+    if settings['binlog_row_image'] not in ('', 'FULL'):
+        raise Error(f"binlog 复制要求 binlog_row_image=FULL，当前为 {settings['binlog_row_image']}")
+
+def get_binlog_position(connection):
+    """读取源库当前 binlog 文件名和位置（MySQL 8.4 起 SHOW MASTER STATUS 改为 SHOW BINARY LOG STATUS）"""
+    cursor = connection.cursor()
+    try:
+        try:
+            cursor.execute("SHOW MASTER STATUS")
+        except Error:
+            cursor.execute("SHOW BINARY LOG STATUS")
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+    if not row:
+        raise Error("无法获取 binlog 位置，请确认源库已开启 binlog 且账号有 REPLICATION CLIENT 权限")
+    return row[0], int(row[1])
+
+def build_key_delete_statement(target_table, key_columns, count):
+    """按键批量删除目标表记录的语句：DELETE ... WHERE (键列) IN ((...), (...))"""
+    key_list = ', '.join([f"`{column}`" for column in key_columns])
+    row_placeholder = f"({', '.join(['%s'] * len(key_columns))})"
+    return f"DELETE FROM `{target_table}` WHERE ({key_list}) IN ({', '.join([row_placeholder] * count)})"
+
+def apply_replication_changes(writer, target_table, key_columns, changes, max_retries=3):
+    """把合并后的一批变更写入目标表：先按键删除，再 REPLACE 写入新增和修改的记录
+    
+    changes 为 {目标键: 目标行}，目标行为 None 表示删除。返回 (删除数, 写入数)。
+    """
+    deleted_keys = [key for key, row in changes.items() if row is None]
+    upsert_rows = [row for row in changes.values() if row is not None]
+    
+    for start in range(0, len(deleted_keys), 500):
+        keys = deleted_keys[start:start + 500]
+        statement = build_key_delete_statement(target_table, key_columns, len(keys))
+        params = [value for key in keys for value in key]
+        retry = 0
+        while True:
+            try:
+                writer['cursor'].execute(statement, params)
+                writer['conn'].commit()
+                break
+            except Error as e:
+                try:
+                    writer['conn'].rollback()
+                except Error:
+                    pass
+                retry += 1
+                record_job_error(writer['job'], f"删除记录失败: {e}")
+                if retry >= max_retries:
+                    write_log(f"删除记录最终失败: {e}")
+                    raise
+                add_job_progress(writer['job'], retries=1)
+                write_log(f"删除记录失败，重试 {retry}/{max_retries}: {e}")
+                time.sleep(2)
+                ensure_writer_connection(writer)
+    
+    if upsert_rows:
+        write_batch(writer, upsert_rows, "复制批次", max_retries)
+    return len(deleted_keys), len(upsert_rows)
+
+def replication_thread(job, source_table, target_table, field_mapping, default_values, page_size, options):
+    """binlog 复制线程
+    
+    先记下源库当前 binlog 位置，再把全表快照作为子任务（覆盖模式）提交给调度器；快照完成后
+    从记下的位置开始读取 binlog，把源表的新增、修改、删除持续应用到目标表。快照期间发生的
+    变更会被重放一次，REPLACE 和按键删除都是幂等的，所以结果一致。
+    同一批内同一条记录的多次变更只保留最后一次，累积 REPLICATION_BATCH_ROWS 条或等待
+    REPLICATION_FLUSH_SECONDS 秒后写入一次。
+    """
+    bind_job_log(job['log_file'])
+    update_job(job, status='running', started_at=time.time())
+    stop_event = threading.Event()
+    with REPLICATION_LOCK:
+        REPLICATION_STREAMS[job['job_id']] = {'stop': stop_event, 'stream': None}
+    
+    source_conn = None
+    target_conn = None
+    stream = None
+    writer = None
+    changes = {}
+    
+    def flush():
+        deleted, written = apply_replication_changes(writer, target_table, key_columns, changes)
+        changes.clear()
+        add_job_progress(job, rows_deleted=deleted, batches_applied=1)
+        # 变更已提交，记录已应用到的 binlog 位置
+        update_job(job, binlog_file=stream.log_file, binlog_pos=stream.log_pos, applied_at=time.time())
+        if deleted or written:
+            write_log(f"已应用 {written} 条写入、{deleted} 条删除，binlog 位置: {stream.log_file}:{stream.log_pos}")
+    
+    try:
+        source_conn = get_db_connection(SOURCE_DB)
+        target_conn = get_db_connection(TARGET_DB)
+        if not source_conn or not target_conn:
+            raise Error("数据库连接失败")
+        
+        check_binlog_settings(source_conn)
+        source_fields = [field['name'] for field in get_table_fields(source_conn, source_table)]
+        target_fields = list(dict.fromkeys(list(field_mapping.keys()) + list(default_values.keys())))
+        key_columns = get_pagination_key(target_conn, target_table)
+        if not key_columns or any(column not in field_mapping for column in key_columns):
+            raise Error("binlog 复制按目标表主键（或非空唯一索引）更新和删除记录，这些字段必须映射到源表字段")
+        key_indexes = [target_fields.index(column) for column in key_columns]
+        plan = build_mapping_plan(source_fields, target_fields, field_mapping, default_values)
+        
+        log_file, log_pos = get_binlog_position(source_conn)
+        update_job(job, binlog_file=log_file, binlog_pos=log_pos)
+        write_log(f"复制起点 binlog 位置: {log_file}:{log_pos}")
+        source_conn.close()
+        source_conn = None
+        
+        if options.get('snapshot', True):
+            child = create_import_job(source_table, target_table, 'overwrite', options, job['priority'])
+            update_job(child, parent_id=job['job_id'])
+            with IMPORT_JOBS_LOCK:
+                job['child_jobs'].append(child['job_id'])
+            write_log(f"开始初始全量快照，任务ID: {child['job_id']}")
+            snapshot_done = threading.Event()
+            
+            def run_snapshot():
+                try:
+                    import_data_thread(source_table, target_table, field_mapping, default_values, 'overwrite',
+                                       page_size, options, child)
+                finally:
+                    snapshot_done.set()
+            
+            submit_import_job(child, run_snapshot, ())
+            while not snapshot_done.wait(1):
+                if stop_event.is_set():
+                    raise Error("复制在初始快照期间被停止")
+            if child['status'] != 'success':
+                raise Error(f"初始快照失败: {child['message']}")
+            update_job(job, total_records=child['total_records'])
+            write_log("初始快照完成，开始应用 binlog 变更")
+        
+        writer = create_batch_writer(target_conn, target_table, target_fields, 'overwrite', 'executemany', job)
+        stream = BinLogStreamReader(
+            connection_settings={key: SOURCE_DB[key] for key in ('host', 'port', 'user', 'password')},
+            server_id=REPLICATION_SERVER_ID,
+            resume_stream=True,
+            log_file=log_file,
+            log_pos=log_pos,
+            blocking=True,
+            only_schemas=[SOURCE_DB['database']],
+            only_tables=[source_table],
+            only_events=[WriteRowsEvent, UpdateRowsEvent, DeleteRowsEvent, HeartbeatLogEvent],
+            slave_heartbeat=REPLICATION_FLUSH_SECONDS
+        )
+        with REPLICATION_LOCK:
+            REPLICATION_STREAMS[job['job_id']]['stream'] = stream
+        last_flush = time.time()
+        
+        for event in stream:
+            if stop_event.is_set():
+                break
+            if isinstance(event, HeartbeatLogEvent):
+                # 心跳说明已追上源库，没有积压的变更
+                update_job(job, lag_seconds=0)
+            else:
+                for row in event.rows:
+                    if isinstance(event, UpdateRowsEvent):
+                        before = plan['transform_row'](tuple(row['before_values'].get(field) for field in source_fields))
+                        values = row['after_values']
+                        old_key = tuple(before[index] for index in key_indexes)
+                    else:
+                        values = row['values']
+                        old_key = None
+                    target_row = plan['transform_row'](tuple(values.get(field) for field in source_fields))
+                    key = tuple(target_row[index] for index in key_indexes)
+                    if isinstance(event, DeleteRowsEvent):
+                        changes[key] = None
+                    else:
+                        if old_key is not None and old_key != key:
+                            # 修改了键值：删除旧键对应的记录
+                            changes[old_key] = None
+                        changes[key] = target_row
+                add_job_progress(job, events_received=len(event.rows), rows_read=len(event.rows))
+                update_job(job, lag_seconds=max(0, round(time.time() - event.timestamp, 1)))
+            
+            if changes and (len(changes) >= REPLICATION_BATCH_ROWS or time.time() - last_flush >= REPLICATION_FLUSH_SECONDS):
+                flush()
+                last_flush = time.time()
+            elif not changes:
+                last_flush = time.time()
+        
+        if changes:
+            flush()
+        if not stop_event.is_set():
+            raise Error("binlog 流意外结束")
+        write_log("复制已停止")
+        finish_job(job, 'success', '复制已停止')
+        
+    except Exception as e:
+        if stop_event.is_set() and stream is not None:
+            # 停止复制时关闭 binlog 流会让读取中断，已收到的变更仍然写入目标表
+            try:
+                if changes:
+                    flush()
+                write_log("复制已停止")
+                finish_job(job, 'success', '复制已停止')
+            except Exception as flush_error:
+                write_log(f"停止复制时写入剩余变更失败: {flush_error}")
+                record_job_error(job, flush_error)
+                finish_job(job, 'failed', f"停止复制时写入剩余变更失败: {flush_error}")
+        else:
+            write_log(f"复制过程中发生错误: {e}")
+            record_job_error(job, e)
+            finish_job(job, 'failed', f"复制过程中发生错误: {e}")
+    finally:
+        with REPLICATION_LOCK:
+            REPLICATION_STREAMS.pop(job['job_id'], None)
+        if stream is not None:
+            try:
+                stream.close()
+            except Exception:
+                pass
+        if source_conn:
+            source_conn.close()
+        if target_conn:
+            target_conn.close()
+        bind_job_log(None)
+
+# 数据校验：两边按相同的键区间分块，先比较每块的行数和校验和，只有不一致的块才逐行比对键和行校验和
+def build_row_checksum_sql(columns, algorithm='crc32'):
+    """单行校验和表达式：各列用 # 连接（NULL 另外记标记，与空字符串区分）后取 CRC32 或 MD5 前 64 位"""
+    values = ', '.join([f"`{column}`" for column in columns])
+    null_flags = ', '.join([f"ISNULL(`{column}`)" for column in columns])
+    row_text = f"CONCAT_WS('#', {values}, CONCAT({null_flags}))"
+    if algorithm == 'md5':
+        return f"CAST(CONV(LEFT(MD5({row_text}), 16), 16, 10) AS UNSIGNED)"
+    return f"CRC32({row_text})"
+
+def build_key_range_where(key_columns, lower_key, upper_key):
+    """键区间 (lower_key, upper_key] 的 WHERE 子句和参数，None 表示不设边界"""
+    conditions = []
+    params = ()
+    if lower_key is not None:
+        conditions.append(build_key_condition(key_columns, '>'))
+        params += tuple(lower_key)
+    if upper_key is not None:
+        conditions.append(build_key_condition(key_columns, '<='))
+        params += tuple(upper_key)
+    return (f" WHERE {' AND '.join(conditions)}" if conditions else ''), params
+
+def build_verify_where(key_columns, lower_key, upper_key, source_filter=None):
+    """键区间 (lower_key, upper_key] 加上源表过滤条件的 WHERE 子句和参数"""
+    where_clause, params = build_key_range_where(key_columns, lower_key, upper_key)
+    filter_sql, filter_params = get_filter_sql(source_filter)
+    if filter_sql:
+        where_clause += f" {'AND' if where_clause else 'WHERE'} ({filter_sql})"
+        params += filter_params
+    return where_clause, params
+
+def get_chunk_checksum(cursor, table_name, key_columns, columns, lower_key, upper_key, algorithm):
+    """计算一个键区间的 (行数, 校验和之和)，校验和在数据库端聚合，只返回一行"""
+    where_clause, params = build_key_range_where(key_columns, lower_key, upper_key)
+    cursor.execute(f"SELECT COUNT(*), COALESCE(SUM({build_row_checksum_sql(columns, algorithm)}), 0) "
+                   f"FROM `{table_name}`{where_clause}", params or None)
+    count, checksum = cursor.fetchone()
+    return int(count), int(checksum)
+
+def get_chunk_row_checksums(cursor, table_name, key_columns, columns, lower_key, upper_key, algorithm,
+                            source_filter=None, keys=None):
+    """逐行取键区间内的 {键: 行校验和}，只传输键列和校验和
+    
+    source_filter 为附加的过滤条件；传入 keys 时只取这些键的记录（不再按键区间）。
+    """
+    key_list = ', '.join([f"`{column}`" for column in key_columns])
+    if keys is not None:
+        placeholder = '%s' if len(key_columns) == 1 else f"({', '.join(['%s'] * len(key_columns))})"
+        key_expression = key_list if len(key_columns) == 1 else f"({key_list})"
+        where_clause = f" WHERE {key_expression} IN ({', '.join([placeholder] * len(keys))})"
+        params = tuple(value for key in keys for value in key)
+    else:
+        where_clause, params = build_verify_where(key_columns, lower_key, upper_key, source_filter)
+    cursor.execute(f"SELECT {key_list}, {build_row_checksum_sql(columns, algorithm)} FROM `{table_name}`{where_clause}",
+                   params or None)
+    key_count = len(key_columns)
+    return {tuple(row[:key_count]): row[key_count] for row in cursor.fetchall()}
+
+def find_job_mapping(job_id):
+    """查找导入任务使用的源表、目标表、字段映射和源表范围（导入历史或检查点中），找不到时返回 None
+    
+    源表范围为 {'filters': 用户过滤条件, 'sync': 增量同步水位区间}，导入整个源表时为 None。
+    """
+    for entry in get_import_history():
+        if entry.get('job_id') == job_id and entry.get('field_mapping'):
+            return entry['source_table'], entry['target_table'], entry['field_mapping'], entry.get('source_scope')
+    checkpoint = load_checkpoint(job_id)
+    if checkpoint:
+        params = checkpoint['params']
+        filters = params['options'].get('filters') or []
+        source_scope = {'filters': filters, 'sync': checkpoint.get('sync')} if filters or checkpoint.get('sync') else None
+        return params['source_table'], params['target_table'], params['field_mapping'], source_scope
+    return None
+
+def verify_thread(job, source_table, target_table, field_mapping, algorithm='crc32', worker_count=None,
+                  source_scope=None):
+    """校验目标表与源表数据是否一致
+    
+    只比较字段映射中的字段（使用默认值的字段不比较），按目标表主键对应的源表字段切分键区间，
+    多个线程各用一对连接并行计算两边每块的行数和校验和；不一致的块再逐行比对，
+    找出目标表缺少、多出和内容不一致的记录键。
+    source_scope 为导入时的源表范围（过滤条件、增量同步水位区间）：只比较范围内的源表记录，
+    目标表中范围外的记录是正常的，此时逐行比对这些记录，不统计多出的记录。
+    """
+    start_time = time.time()
+    update_job(job, status='running', started_at=start_time)
+    write_log(f"开始校验 {source_table} -> {target_table}，校验算法: {algorithm}")
+    
+    source_conn = get_db_connection(SOURCE_DB)
+    target_conn = get_db_connection(TARGET_DB)
+    try:
+        if not source_conn or not target_conn:
+            raise Error("数据库连接失败")
+        
+        key_columns = get_pagination_key(target_conn, target_table)
+        if not key_columns or any(column not in field_mapping for column in key_columns):
+            raise Error("数据校验按目标表主键（或非空唯一索引）分块比对，这些字段必须映射到源表字段")
+        target_columns = list(field_mapping.keys())
+        source_columns = [field_mapping[column] for column in target_columns]
+        source_key_columns = [field_mapping[column] for column in key_columns]
+        source_filter = None
+        if source_scope:
+            source_field_names = [field['name'] for field in get_table_fields(source_conn, source_table)]
+            sync = source_scope.get('sync')
+            source_filter = combine_filters(build_watermark_filter(sync) if sync else None,
+                                            build_user_filter(source_scope.get('filters'), source_field_names))
+        if source_filter:
+            write_log(f"按导入时的源表范围校验: {source_filter['sql']}，不统计目标表多出的记录")
+        
+        cursor = source_conn.cursor()
+        where_clause, filter_params = build_verify_where(source_key_columns, None, None, source_filter)
+        cursor.execute(f"SELECT COUNT(*) FROM `{source_table}`{where_clause}", filter_params or None)
+        total_records = cursor.fetchone()[0]
+        cursor.close()
+        chunk_count = max(1, (total_records + VERIFY_CHUNK_ROWS - 1) // VERIFY_CHUNK_ROWS)
+        key_ranges = split_key_ranges(source_conn, source_table, source_key_columns, total_records, chunk_count,
+                                      source_filter)
+        source_conn.close()
+        source_conn = None
+        target_conn.close()
+        target_conn = None
+        
+        worker_count = max(1, min(int(worker_count or PARALLEL_WORKERS), len(key_ranges)))
+        update_job(job, total_records=total_records, total_chunks=len(key_ranges))
+        write_log(f"源表 {total_records} 条记录，切分为 {len(key_ranges)} 个校验块，使用 {worker_count} 个并行线程，"
+                  f"比较字段: {', '.join(target_columns)}")
+        
+        chunk_queue = queue.Queue()
+        for chunk_index, key_range in enumerate(key_ranges):
+            chunk_queue.put((chunk_index, key_range))
+        # 按源表范围校验时目标表没有对应的过滤条件，无法判断目标表多出的记录，结果中不包含 extra
+        diff_names = ('missing', 'different') if source_filter else ('missing', 'extra', 'different')
+        result = {'source_rows': 0, 'target_rows': 0, 'chunks_mismatched': 0, 'extra_checked': not source_filter}
+        for name in diff_names:
+            result[f'{name}_count'] = 0
+            result[f'{name}_keys'] = []
+        result_lock = threading.Lock()
+        errors = []
+        log_file = get_current_log_file()
+        
+        def worker():
+            bind_job_log(log_file)
+            worker_source = get_db_connection(SOURCE_DB)
+            worker_target = get_db_connection(TARGET_DB)
+            try:
+                if not worker_source or not worker_target:
+                    raise Error("校验线程数据库连接失败")
+                source_cursor = worker_source.cursor()
+                target_cursor = worker_target.cursor()
+                
+                while not errors:
+                    try:
+                        chunk_index, (lower_key, upper_key) = chunk_queue.get_nowait()
+                    except queue.Empty:
+                        return
+                    
+                    missing, extra, different = [], [], []
+                    if source_filter:
+                        # 只取范围内源表记录的键在目标表中的记录逐行比对
+                        source_rows = get_chunk_row_checksums(source_cursor, source_table, source_key_columns,
+                                                              source_columns, lower_key, upper_key, algorithm,
+                                                              source_filter)
+                        target_rows = get_chunk_row_checksums(target_cursor, target_table, key_columns, target_columns,
+                                                              lower_key, upper_key, algorithm,
+                                                              keys=list(source_rows)) if source_rows else {}
+                        source_count, target_count = len(source_rows), len(target_rows)
+                        missing = [key for key in source_rows if key not in target_rows]
+                        different = [key for key in source_rows if key in target_rows and source_rows[key] != target_rows[key]]
+                        mismatched = bool(missing or different)
+                        if mismatched:
+                            write_log(f"第 {chunk_index + 1} 块不一致: 缺少 {len(missing)} 条，内容不一致 {len(different)} 条")
+                    else:
+                        source_sum = get_chunk_checksum(source_cursor, source_table, source_key_columns,
+                                                        source_columns, lower_key, upper_key, algorithm)
+                        target_sum = get_chunk_checksum(target_cursor, target_table, key_columns, target_columns,
+                                                        lower_key, upper_key, algorithm)
+                        source_count, target_count = source_sum[0], target_sum[0]
+                        mismatched = source_sum != target_sum
+                        if mismatched:
+                            source_rows = get_chunk_row_checksums(source_cursor, source_table, source_key_columns,
+                                                                  source_columns, lower_key, upper_key, algorithm)
+                            target_rows = get_chunk_row_checksums(target_cursor, target_table, key_columns,
+                                                                  target_columns, lower_key, upper_key, algorithm)
+                            missing = [key for key in source_rows if key not in target_rows]
+                            extra = [key for key in target_rows if key not in source_rows]
+                            different = [key for key in source_rows
+                                         if key in target_rows and source_rows[key] != target_rows[key]]
+                            write_log(f"第 {chunk_index + 1} 块不一致: 缺少 {len(missing)} 条，多出 {len(extra)} 条，"
+                                      f"内容不一致 {len(different)} 条")
+                    
+                    with result_lock:
+                        result['source_rows'] += source_count
+                        result['target_rows'] += target_count
+                        if mismatched:
+                            result['chunks_mismatched'] += 1
+                        for name, keys in (('missing', missing), ('extra', extra), ('different', different)):
+                            if name not in diff_names:
+                                continue
+                            result[f'{name}_count'] += len(keys)
+                            room = VERIFY_MAX_KEYS - len(result[f'{name}_keys'])
+                            result[f'{name}_keys'].extend(encode_checkpoint_key(key) for key in sorted(keys)[:max(room, 0)])
+                    add_job_progress(job, chunks_done=1, rows_read=source_count)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                if worker_source:
+                    worker_source.close()
+                if worker_target:
+                    worker_target.close()
+        
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(worker_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+        
+        consistent = not any(result[f'{name}_count'] for name in diff_names)
+        result['consistent'] = consistent
+        result['key_columns'] = key_columns
+        result['filtered'] = bool(source_filter)
+        duration = time.time() - start_time
+        update_job(job, verify_result=result)
+        if consistent:
+            message = f"校验通过，{result['source_rows']} 条记录一致"
+        elif source_filter:
+            message = f"发现差异: 目标表缺少 {result['missing_count']} 条，内容不一致 {result['different_count']} 条"
+        else:
+            message = (f"发现差异: 目标表缺少 {result['missing_count']} 条，多出 {result['extra_count']} 条，"
+                       f"内容不一致 {result['different_count']} 条")
+        if source_filter:
+            message += "（按源表范围校验，未检查目标表多出的记录）"
+        write_log(f"{message}（不一致块 {result['chunks_mismatched']}/{len(key_ranges)}，耗时 {duration:.1f} 秒）")
+        finish_job(job, 'success', message)
+        
+    except Exception as e:
+        write_log(f"校验过程中发生错误: {e}")
+        record_job_error(job, e)
+        finish_job(job, 'failed', f"校验过程中发生错误: {e}")
+    finally:
+        if source_conn:
+            source_conn.close()
+        if target_conn:
+            target_conn.close()
+
+# 备份与恢复：CREATE TABLE LIKE 建表（保留索引），按主键分块执行 INSERT ... SELECT，每块提交一次；
+# 覆盖恢复先复制到新表，再用一条 RENAME TABLE 原子交换，恢复过程中目标表始终是完整数据
+def get_copy_columns(connection, from_table, to_table):
+    """表间复制的字段：两表都有、且在 to_table 中不是生成列的字段（生成列不能写入）"""
+    from_names = {field['name'] for field in get_table_fields(connection, from_table)}
+    columns = [field['name'] for field in get_table_fields(connection, to_table)
+               if field['name'] in from_names and 'GENERATED' not in (field['extra'] or '').upper()]
+    if not columns:
+        raise Error(f"{from_table} 和 {to_table} 没有可复制的共同字段")
+    return columns
+
+def get_swap_blockers(connection, table_name):
+    """交换表会丢失的对象：CREATE TABLE LIKE 不复制外键和触发器，被其他表外键引用时引用会跟随原表改名"""
+    blockers = []
+    database = TARGET_DB['database']
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            "SELECT COUNT(*) FROM information_schema.KEY_COLUMN_USAGE WHERE REFERENCED_TABLE_NAME IS NOT NULL "
+            "AND ((TABLE_SCHEMA = %s AND TABLE_NAME = %s) OR (REFERENCED_TABLE_SCHEMA = %s AND REFERENCED_TABLE_NAME = %s))",
+            (database, table_name, database, table_name)
+        )
+        if cursor.fetchone()[0]:
+            blockers.append('外键')
+        cursor.execute("SELECT COUNT(*) FROM information_schema.TRIGGERS "
+                       "WHERE EVENT_OBJECT_SCHEMA = %s AND EVENT_OBJECT_TABLE = %s", (database, table_name))
+        if cursor.fetchone()[0]:
+            blockers.append('触发器')
+    finally:
+        cursor.close()
+    return blockers
+
+def copy_table_chunks(connection, from_table, to_table, columns, key_columns, chunk_rows, total_records, job=None,
+                      max_retries=3):
+    """同一库内按键分块把 from_table 复制到 to_table，每块一条 INSERT ... SELECT 并提交，返回复制的记录数
+    
+    每块先沿键索引读取 chunk_rows 个键确定区间上界，再复制区间 (上一块上界, 本块上界]，
+    单个事务的大小不随表的大小增长；from_table 没有可用键时只能用一条语句整表复制。
+    """
+    column_list = ', '.join([f"`{column}`" for column in columns])
+    insert_sql = f"INSERT INTO `{to_table}` ({column_list}) SELECT {column_list} FROM `{from_table}`"
+    cursor = connection.cursor()
+    if not key_columns:
+        write_log(f"{from_table} 没有主键或非空唯一索引，不能分块，使用一条语句整表复制")
+        cursor.execute(insert_sql)
+        connection.commit()
+        cursor.close()
+        add_job_progress(job, pages_read=1, rows_read=total_records, rows_written=total_records)
+        return total_records
+    
+    last_key = None
+    copied = 0
+    chunk = 0
+    while True:
+        cursor.execute(build_keyset_query(from_table, key_columns, chunk_rows, last_key is not None,
+                                          columns=key_columns), last_key)
+        keys = cursor.fetchall()
+        if not keys:
+            break
+        upper_key = tuple(keys[-1])
+        where_clause, params = build_key_range_where(key_columns, last_key, upper_key)
+        label = f"第 {chunk + 1} 块"
+        
+        retry = 0
+        while True:
+            try:
+                cursor.execute(insert_sql + where_clause, params)
+                connection.commit()
+                break
+            except Error as e:
+                try:
+                    connection.rollback()
+                except Error:
+                    pass
+                retry += 1
+                record_job_error(job, f"{label}复制失败: {e}")
+                if not is_transient_error(e) or retry >= max_retries:
+                    write_log(f"{label}复制最终失败: {e}")
+                    raise
+                add_job_progress(job, retries=1)
+                write_log(f"{label}复制失败，重试 {retry}/{max_retries}: {e}")
+                time.sleep(2)
+                if not connection.is_connected():
+                    connection.reconnect(attempts=3, delay=2)
+                    init_session(connection)
+                    cursor = connection.cursor()
+        
+        copied += len(keys)
+        chunk += 1
+        last_key = upper_key
+        add_job_progress(job, pages_read=1, rows_read=len(keys), rows_written=len(keys))
+        update_job(job, current_key=[str(value) for value in last_key])
+        progress_percent = int(copied / total_records * 100) if total_records else 100
+        write_log(f"{label}已复制，累计 {copied}/{total_records} 条 (进度: {min(progress_percent, 100)}%)")
+    cursor.close()
+    return copied
+
+def count_table_rows(connection, table_name):
+    """统计表的记录数"""
+    cursor = connection.cursor()
+    cursor.execute(f"SELECT COUNT(*) FROM `{table_name}`")
+    count = cursor.fetchone()[0]
+    cursor.close()
+    return count
+
+def backup_thread(job, target_table, backup_table, chunk_rows=None):
+    """备份目标表：CREATE TABLE LIKE 建立同结构（含索引）的备份表，再按主键分块复制数据
+    
+    分块复制不是一致性快照，备份期间目标表上的写入可能只有一部分进入备份；
+    失败时删除未完成的备份表。
+    """
+    start_time = time.time()
+    update_job(job, status='running', started_at=start_time)
+    write_log(f"开始备份 {target_table} -> {backup_table}")
+    
+    target_conn = get_db_connection(TARGET_DB)
+    created = False
+    try:
+        if not target_conn:
+            raise Error("目标数据库连接失败")
+        chunk_rows = int(chunk_rows or BACKUP_CHUNK_ROWS)
+        
+        cursor = target_conn.cursor()
+        cursor.execute(f"CREATE TABLE `{backup_table}` LIKE `{target_table}`")
+        cursor.close()
+        created = True
+        
+        total_records = count_table_rows(target_conn, target_table)
+        key_columns = get_pagination_key(target_conn, target_table)
+        update_job(job, total_records=total_records, total_pages=(total_records + chunk_rows - 1) // chunk_rows)
+        write_log(f"已创建备份表 {backup_table}（结构和索引与 {target_table} 相同），共 {total_records} 条记录，"
+                  f"每块 {chunk_rows} 条")
+        
+        copied = copy_table_chunks(target_conn, target_table, backup_table,
+                                   get_copy_columns(target_conn, target_table, backup_table),
+                                   key_columns, chunk_rows, total_records, job)
+        update_job(job, total_records=copied)
+        message = f"备份成功！备份表: {backup_table}，记录数: {copied}"
+        write_log(f"{message}，耗时 {time.time() - start_time:.1f} 秒")
+        finish_job(job, 'success', message)
+        
+    except Exception as e:
+        write_log(f"备份过程中发生错误: {e}")
+        record_job_error(job, e)
+        finish_job(job, 'failed', f"备份过程中发生错误: {e}")
+        if created and target_conn:
+            try:
+                cursor = target_conn.cursor()
+                cursor.execute(f"DROP TABLE IF EXISTS `{backup_table}`")
+                cursor.close()
+                write_log(f"已删除未完成的备份表 {backup_table}")
+            except Error as drop_error:
+                write_log(f"删除未完成的备份表失败: {drop_error}")
+    finally:
+        if target_conn:
+            target_conn.close()
+        # 新建或删除了表，目标库表结构缓存失效
+        invalidate_schema_cache(TARGET_DB)
+
+def restore_thread(job, target_table, backup_table, restore_mode='overwrite', swap=True, keep_old=None,
+                   chunk_rows=None, from_file=False, workers=None):
+    """从备份表（from_file 为 True 时为 BACKUP_DIR 下的文件备份）恢复目标表
+    
+    备份表按键分块复制，文件备份由 workers 个线程并行 LOAD DATA 加载各块。
+    overwrite 模式默认先建立与目标表同结构的新表，复制完成后用一条 RENAME TABLE 把新表与目标表交换，
+    交换前目标表数据不变；目标表有外键或触发器（交换后会丢失）或 swap 为 False 时，
+    改为清空目标表后分块复制。append 模式直接把备份数据分块追加到目标表，
+    失败时已提交的块保留在目标表中。文件备份恢复到不存在的表时按备份中的建表语句建表。
+    """
+    start_time = time.time()
+    update_job(job, status='running', started_at=start_time)
+    write_log(f"开始从{'文件备份' if from_file else '备份表'} {backup_table} 恢复到 {target_table}，恢复模式: {restore_mode}")
+    
+    target_conn = get_db_connection(TARGET_DB)
+    swap_table = None
+    try:
+        if not target_conn:
+            raise Error("目标数据库连接失败")
+        chunk_rows = int(chunk_rows or BACKUP_CHUNK_ROWS)
+        keep_old = RESTORE_KEEP_OLD if keep_old is None else keep_old
+        cursor = target_conn.cursor()
+        
+        if from_file:
+            manifest = load_backup_manifest(backup_table)
+            total_records = manifest['total_rows']
+            cursor.execute("SELECT COUNT(*) FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+                           (target_table,))
+            if not cursor.fetchone()[0]:
+                cursor.execute(manifest['create_table'].replace(f"CREATE TABLE `{manifest['table']}`",
+                                                                f"CREATE TABLE `{target_table}`", 1))
+                write_log(f"目标表 {target_table} 不存在，已按备份中的建表语句创建")
+                restore_mode = 'append'
+            target_names = {field['name'] for field in get_table_fields(target_conn, target_table)}
+            missing = [column for column in manifest['columns'] if column not in target_names]
+            if missing:
+                raise Error(f"目标表缺少备份中的字段: {', '.join(missing)}")
+            worker_count = max(1, min(int(workers or BACKUP_WORKERS), len(manifest['chunks'])))
+            update_job(job, total_records=total_records, total_chunks=len(manifest['chunks']),
+                       total_pages=len(manifest['chunks']))
+            write_log(f"文件备份共 {len(manifest['chunks'])} 个数据块、{total_records} 条记录，使用 {worker_count} 个并行线程加载")
+            
+            def copy_into(to_table):
+                return load_backup_files(backup_table, manifest, to_table, worker_count, job)
+        else:
+            total_records = count_table_rows(target_conn, backup_table)
+            key_columns = get_pagination_key(target_conn, backup_table)
+            columns = get_copy_columns(target_conn, backup_table, target_table)
+            update_job(job, total_records=total_records, total_pages=(total_records + chunk_rows - 1) // chunk_rows)
+            
+            def copy_into(to_table):
+                return copy_table_chunks(target_conn, backup_table, to_table, columns, key_columns, chunk_rows,
+                                         total_records, job)
+        
+        if restore_mode == 'overwrite' and swap:
+            blockers = get_swap_blockers(target_conn, target_table)
+            if blockers:
+                write_log(f"目标表有{'、'.join(blockers)}，交换表后会丢失，改为清空目标表后分块复制")
+                swap = False
+        
+        if restore_mode == 'overwrite' and swap:
+            update_job(job, engine='swap')
+            stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            old_table = f"{target_table[:40]}_old_{stamp}"
+            cursor.execute(f"CREATE TABLE `{target_table[:40]}_restore_{job['job_id']}` LIKE `{target_table}`")
+            swap_table = f"{target_table[:40]}_restore_{job['job_id']}"
+            write_log(f"已创建临时表 {swap_table}，复制完成后与 {target_table} 交换")
+            restored = copy_into(swap_table)
+            # 一条 RENAME TABLE 同时完成两次改名，其他连接看不到目标表不存在或为空的中间状态
+            cursor.execute(f"RENAME TABLE `{target_table}` TO `{old_table}`, `{swap_table}` TO `{target_table}`")
+            swap_table = None
+            if keep_old:
+                write_log(f"已交换表，原表数据保留在 {old_table}")
+            else:
+                cursor.execute(f"DROP TABLE `{old_table}`")
+                write_log("已交换表并删除原表")
+        else:
+            update_job(job, engine='truncate' if restore_mode == 'overwrite' else 'append')
+            if restore_mode == 'overwrite':
+                cursor.execute(f"TRUNCATE TABLE `{target_table}`")
+            restored = copy_into(target_table)
+        cursor.close()
+        
+        message = f"恢复成功！从 {backup_table} 恢复了 {restored} 条记录到 {target_table}"
+        write_log(f"{message}，耗时 {time.time() - start_time:.1f} 秒")
+        finish_job(job, 'success', message)
+        
+    except Exception as e:
+        write_log(f"恢复过程中发生错误: {e}")
+        record_job_error(job, e)
+        finish_job(job, 'failed', f"恢复过程中发生错误: {e}")
+        if swap_table and target_conn:
+            try:
+                cursor = target_conn.cursor()
+                cursor.execute(f"DROP TABLE IF EXISTS `{swap_table}`")
+                cursor.close()
+                write_log(f"目标表未改动，已删除临时表 {swap_table}")
+            except Error as drop_error:
+                write_log(f"删除临时表失败: {drop_error}")
+    finally:
+        if target_conn:
+            target_conn.close()
+        invalidate_schema_cache(TARGET_DB)
+
+# 文件备份：BACKUP_DIR/<备份名>/ 下为 manifest.json 和按键区间切分的 chunk_NNNNN.tsv.gz，
+# 数据块为 gzip 压缩的 LOAD DATA 文本格式（二进制列为十六进制），多个线程并行导出、并行加载
+def get_backup_dir(backup_name):
+    """文件备份目录，备份名只能包含字母、数字、下划线、连字符和点"""
+    if not backup_name or backup_name.startswith('.') or not all(ch.isalnum() or ch in '_-.' for ch in backup_name):
+        raise Error(f"备份名不合法: {backup_name}")
+    return os.path.join(BACKUP_DIR, backup_name)
+
+def load_backup_manifest(backup_name):
+    """读取文件备份的清单"""
+    manifest_file = os.path.join(get_backup_dir(backup_name), 'manifest.json')
+    if not os.path.isfile(manifest_file):
+        raise Error(f"文件备份 {backup_name} 不存在")
+    with open(manifest_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def list_file_backups():
+    """列出已完成的文件备份（有清单的目录），新的在前"""
+    backups = []
+    if not os.path.isdir(BACKUP_DIR):
+        return backups
+    for name in os.listdir(BACKUP_DIR):
+        try:
+            manifest = load_backup_manifest(name)
+        except (Error, OSError, ValueError):
+            continue
+        backups.append({
+            'name': name,
+            'table': manifest['table'],
+            'created_at': manifest['created_at'],
+            'total_rows': manifest['total_rows'],
+            'file_bytes': sum(chunk['file_bytes'] for chunk in manifest['chunks'])
+        })
+    backups.sort(key=lambda item: item['created_at'], reverse=True)
+    return backups
+
+def export_backup_chunk(cursor, table_name, columns, key_columns, key_range, hex_indexes, path):
+    """把一个键区间的记录以 LOAD DATA 文本格式写入 gzip 文件，返回 (记录数, 未压缩字节数)"""
+    where_clause, params = build_key_range_where(key_columns, *key_range)
+    order_clause = f" ORDER BY {', '.join([f'`{column}`' for column in key_columns])}" if key_columns else ''
+    cursor.execute(f"SELECT {build_select_list(columns)} FROM `{table_name}`{where_clause}{order_clause}",
+                   params or None)
+    rows = raw_bytes = 0
+    with gzip.open(path, 'wb', compresslevel=BACKUP_GZIP_LEVEL) as f:
+        while True:
+            batch = cursor.fetchmany(STREAM_BUFFER_ROWS)
+            if not batch:
+                break
+            data = b''.join(iter_load_data_lines(batch, hex_indexes))
+            f.write(data)
+            rows += len(batch)
+            raw_bytes += len(data)
+    return rows, raw_bytes
+
+def file_backup_thread(job, target_table, backup_name, chunk_rows=None, workers=None):
+    """把目标表备份为文件：按键切分为约 chunk_rows 条一块的区间，多个线程各用一个连接并行导出
+    
+    先写入 <备份名>.partial 目录，全部数据块和清单写完后再改名，未完成的备份不会出现在备份列表中；
+    清单记录建表语句、字段、各块文件和记录数。各块在不同连接上读取，不是一致性快照。
+    """
+    start_time = time.time()
+    update_job(job, status='running', started_at=start_time)
+    write_log(f"开始备份 {target_table} 到文件 {backup_name}")
+    
+    target_conn = get_db_connection(TARGET_DB)
+    partial_dir = None
+    try:
+        if not target_conn:
+            raise Error("目标数据库连接失败")
+        backup_dir = get_backup_dir(backup_name)
+        if os.path.exists(backup_dir):
+            raise Error(f"文件备份 {backup_name} 已存在")
+        chunk_rows = int(chunk_rows or BACKUP_CHUNK_ROWS)
+        
+        fields = [field for field in get_table_fields(target_conn, target_table)
+                  if 'GENERATED' not in (field['extra'] or '').upper()]
+        if not fields:
+            raise Error(f"无法读取表 {target_table} 的字段")
+        columns = [field['name'] for field in fields]
+        hex_indexes = {index for index, field in enumerate(fields)
+                       if field['type'].lower().split('(')[0] in BINARY_COLUMN_TYPES}
+        key_columns = get_pagination_key(target_conn, target_table)
+        total_records = count_table_rows(target_conn, target_table)
+        cursor = target_conn.cursor()
+        cursor.execute(f"SHOW CREATE TABLE `{target_table}`")
+        create_table = cursor.fetchone()[1]
+        cursor.close()
+        
+        chunk_count = max(1, (total_records + chunk_rows - 1) // chunk_rows) if key_columns else 1
+        if not key_columns:
+            write_log(f"{target_table} 没有主键或非空唯一索引，不能分块，导出为一个数据块")
+        key_ranges = split_key_ranges(target_conn, target_table, key_columns, total_records, chunk_count)
+        target_conn.close()
+        target_conn = None
+        
+        worker_count = max(1, min(int(workers or BACKUP_WORKERS), len(key_ranges)))
+        update_job(job, total_records=total_records, total_chunks=len(key_ranges), total_pages=len(key_ranges))
+        write_log(f"{target_table} 共 {total_records} 条记录，切分为 {len(key_ranges)} 个数据块，"
+                  f"使用 {worker_count} 个并行线程导出")
+        
+        partial_dir = backup_dir + '.partial'
+        shutil.rmtree(partial_dir, ignore_errors=True)
+        os.makedirs(partial_dir)
+        chunk_queue = queue.Queue()
+        for chunk_index, key_range in enumerate(key_ranges):
+            chunk_queue.put((chunk_index, key_range))
+        chunks = [None] * len(key_ranges)
+        errors = []
+        log_file = get_current_log_file()
+        
+        def worker():
+            bind_job_log(log_file)
+            connection = get_db_connection(TARGET_DB)
+            try:
+                if not connection:
+                    raise Error("导出线程数据库连接失败")
+                cursor = connection.cursor()
+                while not errors:
+                    try:
+                        chunk_index, key_range = chunk_queue.get_nowait()
+                    except queue.Empty:
+                        return
+                    file_name = f"chunk_{chunk_index + 1:05d}.tsv.gz"
+                    path = os.path.join(partial_dir, file_name)
+                    rows, raw_bytes = export_backup_chunk(cursor, target_table, columns, key_columns, key_range,
+                                                          hex_indexes, path)
+                    chunks[chunk_index] = {'file': file_name, 'rows': rows, 'bytes': raw_bytes,
+                                           'file_bytes': os.path.getsize(path)}
+                    add_job_progress(job, chunks_done=1, pages_read=1, rows_read=rows, rows_written=rows)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                if connection:
+                    connection.close()
+        
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(worker_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+        
+        manifest = {
+            'version': 1,
+            'table': target_table,
+            'database': TARGET_DB['database'],
+            'created_at': datetime.now().isoformat(),
+            'format': 'tsv.gz',
+            'create_table': create_table,
+            'columns': columns,
+            'hex_columns': [columns[index] for index in sorted(hex_indexes)],
+            'key_columns': key_columns,
+            'total_rows': sum(chunk['rows'] for chunk in chunks),
+            'chunks': chunks
+        }
+        with open(os.path.join(partial_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.rename(partial_dir, backup_dir)
+        partial_dir = None
+        
+        raw_bytes = sum(chunk['bytes'] for chunk in chunks)
+        file_bytes = sum(chunk['file_bytes'] for chunk in chunks)
+        update_job(job, total_records=manifest['total_rows'])
+        message = (f"备份成功！备份文件: {backup_dir}，记录数: {manifest['total_rows']}，"
+                   f"压缩后 {file_bytes} 字节（原始 {raw_bytes} 字节）")
+        write_log(f"{message}，耗时 {time.time() - start_time:.1f} 秒")
+        finish_job(job, 'success', message)
+        
     except Exception as e:
-        print(f"读取导入历史错误: {e}")
-        return []
+        write_log(f"备份过程中发生错误: {e}")
+        record_job_error(job, e)
+        finish_job(job, 'failed', f"备份过程中发生错误: {e}")
+        if partial_dir:
+            shutil.rmtree(partial_dir, ignore_errors=True)
+    finally:
+        if target_conn:
+            target_conn.close()
+
+def load_backup_files(backup_name, manifest, to_table, worker_count, job=None, max_retries=3):
+    """多个线程并行把文件备份的各块用 LOAD DATA LOCAL INFILE 加载到 to_table，每块提交一次，返回加载的记录数
+    
+    数据块边解压边写入命名管道，不在磁盘上生成解压后的文件；与目标表主键重复的记录跳过。
+    """
+    backup_dir = get_backup_dir(backup_name)
+    hex_indexes = {index for index, column in enumerate(manifest['columns']) if column in manifest['hex_columns']}
+    load_data_sql = build_load_data_sql(to_table, manifest['columns'], 'load_insert', hex_indexes)
+    chunk_queue = queue.Queue()
+    for chunk in manifest['chunks']:
+        chunk_queue.put(chunk)
+    loaded = {'rows': 0}
+    loaded_lock = threading.Lock()
+    errors = []
+    log_file = get_current_log_file()
+    
+    def worker():
+        bind_job_log(log_file)
+        connection = get_db_connection(get_target_db_config('load_insert'))
+        try:
+            if not connection:
+                raise Error("加载线程数据库连接失败")
+            cursor = connection.cursor()
+            while not errors:
+                try:
+                    chunk = chunk_queue.get_nowait()
+                except queue.Empty:
+                    return
+                chunk_path = os.path.join(backup_dir, chunk['file'])
+                
+                def feed(file_obj):
+                    with gzip.open(chunk_path, 'rb') as chunk_file:
+                        shutil.copyfileobj(chunk_file, file_obj, 1024 * 1024)
+                    return chunk['bytes']
+                
+                retry = 0
+                while True:
+                    try:
+                        run_load_data(cursor, load_data_sql, feed)
+                        connection.commit()
+                        break
+                    except Error as e:
+                        try:
+                            connection.rollback()
+                        except Error:
+                            pass
+                        retry += 1
+                        record_job_error(job, f"{chunk['file']} 加载失败: {e}")
+                        if not is_transient_error(e) or retry >= max_retries:
+                            write_log(f"{chunk['file']} 加载最终失败: {e}")
+                            raise
+                        add_job_progress(job, retries=1)
+                        write_log(f"{chunk['file']} 加载失败，重试 {retry}/{max_retries}: {e}")
+                        time.sleep(2)
+                        if not connection.is_connected():
+                            connection.reconnect(attempts=3, delay=2)
+                            init_session(connection)
+                            cursor = connection.cursor()
+                
+                add_job_progress(job, chunks_done=1, pages_read=1, rows_read=chunk['rows'], rows_written=chunk['rows'])
+                with loaded_lock:
+                    loaded['rows'] += chunk['rows']
+                write_log(f"{chunk['file']} 已加载 {chunk['rows']} 条")
+        except Exception as e:
+            errors.append(e)
+        finally:
+            if connection:
+                connection.close()
+    
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(worker_count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return loaded['rows']
 
-def import_data_thread(source_table, target_table, field_mapping, default_values, import_mode, page_size=None):
-    """数据导入线程"""
+def import_data_thread(source_table, target_table, field_mapping, default_values, import_mode, page_size=None, options=None,
+                       job=None, checkpoint=None):
+    """数据导入线程，进度记入 job（见 /jobs 接口）
+    
+    登记了任务时每批提交后写入检查点；传入 checkpoint 时从其中记录的位置继续导入。
+    """
     start_time = time.time()
-    write_log("开始数据导入...")
+    options = options or {}
+    update_job(job, status='running', started_at=start_time)
+    job_extra = {'job_id': job['job_id']} if job else {}
+    resuming = checkpoint is not None
+    if job and checkpoint is None:
+        checkpoint = new_checkpoint(job, source_table, target_table, field_mapping, default_values, import_mode,
+                                    page_size, options)
+    write_log("从检查点继续数据导入..." if resuming else "开始数据导入...")
     
     # 使用传入的页面大小，如果没有则使用默认值
     actual_page_size = page_size if page_size else PAGE_SIZE
@@ -292,146 +3979,286 @@ def import_data_thread(source_table, target_table, field_mapping, default_values
     
     # 连接源数据库和目标数据库
     source_conn = get_db_connection(SOURCE_DB)
-    target_conn = get_db_connection(TARGET_DB)
+    target_conn = get_db_connection(get_target_db_config(import_mode))
     
     if not source_conn or not target_conn:
         write_log("数据库连接失败")
         duration = time.time() - start_time
-        save_import_history(source_table, target_table, field_mapping, import_mode, '失败', 0, duration)
+        save_import_history(source_table, target_table, field_mapping, import_mode, '失败', 0, duration, job_extra)
+        finish_job(job, 'failed', '数据库连接失败')
+        if checkpoint is not None:
+            checkpoint.update(status='failed', message='数据库连接失败')
+            save_checkpoint(checkpoint)
+        if source_conn:
+            source_conn.close()
+        if target_conn:
+            target_conn.close()
         return
     
+    writer = None
     try:
+        # 增量同步：只读取水位区间内的记录，从检查点继续时沿用原来的水位区间
+        sync = None
+        if options.get('incremental'):
+            if resuming and checkpoint.get('sync'):
+                sync = checkpoint['sync']
+            else:
+                sync = prepare_incremental_sync(source_conn, source_table, target_table, options.get('watermark_column'))
+            if checkpoint is not None:
+                checkpoint['sync'] = sync
+            write_log(f"增量同步，水位列: {sync['column']}，"
+                      f"同步区间: {'首次同步（全部记录）' if sync['low'] is None else sync['low']} ~ {sync['high']}")
+        source_fields = get_table_fields(source_conn, source_table)
+        if sync:
+            # 写入前检查，避免修改过的记录被跳过后水位仍然推进
+            mode_error = get_incremental_mode_error(import_mode, source_fields, sync['column'])
+            if mode_error:
+                raise Error(mode_error)
+        # 用户过滤条件下推到源库，与水位条件一起作用于计数、切分和读取
+        source_field_names = [field['name'] for field in source_fields]
+        user_filter = build_user_filter(options.get('filters'), source_field_names)
+        if user_filter:
+            write_log(f"源表过滤条件: {describe_user_filter(options['filters'])}")
+        source_filter = combine_filters(build_watermark_filter(sync) if sync else None, user_filter)
+        if source_filter:
+            # 记录源表范围，校验时只比较范围内的源表记录
+            job_extra['source_scope'] = {'filters': options.get('filters') or [], 'sync': sync}
+            update_job(job, source_scope=job_extra['source_scope'])
+        filter_sql, filter_params = get_filter_sql(source_filter)
+        
         # 获取源表总记录数
         source_cursor = source_conn.cursor()
-        source_cursor.execute(f"SELECT COUNT(*) FROM `{source_table}`")
+        where_clause = f" WHERE {filter_sql}" if filter_sql else ''
+        source_cursor.execute(f"SELECT COUNT(*) FROM `{source_table}`{where_clause}", filter_params or None)
         total_records = source_cursor.fetchone()[0]
-        write_log(f"源表 {source_table} 总记录数: {total_records}")
+        write_log(f"源表 {source_table} {'待同步' if sync or user_filter else '总'}记录数: {total_records}")
         
         # 计算总页数
         total_pages = (total_records + actual_page_size - 1) // actual_page_size
         write_log(f"将分 {total_pages} 页导入，每页 {actual_page_size} 条记录")
+        update_job(job, total_records=total_records, total_pages=total_pages)
         
         # 准备目标表字段 - 包括映射字段和默认值字段
         target_fields = list(field_mapping.keys()) + list(default_values.keys())
         # 去重并保持顺序
         target_fields = list(dict.fromkeys(target_fields))
-        target_fields_str = ', '.join([f"`{field}`" for field in target_fields])
         
         print(f"目标字段列表: {target_fields}")
         print(f"映射字段: {list(field_mapping.keys())}")
         print(f"默认值字段: {list(default_values.keys())}")
         
-        # 准备SQL语句
-        if import_mode == 'overwrite':
-            sql_template = f"REPLACE INTO `{target_table}` ({target_fields_str}) VALUES ({', '.join(['%s'] * len(target_fields))})"
+        # 准备写入器：REPLACE INTO 或 INSERT IGNORE，executemany 或多行 INSERT
+        write_method = options.get('write_method') or 'executemany'
+        write_stats = new_write_stats()
+        max_retries = 3
+        
+        import_engine = options.get('engine') or 'paged'
+        # 选择分页方式：优先键集分页，无可用键时回退到 OFFSET 分页；流式导入有键时按键排序读取
+        key_columns = get_pagination_key(source_conn, source_table)
+        if key_columns:
+            write_log(f"使用键集分页，分页键: {', '.join(key_columns)}")
+        elif import_engine == 'stream':
+            write_log("源表没有主键或非空唯一索引，流式导入中断后只能从头导入")
         else:
-            sql_template = f"INSERT IGNORE INTO `{target_table}` ({target_fields_str}) VALUES ({', '.join(['%s'] * len(target_fields))})"
+            write_log("源表没有主键或非空唯一索引，使用 LIMIT/OFFSET 分页")
         
-        target_cursor = target_conn.cursor()
-        imported_records = 0
+        # 列投影：只读取映射用到的源字段和分页键
+        columns = get_source_columns(source_field_names, field_mapping, key_columns)
+        skipped_columns = [field for field in source_field_names if field not in columns]
+        if skipped_columns:
+            write_log(f"只读取 {len(columns)}/{len(source_field_names)} 个源字段，不读取未映射字段: {', '.join(skipped_columns)}")
         
-        # 分页导入数据
-        for page in range(total_pages):
-            offset = page * actual_page_size
-            progress_percent = int((page / total_pages) * 100)
-            write_log(f"正在导入第 {page + 1}/{total_pages} 页... (进度: {progress_percent}%)")
-            
-            # 移除健康检查，避免与主查询冲突
-            # 如果需要检查连接，可以在重试机制中处理
-            
-            # 重试机制
-            max_retries = 3
-            for retry in range(max_retries):
-                try:
-                    # 查询源表数据
-                    source_cursor.execute(f"SELECT * FROM `{source_table}` LIMIT {actual_page_size} OFFSET {offset}")
-                    source_data = source_cursor.fetchall()
-                    break  # 成功则跳出重试循环
-                except Error as e:
-                    if retry < max_retries - 1:
-                        write_log(f"第 {page + 1} 页查询失败，重试 {retry + 1}/{max_retries}: {e}")
-                        time.sleep(2)  # 等待2秒后重试
-                        continue
-                    else:
-                        raise e  # 最后一次重试失败，抛出异常
-            
-            # 获取源表字段名
-            source_fields = [desc[0] for desc in source_cursor.description]
-            
-            # 转换数据
-            converted_data = []
-            for row in source_data:
-                converted_row = []
-                for target_field in target_fields:
-                    source_field = field_mapping.get(target_field)
-                    if source_field and source_field in source_fields:
-                        # 从源表获取数据
-                        source_index = source_fields.index(source_field)
-                        converted_row.append(row[source_index])
-                    else:
-                        # 使用默认值
-                        default_value = default_values.get(target_field, '')
-                        
-                        # 如果默认值为空字符串，尝试转换为None（让数据库使用字段默认值）
-                        if default_value == '':
-                            converted_row.append(None)
-                        else:
-                            # 尝试转换默认值的类型
-                            try:
-                                # 如果是数字字符串，转换为数字
-                                if default_value.isdigit():
-                                    converted_value = int(default_value)
-                                    converted_row.append(converted_value)
-                                elif default_value.replace('.', '').isdigit():
-                                    converted_value = float(default_value)
-                                    converted_row.append(converted_value)
-                                else:
-                                    converted_row.append(default_value)
-                            except Exception as e:
-                                converted_row.append(default_value)
-                converted_data.append(converted_row)
+        if import_engine == 'async' and aiomysql is None:
+            write_log("异步导入需要安装 aiomysql（pip install aiomysql），改用并行导入")
+            import_engine = 'parallel'
+        elif import_engine == 'async' and is_load_data_mode(import_mode):
+            write_log("异步导入不支持 LOAD DATA 模式，改用并行导入")
+            import_engine = 'parallel'
+        isolate_errors = options.get('isolate_errors')
+        if isolate_errors is None:
+            isolate_errors = ISOLATE_ERRORS
+        if import_engine == 'async' and isolate_errors:
+            write_log("异步导入不支持失败隔离，改用并行导入")
+            import_engine = 'parallel'
+        if import_engine in ('parallel', 'async') and not key_columns:
+            write_log("并行导入需要按键切分源表，改用单线程分页导入")
+            import_engine = 'paged'
+        # 同一 MySQL 实例上的源表和目标表直接在服务器端复制
+        if choose_server_copy(options, import_mode, source_conn, target_conn, source_table, target_table, key_columns):
+            if isolate_errors:
+                write_log("失败隔离需要逐批写入，不使用同服务器复制")
+            elif options.get('server_copy') is None:
+                write_log("未指定导入引擎和写入方式，源表和目标表在同一 MySQL 实例上，自动改用同服务器复制")
+                import_engine = 'server'
+            else:
+                ignored = [value for value in (options.get('engine'), options.get('write_method')) if value]
+                write_log(f"已指定同服务器复制，改用服务器端 INSERT ... SELECT"
+                          f"{'（不使用所选的 ' + ' / '.join(ignored) + '）' if ignored else ''}")
+                import_engine = 'server'
+        # 任务中记录实际使用的引擎（可能因条件不满足而回退）
+        update_job(job, engine=import_engine)
+        quarantine = new_quarantine(job, target_table, target_fields) if isolate_errors else None
+        if quarantine:
+            write_log(f"已开启失败隔离，写入失败的记录隔离到 {quarantine['path']}")
+        
+        if resuming:
+            # 分页键、引擎或页面大小变化后原来的位置不再可靠，只能从头导入
+            if (checkpoint['engine'] != import_engine or checkpoint['key_columns'] != key_columns or
+                    (import_engine == 'stream' and not key_columns)):
+                write_log("源表分页键或导入方式与检查点不一致，从头导入")
+                checkpoint.update(last_key=None, pages_done=0, rows_done=0, chunks=None)
+            else:
+                write_log(f"检查点位置: 已提交 {checkpoint['rows_done']} 条记录，跳过已导入的数据")
+            update_job(job, rows_read=checkpoint['rows_done'], rows_written=checkpoint['rows_done'])
+        if checkpoint is not None:
+            checkpoint.update(engine=import_engine, key_columns=key_columns, status='running', message='')
+            # 记录实际页面大小，OFFSET 分页从断点继续时按同样的页面大小计算偏移
+            checkpoint['params']['page_size'] = actual_page_size
+            save_checkpoint(checkpoint)
+        # 自适应页面大小只用于单线程键集分页（OFFSET 分页的偏移按固定页面大小计算）
+        page_size_controller = None
+        adaptive_page_size = options.get('adaptive_page_size')
+        if adaptive_page_size is None:
+            adaptive_page_size = ADAPTIVE_PAGE_SIZE
+        if adaptive_page_size and import_engine == 'paged' and key_columns:
+            page_size_controller = new_page_size_controller(actual_page_size, job)
+            write_log(f"启用自适应页面大小，初始 {page_size_controller['size']} 条，"
+                      f"范围 {PAGE_SIZE_MIN} ~ {PAGE_SIZE_MAX} 条")
+        commit_policy = get_commit_policy(options, import_engine)
+        bulk_session = options.get('bulk_session')
+        if bulk_session is None:
+            bulk_session = BULK_SESSION
+        if import_engine == 'async':
+            write_log("异步导入每页单独提交，不使用提交策略和批量加载会话")
+        elif import_engine == 'server' and commit_policy['mode'] != 'page':
+            write_log("同服务器复制每块单独提交，不使用提交策略")
+        elif commit_policy['mode'] != 'page':
+            write_log(f"提交策略: {format_commit_policy(commit_policy)}")
+        start_key = decode_checkpoint_key(checkpoint['last_key']) if checkpoint else None
+        start_page = checkpoint['pages_done'] if checkpoint else 0
+        previous_records = checkpoint['rows_done'] if checkpoint else 0
+        
+        if import_engine == 'server':
+            saved_session = apply_bulk_session(target_conn) if bulk_session else {}
+            try:
+                imported_records = run_server_copy(source_conn, target_conn, source_table, target_table, target_fields,
+                                                   field_mapping, default_values, source_field_names, import_mode,
+                                                   key_columns, SERVER_COPY_CHUNK_ROWS, total_records, write_stats,
+                                                   max_retries, job, checkpoint, start_key, source_filter)
+            finally:
+                if saved_session:
+                    restore_session_variables(target_conn, saved_session)
+        elif import_engine == 'parallel':
+            worker_count = max(1, int(options.get('workers') or PARALLEL_WORKERS))
+            # 每个线程占用源库、目标库各一个连接，主线程另占两个；
+            # 同一目标库上可能同时运行多个任务，按并发任务数分摊连接池容量
+            concurrent_jobs = max(1, min(MAX_CONCURRENT_JOBS, MAX_JOBS_PER_SOURCE, MAX_JOBS_PER_TARGET))
+            pool_limit = max(1, (POOL_SIZE // concurrent_jobs - 2) // 2)
+            if worker_count > pool_limit:
+                write_log(f"并行线程数 {worker_count} 超过连接池容量，调整为 {pool_limit}")
+                worker_count = pool_limit
+            imported_records = run_parallel_import(source_table, target_table, target_fields, field_mapping, default_values,
+                                                   import_mode, write_method, key_columns, actual_page_size, worker_count,
+                                                   total_records, write_stats, max_retries, job, checkpoint, source_filter,
+                                                   commit_policy, bulk_session, columns, quarantine)
+        elif import_engine == 'async':
+            concurrency = max(1, int(options.get('workers') or ASYNC_CONCURRENCY))
+            if write_method != 'executemany':
+                write_log("异步导入使用 aiomysql 的 executemany 写入（自动合并为多行 INSERT）")
+            imported_records = run_async_import(source_table, target_table, target_fields, field_mapping, default_values,
+                                                import_mode, key_columns, actual_page_size, concurrency, total_records,
+                                                write_stats, max_retries, job, checkpoint, source_filter, columns)
+        else:
+            if import_engine == 'stream':
+                # 流式导入：无缓冲游标 + fetchmany，内存中只保留一批在途记录
+                buffer_rows = int(options.get('stream_buffer_rows') or STREAM_BUFFER_ROWS)
+                write_log(f"使用流式导入，内存中最多保留 {buffer_rows} 条在途记录")
+                source_cursor.close()
+                source_cursor = source_conn.cursor(buffered=False)
+                total_batches = (total_records + buffer_rows - 1) // buffer_rows
+                update_job(job, total_pages=total_batches)
+                source_batches = iter_source_stream(source_cursor, source_table, buffer_rows, total_batches, job,
+                                                    key_columns, start_key, start_page, source_filter, columns)
+            else:
+                source_batches = iter_source_pages(source_cursor, source_table, actual_page_size, total_pages, key_columns,
+                                                   max_retries, start_key=start_key, job=job, start_page=start_page,
+                                                   source_filter=source_filter, page_size_controller=page_size_controller,
+                                                   columns=columns)
             
-            # 批量插入目标表 - 添加重试机制
-            if converted_data:
-                insert_success = False
-                for retry in range(max_retries):
-                    try:
-                        target_cursor.executemany(sql_template, converted_data)
-                        target_conn.commit()
-                        imported_records += len(converted_data)
-                        write_log(f"第 {page + 1} 页导入完成，共 {len(converted_data)} 条记录，累计导入 {imported_records}/{total_records} 条")
-                        insert_success = True
-                        break  # 成功则跳出重试循环
-                    except Error as e:
-                        if retry < max_retries - 1:
-                            write_log(f"第 {page + 1} 页插入失败，重试 {retry + 1}/{max_retries}: {e}")
-                            target_conn.rollback()  # 回滚事务
-                            time.sleep(2)  # 等待2秒后重试
-                            continue
-                        else:
-                            write_log(f"第 {page + 1} 页插入最终失败: {e}")
-                            raise e  # 最后一次重试失败，抛出异常
-                
-                if not insert_success:
-                    write_log(f"第 {page + 1} 页导入失败，跳过此页")
-                    continue
+            if import_engine == 'pipeline':
+                # 流水线导入：本线程读取，写入线程各占目标库一个连接，按并发任务数分摊连接池容量
+                writer_count = max(1, int(options.get('workers') or PIPELINE_WRITERS))
+                concurrent_jobs = max(1, min(MAX_CONCURRENT_JOBS, MAX_JOBS_PER_TARGET))
+                pool_limit = max(1, POOL_SIZE // concurrent_jobs - 2)
+                if writer_count > pool_limit:
+                    write_log(f"写入线程数 {writer_count} 超过连接池容量，调整为 {pool_limit}")
+                    writer_count = pool_limit
+                write_log(f"使用流水线导入，预读 {PIPELINE_QUEUE_PAGES} 页，{writer_count} 个写入线程")
+                imported_records = import_source_batches_pipelined(
+                    source_batches, source_cursor, target_table, target_fields, field_mapping, default_values,
+                    import_mode, write_method, writer_count, total_records, write_stats, max_retries, key_columns,
+                    checkpoint, job, start_page, commit_policy, bulk_session, quarantine)
+            else:
+                writer = create_batch_writer(target_conn, target_table, target_fields, import_mode, write_method, job,
+                                             commit_policy, bulk_session, quarantine)
+                imported_records = import_source_batches(source_batches, source_cursor, writer, target_fields,
+                                                         field_mapping, default_values, total_records, max_retries,
+                                                         key_columns, checkpoint, page_size_controller)
+                merge_write_stats(write_stats, writer['stats'])
         
+        # 从检查点继续时，总数包含之前已提交的记录
+        imported_records += previous_records
+        write_log(f"写入统计: {format_write_stats(write_stats)}")
         write_log(f"数据导入完成！总共导入 {imported_records} 条记录")
         
+        history_extra = dict(job_extra, write_stats=write_stats)
+        finish_message = f"导入完成，共 {imported_records} 条记录"
+        if quarantine and quarantine['rows']:
+            history_extra['quarantine'] = {'rows': quarantine['rows'], 'file': quarantine['path']}
+            finish_message += f"，其中 {quarantine['rows']} 条写入失败已隔离"
+            write_log(f"共隔离 {quarantine['rows']} 条写入失败的记录，详见 {quarantine['path']}")
+        if page_size_controller:
+            history_extra['page_sizes'] = [{'size': item['size'], 'reason': item['reason']}
+                                           for item in page_size_controller['history']]
+        if sync:
+            # 同步成功后才推进水位，失败时下次仍从原水位开始
+            if sync['high'] is not None:
+                save_watermark(source_table, target_table, sync['column'], sync['high'])
+            history_extra['watermark'] = {'column': sync['column'], 'from': sync['low'], 'to': sync['high']}
+            write_log(f"增量同步水位已更新: {sync['column']} = {sync['high']}")
+        
         # 保存成功的历史记录
         duration = time.time() - start_time
-        save_import_history(source_table, target_table, field_mapping, import_mode, '成功', imported_records, duration)
+        save_import_history(source_table, target_table, field_mapping, import_mode, '成功', imported_records, duration,
+                            history_extra)
+        finish_job(job, 'success', finish_message)
+        if job:
+            delete_checkpoint(job['job_id'])
         
     except Error as e:
         write_log(f"导入过程中发生错误: {e}")
+        record_job_error(job, e)
+        finish_job(job, 'failed', f"导入过程中发生错误: {e}")
+        if checkpoint is not None:
+            checkpoint.update(status='failed', message=str(e))
+            save_checkpoint(checkpoint)
+            write_log(f"已保存检查点（已提交 {checkpoint['rows_done']} 条记录），可从断点继续导入")
         # 保存失败的历史记录
         duration = time.time() - start_time
-        save_import_history(source_table, target_table, field_mapping, import_mode, '失败', 0, duration)
+        save_import_history(source_table, target_table, field_mapping, import_mode, '失败', 0, duration, job_extra)
     finally:
+        if writer:
+            close_batch_writer(writer)
         if source_conn:
             source_conn.close()
         if target_conn:
             target_conn.close()
+        # 非数据库异常导致线程退出时，任务不能一直停留在运行中
+        if job and job['status'] == 'running':
+            finish_job(job, 'failed', '导入线程异常退出')
+            if checkpoint is not None:
+                checkpoint.update(status='failed', message='导入线程异常退出')
+                save_checkpoint(checkpoint)
 
 @app.route('/')
 def index():
@@ -500,6 +4327,11 @@ def update_config():
             global PAGE_SIZE
             PAGE_SIZE = int(data['page_size'])
         
+        # 连接信息可能已变化，重建连接池并清空表结构缓存
+        if 'source_db' in data or 'target_db' in data:
+            reset_connection_pools()
+            invalidate_schema_cache()
+        
         return jsonify({'success': True, 'message': '配置更新成功'})
         
     except Exception as e:
@@ -513,7 +4345,8 @@ def test_connection():
         db_config = data.get('db_config')
         db_type = data.get('db_type')
         
-        conn = get_db_connection(db_config)
+        # 测试任意配置，不经过连接池
+        conn = open_db_connection(db_config)
         if conn:
             conn.close()
             return jsonify({'success': True, 'message': f'{db_type}数据库连接成功'})
@@ -532,22 +4365,16 @@ def get_tables_api():
         
         print(f"收到获取表列表请求: {db_type}")
         
-        if db_type == 'source':
-            db_config = SOURCE_DB
-            conn = get_db_connection(SOURCE_DB)
-        else:
-            db_config = TARGET_DB
-            conn = get_db_connection(TARGET_DB)
+        db_config = SOURCE_DB if db_type == 'source' else TARGET_DB
         
-        if not conn:
+        print(f"开始获取{db_type}数据库表列表...")
+        tables = get_cached_tables(db_config)
+        
+        if tables is None:
             error_msg = f'{db_type}数据库连接失败。请检查配置: host={db_config["host"]}, port={db_config["port"]}, user={db_config["user"]}, database={db_config["database"]}'
             print(error_msg)
             return jsonify({'success': False, 'message': error_msg})
         
-        print(f"开始获取{db_type}数据库表列表...")
-        tables = get_tables(conn)
-        conn.close()
-        
         print(f"成功获取{len(tables)}个表: {tables}")
         return jsonify({'success': True, 'tables': tables})
         
@@ -571,25 +4398,19 @@ def get_fields_api():
             return jsonify({'success': False, 'message': '请选择源表和目标表'})
         
         # 获取源表字段
-        source_conn = get_db_connection(SOURCE_DB)
-        if not source_conn:
+        print(f"开始获取源表字段: {source_table}")
+        source_fields = get_cached_table_fields(SOURCE_DB, source_table)
+        if source_fields is None:
             print("错误: 源数据库连接失败")
             return jsonify({'success': False, 'message': '源数据库连接失败'})
         
-        print(f"开始获取源表字段: {source_table}")
-        source_fields = get_table_fields(source_conn, source_table)
-        source_conn.close()
-        
         # 获取目标表字段
-        target_conn = get_db_connection(TARGET_DB)
-        if not target_conn:
+        print(f"开始获取目标表字段: {target_table}")
+        target_fields = get_cached_table_fields(TARGET_DB, target_table)
+        if target_fields is None:
             print("错误: 目标数据库连接失败")
             return jsonify({'success': False, 'message': '目标数据库连接失败'})
         
-        print(f"开始获取目标表字段: {target_table}")
-        target_fields = get_table_fields(target_conn, target_table)
-        target_conn.close()
-        
         # 提取字段名列表
         source_field_names = [field['name'] for field in source_fields]
         target_field_names = [field['name'] for field in target_fields]
@@ -632,77 +4453,84 @@ def validate_import():
         if not field_mapping:
             return jsonify({'success': False, 'message': '请至少映射一个字段'})
         
-        # 连接数据库验证
-        source_conn = get_db_connection(SOURCE_DB)
-        target_conn = get_db_connection(TARGET_DB)
-        
-        if not source_conn:
+        # 验证表是否存在（字段信息走表结构缓存）
+        source_fields = get_cached_table_fields(SOURCE_DB, source_table)
+        if source_fields is None:
             return jsonify({'success': False, 'message': '源数据库连接失败'})
-        
-        if not target_conn:
-            return jsonify({'success': False, 'message': '目标数据库连接失败'})
-        
-        # 验证表是否存在
-        source_cursor = source_conn.cursor()
-        source_cursor.execute(f"SHOW TABLES LIKE '{source_table}'")
-        if not source_cursor.fetchone():
-            source_conn.close()
-            target_conn.close()
+        if not source_fields:
             return jsonify({'success': False, 'message': f'源表 {source_table} 不存在'})
         
-        target_cursor = target_conn.cursor()
-        target_cursor.execute(f"SHOW TABLES LIKE '{target_table}'")
-        if not target_cursor.fetchone():
-            source_conn.close()
-            target_conn.close()
+        target_fields = get_cached_table_fields(TARGET_DB, target_table)
+        if target_fields is None:
+            return jsonify({'success': False, 'message': '目标数据库连接失败'})
+        if not target_fields:
             return jsonify({'success': False, 'message': f'目标表 {target_table} 不存在'})
         
         # 验证字段映射
-        source_fields = get_table_fields(source_conn, source_table)
-        target_fields = get_table_fields(target_conn, target_table)
-        
         source_field_names = [f['name'] for f in source_fields]
         target_field_names = [f['name'] for f in target_fields]
         
         # 检查映射的字段是否存在
         for target_field, source_field in field_mapping.items():
             if target_field not in target_field_names:
-                source_conn.close()
-                target_conn.close()
                 return jsonify({'success': False, 'message': f'目标字段 {target_field} 不存在'})
             
             if source_field not in source_field_names:
-                source_conn.close()
-                target_conn.close()
                 return jsonify({'success': False, 'message': f'源字段 {source_field} 不存在'})
         
-        source_conn.close()
-        target_conn.close()
+        # 过滤条件和列投影与导入时一致
+        try:
+            build_user_filter(data.get('filters'), source_field_names)
+        except Error as e:
+            return jsonify({'success': False, 'message': str(e)})
+        # 分页键与导入时相同（主键，没有主键时为非空唯一索引）
+        source_conn = get_db_connection(SOURCE_DB)
+        if not source_conn:
+            return jsonify({'success': False, 'message': '源数据库连接失败'})
+        try:
+            key_columns = get_pagination_key(source_conn, source_table)
+        finally:
+            source_conn.close()
+        columns = get_source_columns(source_field_names, field_mapping, key_columns)
         
-        return jsonify({'success': True, 'message': '配置验证通过'})
+        return jsonify({
+            'success': True,
+            'message': '配置验证通过',
+            'source_columns': columns,
+            'skipped_columns': [field for field in source_field_names if field not in columns]
+        })
         
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
+def resolve_log_file(job_id):
+    """按任务ID定位日志文件，未指定任务时使用公共日志；任务ID非法时返回 None"""
+    if not job_id:
+        return LOG_FILE
+    if not job_id.isalnum():
+        return None
+    return get_job_log_file(job_id)
+
+# 日志推送连接的心跳间隔，以及没有新日志时保持连接的最长时间（秒）
+LOG_STREAM_KEEPALIVE = 15
+LOG_STREAM_IDLE_TIMEOUT = 300
+
 @app.route('/get_log', methods=['GET'])
 def get_log():
-    """获取导入日志"""
+    """获取导入日志：job_id 指定任务日志，带 offset 参数时只返回该字节偏移之后的新内容和新的偏移"""
     try:
-        if os.path.exists(LOG_FILE):
-            # 尝试不同的编码方式读取文件
-            encodings = ['utf-8', 'gbk', 'utf-8-sig']
-            log_content = ""
-            
-            for encoding in encodings:
-                try:
-                    with open(LOG_FILE, 'r', encoding=encoding) as f:
-                        log_content = f.read()
-                    break
-                except UnicodeDecodeError:
-                    continue
-            
-            if not log_content:
-                log_content = "日志文件编码错误，无法读取\n"
+        log_file = resolve_log_file(request.args.get('job_id'))
+        if not log_file:
+            return jsonify({'success': False, 'message': '任务ID不合法', 'log': ''})
+        
+        offset = request.args.get('offset', type=int)
+        if offset is not None:
+            chunk = read_log_since(max(offset, 0), log_file=log_file)
+            return jsonify({'success': True, **chunk})
+        
+        if os.path.exists(log_file):
+            with open(log_file, 'rb') as f:
+                log_content = decode_log_bytes(f.read())
         else:
             log_content = "日志文件不存在\n"
         
@@ -710,6 +4538,50 @@ def get_log():
     except Exception as e:
         return jsonify({'success': False, 'message': str(e), 'log': f'读取日志失败: {e}'})
 
+@app.route('/log_stream', methods=['GET'])
+def log_stream():
+    """以 Server-Sent Events 推送新日志，事件 id 为字节偏移，断线重连时从 Last-Event-ID 继续
+    
+    指定的任务结束且日志推送完后发送 end 事件并结束；超过 LOG_STREAM_IDLE_TIMEOUT 秒没有新日志时也结束连接。
+    """
+    log_file = resolve_log_file(request.args.get('job_id'))
+    if not log_file:
+        return jsonify({'success': False, 'message': '任务ID不合法'})
+    
+    job_id = request.args.get('job_id')
+    offset = request.headers.get('Last-Event-ID', type=int)
+    if offset is None:
+        offset = request.args.get('offset', 0, type=int)
+    
+    def generate(offset):
+        idle_seconds = 0
+        while True:
+            # 先取任务状态再读日志，结束前写入的最后几行日志不会漏掉
+            job = get_job(job_id) if job_id else None
+            finished = bool(job_id) and (job is None or job['status'] in ('success', 'failed'))
+            chunk = read_log_since(offset, log_file=log_file)
+            if chunk['log'] or chunk['reset']:
+                offset = chunk['offset']
+                idle_seconds = 0
+                yield f"id: {offset}\ndata: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+                continue
+            if finished:
+                # 任务已结束（或已不在内存中）且日志已全部推送，通知客户端关闭连接
+                status = job['status'] if job else None
+                yield f"event: end\ndata: {json.dumps({'status': status})}\n\n"
+                return
+            if idle_seconds >= LOG_STREAM_IDLE_TIMEOUT:
+                # 长时间没有新日志时结束连接，释放服务端线程，浏览器会按 Last-Event-ID 重连
+                return
+            with LOG_CONDITION:
+                notified = LOG_CONDITION.wait(timeout=LOG_STREAM_KEEPALIVE)
+            if not notified:
+                idle_seconds += LOG_STREAM_KEEPALIVE
+                yield ": keep-alive\n\n"
+    
+    return Response(stream_with_context(generate(max(offset, 0))), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/start_import', methods=['POST'])
 def start_import():
     """开始数据导入"""
@@ -734,13 +4606,10 @@ def start_import():
             return jsonify({'success': False, 'message': '请选择源表和目标表'})
         
         # 验证字段映射中的目标字段是否存在于目标表中
-        target_conn = get_db_connection(TARGET_DB)
-        if not target_conn:
+        target_fields = get_cached_table_fields(TARGET_DB, target_table)
+        if target_fields is None:
             return jsonify({'success': False, 'message': '无法连接目标数据库'})
         
-        target_fields = get_table_fields(target_conn, target_table)
-        target_conn.close()
-        
         if not target_fields:
             return jsonify({'success': False, 'message': f'无法获取目标表 {target_table} 的字段信息'})
         
@@ -764,27 +4633,338 @@ def start_import():
             print("验证失败: 缺少字段映射")
             return jsonify({'success': False, 'message': '请至少映射一个字段'})
         
-        print("验证通过，清空日志文件...")
+        print("验证通过，提交导入任务...")
+        
+        # 导入引擎参数
+        options = {
+            'engine': data.get('engine'),  # paged 分页 / stream 流式 / parallel 并行 / pipeline 流水线 / async 异步，不指定时为 paged
+            'stream_buffer_rows': data.get('stream_buffer_rows'),
+            'workers': data.get('workers'),
+            'write_method': data.get('write_method'),  # executemany / multi_row 多行INSERT，不指定时为 executemany
+            'incremental': bool(data.get('incremental')),  # 增量同步：只复制水位之后变化的记录
+            'watermark_column': data.get('watermark_column'),  # 水位列，不指定时自动识别
+            'adaptive_page_size': data.get('adaptive_page_size'),  # 自适应页面大小，不指定时取 ADAPTIVE_PAGE_SIZE
+            'commit_policy': data.get('commit_policy'),  # page / rows / seconds / chunk，不指定时取 COMMIT_POLICY
+            'commit_value': data.get('commit_value'),  # rows、seconds 策略的记录数或秒数
+            'bulk_session': data.get('bulk_session'),  # 批量加载会话，不指定时取 BULK_SESSION
+            'filters': data.get('filters') or [],  # 源表过滤条件 [{'column', 'op', 'value'}]，下推到源库
+            'server_copy': data.get('server_copy'),  # 同服务器复制，不指定时取 SERVER_COPY，false 时不使用
+            'isolate_errors': data.get('isolate_errors')  # 失败隔离，不指定时取 ISOLATE_ERRORS
+        }
+        if options['commit_policy'] and options['commit_policy'] not in COMMIT_POLICIES:
+            return jsonify({'success': False, 'message': f"不支持的提交策略: {options['commit_policy']}"})
+        if options['incremental']:
+            mode_error = get_incremental_mode_error(import_mode, get_cached_table_fields(SOURCE_DB, source_table) or [],
+                                                    options['watermark_column'])
+            if mode_error:
+                return jsonify({'success': False, 'message': mode_error})
+        if options['filters']:
+            source_fields = get_cached_table_fields(SOURCE_DB, source_table)
+            if source_fields is None:
+                return jsonify({'success': False, 'message': '无法连接源数据库'})
+            try:
+                build_user_filter(options['filters'], [field['name'] for field in source_fields])
+            except Error as e:
+                return jsonify({'success': False, 'message': str(e)})
+        
+        # 登记任务并放入调度队列，由调度线程按优先级和并发限制执行
+        job = create_import_job(source_table, target_table, import_mode, options, int(data.get('priority') or 0))
+        submit_import_job(job, import_data_thread,
+                          (source_table, target_table, field_mapping, default_values, import_mode, data.get('page_size'), options, job))
+        
+        print(f"导入任务已提交，任务ID: {job['job_id']}")
+        return jsonify({'success': True, 'message': '导入任务已提交', 'job_id': job['job_id']})
+        
+    except Exception as e:
+        print(f"启动导入任务错误: {e}")
+        return jsonify({'success': False, 'message': str(e)})
+
+@app.route('/jobs', methods=['GET'])
+def list_jobs():
+    """导入任务列表（最新的在前）"""
+    with IMPORT_JOBS_LOCK:
+        jobs = list(IMPORT_JOBS.values())
+    jobs.sort(key=lambda job: job['created_at'], reverse=True)
+    return jsonify({'success': True, 'jobs': [get_job_snapshot(job) for job in jobs], 'scheduler': get_scheduler_stats()})
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_detail(job_id):
+    """单个导入任务的实时进度"""
+    job = get_job(job_id)
+    if not job:
+        return jsonify({'success': False, 'message': f'任务 {job_id} 不存在'})
+    return jsonify({'success': True, 'job': get_job_snapshot(job)})
+
+@app.route('/watermarks', methods=['GET'])
+def get_watermarks():
+    """各 源表 -> 目标表 的增量同步水位"""
+    return jsonify({'success': True, 'watermarks': list(load_watermarks().values())})
+
+@app.route('/reset_watermark', methods=['POST'])
+def reset_watermark_api():
+    """清除水位，下次增量同步复制全部记录"""
+    try:
+        data = request.get_json()
+        if reset_watermark(data.get('source_table'), data.get('target_table')):
+            return jsonify({'success': True, 'message': '水位已清除，下次增量同步将复制全部记录'})
+        return jsonify({'success': False, 'message': '该表没有增量同步水位'})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+@app.route('/checkpoints', methods=['GET'])
+def get_checkpoints():
+    """可从断点继续的导入任务（含程序重启前留下的检查点）"""
+    try:
+        checkpoints = [{
+            'job_id': checkpoint['job_id'],
+            'status': checkpoint['status'],
+            'source_table': checkpoint['params']['source_table'],
+            'target_table': checkpoint['params']['target_table'],
+            'import_mode': checkpoint['params']['import_mode'],
+            'engine': checkpoint['engine'],
+            'rows_done': checkpoint['rows_done'],
+            'message': checkpoint['message'],
+            'updated_at': checkpoint['updated_at']
+        } for checkpoint in list_checkpoints()]
+        return jsonify({'success': True, 'checkpoints': checkpoints})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+@app.route('/quarantine/<job_id>', methods=['GET'])
+def get_quarantine(job_id):
+    """查看任务隔离的失败记录（最多返回 limit 条，默认 100）"""
+    try:
+        if not job_id.isalnum():
+            return jsonify({'success': False, 'message': '任务ID不合法'})
+        path = os.path.join(QUARANTINE_DIR, f"{job_id}.jsonl")
+        if not os.path.exists(path):
+            return jsonify({'success': True, 'records': [], 'total': 0})
+        limit = request.args.get('limit', 100, type=int)
+        records = []
+        total = 0
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                total += 1
+                if len(records) < limit:
+                    records.append(json.loads(line))
+        return jsonify({'success': True, 'records': records, 'total': total, 'file': path})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+@app.route('/resume/<job_id>', methods=['POST'])
+def resume_import(job_id):
+    """从检查点继续导入：沿用原任务的表、字段映射和导入参数，跳过已提交的数据"""
+    try:
+        if not job_id.isalnum():
+            return jsonify({'success': False, 'message': '任务ID不合法'})
+        
+        job = get_job(job_id)
+        if job and job['status'] in ('pending', 'running'):
+            return jsonify({'success': False, 'message': f'任务 {job_id} 正在排队或运行中'})
+        
+        checkpoint = load_checkpoint(job_id)
+        if not checkpoint:
+            return jsonify({'success': False, 'message': f'任务 {job_id} 没有检查点，无法继续'})
+        
+        params = checkpoint['params']
+        job = create_import_job(params['source_table'], params['target_table'], params['import_mode'], params['options'],
+                                params.get('priority', 0), job_id=job_id)
+        submit_import_job(job, import_data_thread,
+                          (params['source_table'], params['target_table'], params['field_mapping'], params['default_values'],
+                           params['import_mode'], params['page_size'], params['options'], job, checkpoint))
+        
+        print(f"导入任务已从检查点继续，任务ID: {job_id}，已提交 {checkpoint['rows_done']} 条记录")
+        return jsonify({'success': True, 'message': f"任务已从断点继续（已导入 {checkpoint['rows_done']} 条记录）",
+                        'job_id': job_id})
+        
+    except Exception as e:
+        print(f"继续导入任务错误: {e}")
+        return jsonify({'success': False, 'message': str(e)})
+
+@app.route('/start_migration', methods=['POST'])
+def start_migration():
+    """库级迁移：一次迁移多个表（不指定 tables 时为源库全部表），按外键依赖顺序并行导入"""
+    try:
+        data = request.get_json()
+        import_mode = data.get('import_mode', 'insert')
+        table_mappings = data.get('table_mappings') or {}
+        
+        tables = data.get('tables') or get_cached_tables(SOURCE_DB)
+        if tables is None:
+            return jsonify({'success': False, 'message': '无法连接源数据库'})
+        if not tables:
+            return jsonify({'success': False, 'message': '没有需要迁移的表'})
+        
+        plans, skipped = build_migration_plans(tables, table_mappings)
+        if not plans:
+            return jsonify({'success': False, 'message': '没有可迁移的表', 'skipped': skipped})
+        dependencies, weights = order_migration_plans(plans)
+        
+        options = {
+            'engine': data.get('engine'),
+            'stream_buffer_rows': data.get('stream_buffer_rows'),
+            'workers': data.get('workers'),
+            'write_method': data.get('write_method'),
+            'incremental': bool(data.get('incremental')),
+            'watermark_column': data.get('watermark_column'),
+            'commit_policy': data.get('commit_policy'),
+            'commit_value': data.get('commit_value'),
+            'bulk_session': data.get('bulk_session'),
+            'server_copy': data.get('server_copy'),
+            'isolate_errors': data.get('isolate_errors')
+        }
+        if options['commit_policy'] and options['commit_policy'] not in COMMIT_POLICIES:
+            return jsonify({'success': False, 'message': f"不支持的提交策略: {options['commit_policy']}"})
+        if options['incremental']:
+            mode_errors = []
+            for plan in plans:
+                mode_error = get_incremental_mode_error(
+                    import_mode, get_cached_table_fields(SOURCE_DB, plan['source_table']) or [], options['watermark_column'])
+                if mode_error:
+                    mode_errors.append(f"{plan['source_table']}: {mode_error}")
+            if mode_errors:
+                return jsonify({'success': False, 'message': '；'.join(mode_errors)})
+        
+        job = create_import_job(f"{len(plans)} 个表", TARGET_DB['database'], import_mode, options,
+                                int(data.get('priority') or 0))
+        update_job(job, kind='migration', child_jobs=[], tables_total=len(plans), tables_done=0,
+                   tables_skipped=len(skipped), total_records=sum(plan['estimated_rows'] for plan in plans))
+        for item in skipped:
+            record_job_error(job, f"表 {item['table']} 跳过: {item['reason']}")
+        
+        # 协调线程只负责按依赖顺序提交子任务，不占用调度线程
+        thread = threading.Thread(
+            target=migration_thread,
+            args=(job, plans, dependencies, weights, import_mode, data.get('page_size'), options)
+        )
+        thread.daemon = True
+        thread.start()
+        
+        return jsonify({
+            'success': True,
+            'message': f'库级迁移已启动，共 {len(plans)} 个表',
+            'job_id': job['job_id'],
+            'tables': [{'source_table': plan['source_table'], 'target_table': plan['target_table'],
+                        'mapping_source': plan['mapping_source'],
+                        'depends_on': sorted(dependencies[plan['source_table']])} for plan in plans],
+            'skipped': skipped
+        })
+        
+    except Exception as e:
+        print(f"启动库级迁移错误: {e}")
+        return jsonify({'success': False, 'message': str(e)})
+
+@app.route('/start_replication', methods=['POST'])
+def start_replication():
+    """binlog 复制：初始快照后持续把源表的新增、修改、删除同步到目标表，直到调用 /stop_replication"""
+    try:
+        if BinLogStreamReader is None:
+            return jsonify({'success': False, 'message': 'binlog 复制需要安装 mysql-replication: pip install mysql-replication'})
+        
+        data = request.get_json()
+        source_table = data.get('source_table')
+        target_table = data.get('target_table')
+        field_mapping = data.get('field_mapping', {})
+        default_values = data.get('default_values', {})
+        
+        if not source_table or not target_table:
+            return jsonify({'success': False, 'message': '请选择源表和目标表'})
+        if not field_mapping:
+            return jsonify({'success': False, 'message': '请至少映射一个字段'})
+        
+        target_fields = get_cached_table_fields(TARGET_DB, target_table)
+        if target_fields is None:
+            return jsonify({'success': False, 'message': '无法连接目标数据库'})
+        target_field_names = [field['name'] for field in target_fields]
+        invalid_fields = [field for field in field_mapping if field not in target_field_names]
+        if invalid_fields:
+            return jsonify({'success': False, 'message': f"字段映射中包含不存在的目标字段: {invalid_fields}。请重新加载字段映射。"})
+        
+        with REPLICATION_LOCK:
+            running = [get_job(job_id) for job_id in REPLICATION_STREAMS]
+        if any(job and job['source_table'] == source_table and job['target_table'] == target_table for job in running):
+            return jsonify({'success': False, 'message': f'{source_table} -> {target_table} 已在复制中'})
         
-        # 清空日志文件
-        with open(LOG_FILE, 'w', encoding='utf-8') as f:
-            f.write('')
+        # 初始快照使用的导入参数
+        options = {
+            'engine': data.get('engine'),
+            'stream_buffer_rows': data.get('stream_buffer_rows'),
+            'workers': data.get('workers'),
+            'write_method': data.get('write_method'),
+            'snapshot': data.get('snapshot', True) is not False  # false 时跳过初始快照（目标表已是最新）
+        }
         
-        print("启动导入线程...")
+        job = create_import_job(source_table, target_table, 'overwrite', options, int(data.get('priority') or 0))
+        update_job(job, kind='replication', engine='binlog', child_jobs=[], binlog_file=None, binlog_pos=None,
+                   events_received=0, rows_deleted=0, batches_applied=0, lag_seconds=None, applied_at=None)
         
-        # 启动导入线程
+        # 复制线程长期运行，不占用调度线程；初始快照作为子任务交给调度器
         thread = threading.Thread(
-            target=import_data_thread,
-            args=(source_table, target_table, field_mapping, default_values, import_mode, data.get('page_size'))
+            target=replication_thread,
+            args=(job, source_table, target_table, field_mapping, default_values, data.get('page_size'), options)
         )
         thread.daemon = True
         thread.start()
         
-        print("导入线程已启动")
-        return jsonify({'success': True, 'message': '导入任务已启动'})
+        return jsonify({'success': True, 'message': 'binlog 复制已启动', 'job_id': job['job_id']})
         
     except Exception as e:
-        print(f"启动导入任务错误: {e}")
+        print(f"启动 binlog 复制错误: {e}")
+        return jsonify({'success': False, 'message': str(e)})
+
+@app.route('/stop_replication/<job_id>', methods=['POST'])
+def stop_replication(job_id):
+    """停止 binlog 复制：已收到的变更写入目标表后结束任务"""
+    with REPLICATION_LOCK:
+        entry = REPLICATION_STREAMS.get(job_id)
+    if not entry:
+        return jsonify({'success': False, 'message': f'任务 {job_id} 不是运行中的复制任务'})
+    
+    entry['stop'].set()
+    if entry['stream'] is not None:
+        # 关闭 binlog 连接，让阻塞等待新事件的读取立即返回
+        try:
+            entry['stream'].close()
+        except Exception as e:
+            print(f"关闭 binlog 流错误: {e}")
+    return jsonify({'success': True, 'message': '正在停止复制'})
+
+@app.route('/verify', methods=['POST'])
+def start_verify():
+    """校验目标表与源表数据是否一致：传 job_id 时沿用该导入任务的表和字段映射"""
+    try:
+        data = request.get_json()
+        algorithm = data.get('algorithm', 'crc32')
+        if algorithm not in ('crc32', 'md5'):
+            return jsonify({'success': False, 'message': '校验算法只支持 crc32 和 md5'})
+        
+        if data.get('job_id'):
+            if not str(data['job_id']).isalnum():
+                return jsonify({'success': False, 'message': '任务ID不合法'})
+            found = find_job_mapping(data['job_id'])
+            if not found:
+                return jsonify({'success': False, 'message': f"找不到任务 {data['job_id']} 的字段映射"})
+            source_table, target_table, field_mapping, source_scope = found
+        else:
+            source_table = data.get('source_table')
+            target_table = data.get('target_table')
+            field_mapping = data.get('field_mapping', {})
+            source_scope = {'filters': data['filters']} if data.get('filters') else None
+        
+        if not source_table or not target_table:
+            return jsonify({'success': False, 'message': '请选择源表和目标表'})
+        if not field_mapping:
+            return jsonify({'success': False, 'message': '请至少映射一个字段'})
+        
+        job = create_import_job(source_table, target_table, 'verify', priority=int(data.get('priority') or 0))
+        update_job(job, kind='verify', engine=algorithm, verify_result=None)
+        submit_import_job(job, verify_thread, (job, source_table, target_table, field_mapping, algorithm, data.get('workers'),
+                                               source_scope))
+        
+        return jsonify({'success': True, 'message': '校验任务已提交', 'job_id': job['job_id']})
+        
+    except Exception as e:
+        print(f"启动数据校验错误: {e}")
         return jsonify({'success': False, 'message': str(e)})
 
 @app.route('/preview_data', methods=['POST'])
@@ -793,14 +4973,35 @@ def preview_data():
     try:
         data = request.get_json()
         source_table = data.get('source_table')
-        limit = data.get('limit', 10)  # 默认预览10条记录
+        limit = int(data.get('limit', 10))  # 默认预览10条记录
+        field_mapping = data.get('field_mapping') or {}
+        
+        # 传入字段映射和过滤条件时按导入时的列投影和过滤条件预览
+        columns = None
+        source_filter = None
+        if field_mapping or data.get('filters'):
+            source_fields = get_cached_table_fields(SOURCE_DB, source_table)
+            if source_fields is None:
+                return jsonify({'success': False, 'message': '源数据库连接失败'})
+            source_field_names = [field['name'] for field in source_fields]
+            try:
+                source_filter = build_user_filter(data.get('filters'), source_field_names)
+            except Error as e:
+                return jsonify({'success': False, 'message': str(e)})
+        filter_sql, filter_params = get_filter_sql(source_filter)
+        where_clause = f" WHERE {filter_sql}" if filter_sql else ''
         
         conn = get_db_connection(SOURCE_DB)
         if not conn:
             return jsonify({'success': False, 'message': '源数据库连接失败'})
         
+        if field_mapping:
+            # 分页键与导入时相同（主键，没有主键时为非空唯一索引）
+            columns = get_source_columns(source_field_names, field_mapping, get_pagination_key(conn, source_table))
+        
         cursor = conn.cursor()
-        cursor.execute(f"SELECT * FROM `{source_table}` LIMIT {limit}")
+        cursor.execute(f"SELECT {build_select_list(columns)} FROM `{source_table}`{where_clause} LIMIT {limit}",
+                       filter_params or None)
         data = cursor.fetchall()
         
         # 获取字段名
@@ -829,46 +5030,49 @@ def preview_data():
 
 @app.route('/backup', methods=['POST'])
 def backup_data():
-    """备份目标表数据"""
+    """备份目标表数据：提交后台备份任务，format 为 table 时备份到同结构的备份表，为 file 时导出为压缩文件"""
     try:
         data = request.get_json()
         target_table = data.get('target_table')
         backup_name = data.get('backup_name', f"{target_table}_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+        backup_format = data.get('format', 'table')
         
         if not target_table:
             return jsonify({'success': False, 'message': '请选择要备份的表'})
+        if backup_format not in ('table', 'file'):
+            return jsonify({'success': False, 'message': '备份格式只支持 table 和 file'})
         
-        # 连接目标数据库
-        target_conn = get_db_connection(TARGET_DB)
-        if not target_conn:
-            return jsonify({'success': False, 'message': '目标数据库连接失败'})
-        
-        # 创建备份表
-        backup_table = f"{backup_name}"
-        cursor = target_conn.cursor()
+        if backup_format == 'file':
+            if os.path.exists(get_backup_dir(backup_name)):
+                return jsonify({'success': False, 'message': f'文件备份 {backup_name} 已存在'})
+            job = create_import_job(target_table, backup_name, 'backup', priority=int(data.get('priority') or 0))
+            update_job(job, kind='backup', engine='file')
+            submit_import_job(job, file_backup_thread, (job, target_table, backup_name, data.get('chunk_rows'),
+                                                        data.get('workers')))
+            return jsonify({
+                'success': True,
+                'message': f'备份任务已提交，备份文件: {backup_name}',
+                'backup_file': backup_name,
+                'job_id': job['job_id']
+            })
         
         # 检查备份表是否已存在
-        cursor.execute(f"SHOW TABLES LIKE '{backup_table}'")
-        if cursor.fetchone():
-            cursor.close()
-            target_conn.close()
+        all_tables = get_cached_tables(TARGET_DB)
+        if all_tables is None:
+            return jsonify({'success': False, 'message': '目标数据库连接失败'})
+        backup_table = f"{backup_name}"
+        if backup_table in all_tables:
             return jsonify({'success': False, 'message': f'备份表 {backup_table} 已存在'})
         
-        # 创建备份表
-        cursor.execute(f"CREATE TABLE `{backup_table}` AS SELECT * FROM `{target_table}`")
-        
-        # 获取备份记录数
-        cursor.execute(f"SELECT COUNT(*) FROM `{backup_table}`")
-        backup_count = cursor.fetchone()[0]
-        
-        cursor.close()
-        target_conn.close()
+        job = create_import_job(target_table, backup_table, 'backup', priority=int(data.get('priority') or 0))
+        update_job(job, kind='backup', engine='chunked')
+        submit_import_job(job, backup_thread, (job, target_table, backup_table, data.get('chunk_rows')))
         
         return jsonify({
-            'success': True, 
-            'message': f'备份成功！备份表: {backup_table}，记录数: {backup_count}',
+            'success': True,
+            'message': f'备份任务已提交，备份表: {backup_table}',
             'backup_table': backup_table,
-            'backup_count': backup_count
+            'job_id': job['job_id']
         })
         
     except Exception as e:
@@ -876,75 +5080,79 @@ def backup_data():
 
 @app.route('/restore', methods=['POST'])
 def restore_data():
-    """从备份表恢复数据"""
+    """从备份恢复数据：提交后台恢复任务，传 backup_file 时从文件备份恢复，覆盖模式默认复制到新表后原子交换"""
     try:
         data = request.get_json()
         target_table = data.get('target_table')
         backup_table = data.get('backup_table')
+        backup_file = data.get('backup_file')
         restore_mode = data.get('restore_mode', 'overwrite')  # overwrite 或 append
         
-        if not target_table or not backup_table:
+        if not target_table or not (backup_table or backup_file):
             return jsonify({'success': False, 'message': '请选择目标表和备份表'})
+        if restore_mode not in ('overwrite', 'append'):
+            return jsonify({'success': False, 'message': '恢复模式只支持 overwrite 和 append'})
         
-        # 连接目标数据库
-        target_conn = get_db_connection(TARGET_DB)
-        if not target_conn:
-            return jsonify({'success': False, 'message': '目标数据库连接失败'})
-        
-        cursor = target_conn.cursor()
-        
-        # 检查备份表是否存在
-        cursor.execute(f"SHOW TABLES LIKE '{backup_table}'")
-        if not cursor.fetchone():
-            cursor.close()
-            target_conn.close()
-            return jsonify({'success': False, 'message': f'备份表 {backup_table} 不存在'})
-        
-        # 获取备份记录数
-        cursor.execute(f"SELECT COUNT(*) FROM `{backup_table}`")
-        backup_count = cursor.fetchone()[0]
-        
-        if restore_mode == 'overwrite':
-            # 清空目标表并恢复数据
-            cursor.execute(f"TRUNCATE TABLE `{target_table}`")
-            cursor.execute(f"INSERT INTO `{target_table}` SELECT * FROM `{backup_table}`")
+        if backup_file:
+            load_backup_manifest(backup_file)
         else:
-            # 追加数据
-            cursor.execute(f"INSERT INTO `{target_table}` SELECT * FROM `{backup_table}`")
+            # 检查备份表是否存在
+            all_tables = get_cached_tables(TARGET_DB)
+            if all_tables is None:
+                return jsonify({'success': False, 'message': '目标数据库连接失败'})
+            if backup_table not in all_tables:
+                return jsonify({'success': False, 'message': f'备份表 {backup_table} 不存在'})
         
-        target_conn.commit()
-        cursor.close()
-        target_conn.close()
+        job = create_import_job(backup_file or backup_table, target_table, restore_mode,
+                                priority=int(data.get('priority') or 0))
+        update_job(job, kind='restore', engine='swap' if restore_mode == 'overwrite' else 'append')
+        submit_import_job(job, restore_thread, (job, target_table, backup_file or backup_table, restore_mode,
+                                                data.get('swap', True), data.get('keep_old'), data.get('chunk_rows'),
+                                                bool(backup_file), data.get('workers')))
         
-        return jsonify({
-            'success': True, 
-            'message': f'恢复成功！从 {backup_table} 恢复了 {backup_count} 条记录到 {target_table}',
-            'restored_count': backup_count
-        })
+        return jsonify({'success': True, 'message': '恢复任务已提交', 'job_id': job['job_id']})
         
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
 @app.route('/get_backup_tables', methods=['GET'])
 def get_backup_tables():
-    """获取备份表列表"""
+    """获取备份表和文件备份列表"""
     try:
-        target_conn = get_db_connection(TARGET_DB)
-        if not target_conn:
+        all_tables = get_cached_tables(TARGET_DB)
+        if all_tables is None:
             return jsonify({'success': False, 'message': '目标数据库连接失败'})
         
-        cursor = target_conn.cursor()
-        cursor.execute("SHOW TABLES")
-        all_tables = [table[0] for table in cursor.fetchall()]
-        
         # 过滤出备份表（包含backup关键字）
         backup_tables = [table for table in all_tables if 'backup' in table.lower()]
         
-        cursor.close()
-        target_conn.close()
+        return jsonify({'success': True, 'backup_tables': backup_tables, 'backup_files': list_file_backups()})
+        
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+@app.route('/refresh_schema', methods=['POST'])
+def refresh_schema():
+    """刷新表结构缓存"""
+    try:
+        data = request.get_json() or {}
+        db_type = data.get('db_type', 'all')  # 'source'、'target' 或 'all'
+        table_name = data.get('table')
         
-        return jsonify({'success': True, 'backup_tables': backup_tables})
+        if db_type == 'all':
+            invalidate_schema_cache()
+        else:
+            invalidate_schema_cache(SOURCE_DB if db_type == 'source' else TARGET_DB, table_name)
         
+        return jsonify({'success': True, 'message': '表结构缓存已刷新'})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+@app.route('/pool_stats', methods=['GET'])
+def pool_stats():
+    """获取连接池统计"""
+    try:
+        return jsonify({'success': True, 'pools': get_pool_stats()})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+导入性能基准测试脚本
+用法: python benchmark.py mapping
+      python benchmark.py engines   （连接 config.py 中的数据库，会写入目标表，请在测试库上运行）
+      python benchmark.py backup    （连接目标库，建立并删除临时备份表和文件备份，请在测试库上运行）
+"""
+
+import shutil
+import sys
+import time
+
+import app
+from app import (build_mapping_plan, apply_mapping_plan, create_import_job, get_import_history, get_job_snapshot,
+                 import_data_thread, backup_thread, file_backup_thread, restore_thread, get_backup_dir)
+
+def legacy_convert_rows(source_data, source_fields, target_fields, field_mapping, default_values):
+    """旧版逐行逐列转换（每个单元格都查找下标、解析默认值），仅作对照"""
+    converted_data = []
+    for row in source_data:
+        converted_row = []
+        for target_field in target_fields:
+            source_field = field_mapping.get(target_field)
+            if source_field and source_field in source_fields:
+                source_index = source_fields.index(source_field)
+                converted_row.append(row[source_index])
+            else:
+                default_value = default_values.get(target_field, '')
+                if default_value == '':
+                    converted_row.append(None)
+                elif default_value.isdigit():
+                    converted_row.append(int(default_value))
+                elif default_value.replace('.', '').isdigit():
+                    converted_row.append(float(default_value))
+                else:
+                    converted_row.append(default_value)
+        converted_data.append(converted_row)
+    return converted_data
+
+def measure(label, func, rows, repeat=3):
+    """运行多次取最快一次，输出每秒处理行数"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"  {label}: {best:.3f} 秒, {rows / best:,.0f} 行/秒")
+    return best
+
+def benchmark_mapping(column_count=100, row_count=20000):
+    """字段映射转换基准：100 列宽表，90 列来自源表、10 列使用默认值"""
+    print(f"=== 字段映射转换基准 ({column_count} 列 x {row_count} 行) ===")
+
+    source_fields = [f"col_{i}" for i in range(column_count)]
+    target_fields = [f"t_{i}" for i in range(column_count)]
+    mapped_count = column_count - column_count // 10
+    field_mapping = {target_fields[i]: source_fields[column_count - 1 - i] for i in range(mapped_count)}
+    default_values = {field: str(i) for i, field in enumerate(target_fields[mapped_count:])}
+    source_data = [tuple(range(row, row + column_count)) for row in range(row_count)]
+
+    before = measure('旧实现 (逐行 index + 解析默认值)',
+                     lambda: legacy_convert_rows(source_data, source_fields, target_fields, field_mapping, default_values),
+                     row_count)
+
+    plan = build_mapping_plan(source_fields, target_fields, field_mapping, default_values)
+    after = measure('转换计划 (itemgetter)', lambda: apply_mapping_plan(plan, source_data), row_count)
+
+    # 两种实现的结果必须一致
+    legacy = legacy_convert_rows(source_data[:100], source_fields, target_fields, field_mapping, default_values)
+    assert [tuple(row) for row in legacy] == apply_mapping_plan(plan, source_data[:100])
+
+    print(f"  加速比: {before / after:.1f}x")
+
+def benchmark_engines(engines=('paged', 'parallel', 'pipeline', 'async', 'server')):
+    """导入引擎基准：取导入历史中最近一次成功导入的表和字段映射，用各引擎以覆盖模式重新导入
+    
+    server 为同服务器 INSERT ... SELECT 复制，其他引擎关闭同服务器复制以便对比。
+    目标表中只使用默认值（未映射）的字段会被重置为表定义的默认值。
+    """
+    print("=== 导入引擎基准 ===")
+    entry = next((item for item in get_import_history()
+                  if item.get('status') == '成功' and item.get('field_mapping')), None)
+    if not entry:
+        print("  导入历史中没有成功的导入记录，请先完成一次导入")
+        return
+    if app.aiomysql is None:
+        print("  未安装 aiomysql，async 引擎会改用 parallel")
+    
+    source_table, target_table = entry['source_table'], entry['target_table']
+    print(f"  {source_table} -> {target_table}，覆盖模式")
+    results = {}
+    for engine in engines:
+        options = {'server_copy': True} if engine == 'server' else {'engine': engine, 'server_copy': False}
+        job = create_import_job(source_table, target_table, 'overwrite', options)
+        import_data_thread(source_table, target_table, entry['field_mapping'], {}, 'overwrite', None, options, job)
+        snapshot = get_job_snapshot(job)
+        if snapshot['status'] != 'success':
+            print(f"  {engine}: 失败 - {snapshot['message']}")
+            continue
+        if snapshot['engine'] != engine:
+            print(f"  {engine}: 条件不满足，实际使用 {snapshot['engine']}")
+            continue
+        results[engine] = snapshot['elapsed']
+        print(f"  {engine}: {snapshot['elapsed']:.3f} 秒, {snapshot['rows_per_sec']:,.0f} 行/秒")
+    
+    if 'parallel' in results and 'async' in results:
+        print(f"  async 相对 parallel: {results['parallel'] / results['async']:.1f}x")
+
+def benchmark_backup(workers=4):
+    """备份基准：对导入历史中最近一次成功导入的目标表，比较 CREATE TABLE AS SELECT、
+    分块备份表、并行导出文件备份和并行加载文件备份的吞吐，临时表和文件用后删除
+    """
+    print("=== 备份基准 ===")
+    entry = next((item for item in get_import_history() if item.get('status') == '成功'), None)
+    if not entry:
+        print("  导入历史中没有成功的导入记录，请先完成一次导入")
+        return
+    
+    table = entry['target_table']
+    ctas_table, chunked_table, restore_table = (f"{table[:40]}_bench_{name}" for name in ('ctas', 'chunked', 'restore'))
+    backup_name = f"{table}_bench_file"
+    connection = app.get_db_connection(app.TARGET_DB)
+    if not connection:
+        print("  目标数据库连接失败")
+        return
+    cursor = connection.cursor()
+    cursor.execute(f"SELECT COUNT(*) FROM `{table}`")
+    rows = cursor.fetchone()[0]
+    print(f"  {table}，{rows} 条记录，文件备份使用 {workers} 个并行线程")
+    
+    def drop_tables():
+        for name in (ctas_table, chunked_table, restore_table):
+            cursor.execute(f"DROP TABLE IF EXISTS `{name}`")
+        shutil.rmtree(get_backup_dir(backup_name), ignore_errors=True)
+    
+    def run_job(label, target, args, source_table, target_table):
+        job = create_import_job(source_table, target_table, 'backup')
+        target(job, *args)
+        snapshot = get_job_snapshot(job)
+        if snapshot['status'] != 'success':
+            print(f"  {label}: 失败 - {snapshot['message']}")
+            return None
+        print(f"  {label}: {snapshot['elapsed']:.3f} 秒, {rows / max(snapshot['elapsed'], 1e-9):,.0f} 行/秒")
+        return snapshot['elapsed']
+    
+    try:
+        drop_tables()
+        start = time.perf_counter()
+        cursor.execute(f"CREATE TABLE `{ctas_table}` AS SELECT * FROM `{table}`")
+        ctas = time.perf_counter() - start
+        print(f"  CREATE TABLE AS SELECT: {ctas:.3f} 秒, {rows / max(ctas, 1e-9):,.0f} 行/秒")
+        
+        run_job('分块备份表 (CREATE TABLE LIKE + 分块 INSERT ... SELECT)', backup_thread, (table, chunked_table),
+                table, chunked_table)
+        elapsed = run_job('文件备份 (并行导出 gzip TSV)', file_backup_thread, (table, backup_name, None, workers),
+                          table, backup_name)
+        if elapsed:
+            manifest = app.load_backup_manifest(backup_name)
+            file_bytes = sum(chunk['file_bytes'] for chunk in manifest['chunks'])
+            raw_bytes = sum(chunk['bytes'] for chunk in manifest['chunks'])
+            print(f"    文件大小 {file_bytes:,} 字节，压缩比 {raw_bytes / max(file_bytes, 1):.1f}x，"
+                  f"相对 CREATE TABLE AS SELECT: {ctas / elapsed:.2f}x")
+            cursor.execute(f"CREATE TABLE `{restore_table}` LIKE `{table}`")
+            run_job('文件恢复 (并行 LOAD DATA)', restore_thread,
+                    (restore_table, backup_name, 'append', True, None, None, True, workers), backup_name, restore_table)
+    finally:
+        drop_tables()
+        cursor.close()
+        connection.close()
+        app.invalidate_schema_cache(app.TARGET_DB)
+
+BENCHMARKS = {
+    'mapping': benchmark_mapping,
+    'engines': benchmark_engines,
+    'backup': benchmark_backup
+}
+
+def main():
+    # engines 和 backup 会写入数据库，只在显式指定时运行
+    names = sys.argv[1:] or [name for name in BENCHMARKS if name not in ('engines', 'backup')]
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"未知的基准测试: {name}，可选: {', '.join(BENCHMARKS)}")
+            continue
+        BENCHMARKS[name]()
+
+if __name__ == "__main__":
+    main()
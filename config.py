@@ -26,9 +26,80 @@ TARGET_DB = {
 
 # 分页导入设置
 PAGE_SIZE = 500  # 每页导入的记录数（增加到500以提高效率）
+# 自适应页面大小：分页导入（键集分页）时按每页读取+写入的实测吞吐自动调整每页记录数，PAGE_SIZE 为初始值
+ADAPTIVE_PAGE_SIZE = True
+PAGE_SIZE_MIN = 100  # 自适应调整的下限
+PAGE_SIZE_MAX = 10000  # 自适应调整的上限
+
+# 流式导入设置
+STREAM_BUFFER_ROWS = 5000  # 流式导入时内存中最多保留的在途记录数
+
+# 并行导入设置
+PARALLEL_WORKERS = 4  # 并行导入默认线程数（每个线程使用独立的源库/目标库连接）
+
+# 流水线导入设置
+PIPELINE_QUEUE_PAGES = 4  # 读取线程最多预读的页数（队列满时暂停读取，等待写入线程）
+PIPELINE_WRITERS = 2  # 流水线导入默认写入线程数（每个线程使用独立的目标库连接）
+
+# 异步导入设置（需要 pip install aiomysql）
+ASYNC_CONCURRENCY = 16  # 异步导入同时处理的键区间数（源库、目标库各最多使用这么多连接，只占用一个线程）
+
+# 多行INSERT写入设置
+MULTI_ROW_MAX_BYTES = 4 * 1024 * 1024  # 单条多行INSERT语句的字节上限（同时受目标库 max_allowed_packet 限制）
+
+# 提交策略设置（导入任务可单独指定）
+COMMIT_POLICY = 'page'  # page 每批提交 / rows 每 COMMIT_ROWS 条提交 / seconds 每 COMMIT_SECONDS 秒提交 / chunk 每个键区间提交（仅并行导入）
+COMMIT_ROWS = 10000  # rows 策略下每次提交的记录数
+COMMIT_SECONDS = 5  # seconds 策略下每次提交的间隔秒数
+BULK_SESSION = False  # 批量加载会话：写入连接关闭 unique_checks、foreign_key_checks，有权限时关闭 sql_log_bin（导入结束后恢复）
+
+# 失败隔离设置：单条记录导致整批写入失败时，二分定位失败记录并隔离，其余记录照常写入
+ISOLATE_ERRORS = False  # 默认是否开启（导入任务可单独指定）
+QUARANTINE_DIR = 'logs/quarantine'  # 隔离记录文件目录（每个任务一个 <任务ID>.jsonl）
+QUARANTINE_MAX_ROWS = 1000  # 单个任务最多隔离的记录数，超过时停止导入
+
+# LOAD DATA 批量加载设置（目标库需开启 local_infile）
+LOAD_DATA_DIR = 'logs/load_data'  # LOAD DATA 临时数据文件/命名管道所在目录
+
+# 同服务器复制设置：源库和目标库在同一 MySQL 实例上时，按主键分块执行 INSERT ... SELECT，数据不经过本程序
+SERVER_COPY = True  # 自动检测并使用同服务器复制（导入任务可单独关闭）
+SERVER_COPY_CHUNK_ROWS = 10000  # 每条 INSERT ... SELECT 复制的记录数（每块提交一次）
+
+# 连接池设置（每组数据库配置一个连接池，导入线程与页面接口共用）
+POOL_SIZE = 20  # 每个连接池最多建立的连接数
+POOL_TIMEOUT = 30  # 连接池耗尽时等待空闲连接的秒数
+
+# 表结构缓存设置
+SCHEMA_CACHE_TTL = 300  # 表列表和字段信息缓存的有效秒数
+
+# 任务调度设置（导入任务排队执行，按数据库限制并发）
+MAX_CONCURRENT_JOBS = 4  # 同时运行的导入任务数（调度线程数）
+MAX_JOBS_PER_SOURCE = 4  # 同一源数据库同时运行的任务数
+MAX_JOBS_PER_TARGET = 2  # 同一目标数据库同时运行的任务数
+
+# 断点续传设置
+CHECKPOINT_DIR = 'logs/checkpoints'  # 导入任务检查点文件目录（每批提交后记录进度，失败后可从断点继续）
+
+# binlog 复制设置（需要 pip install mysql-replication，源库 binlog_format=ROW、binlog_row_image=FULL）
+REPLICATION_SERVER_ID = 1001  # 读取 binlog 时使用的 server_id，不能与复制拓扑中其他实例重复
+REPLICATION_BATCH_ROWS = 1000  # 累积多少条变更后写入一次目标库
+REPLICATION_FLUSH_SECONDS = 1  # 变更不足一批时最长等待的秒数（同时作为心跳间隔）
+
+# 数据校验设置
+VERIFY_CHUNK_ROWS = 10000  # 每个校验块的行数，只有校验和不一致的块才逐行比对
+VERIFY_MAX_KEYS = 100  # 每类差异（缺少、多出、不一致）最多列出的键数
+
+# 备份与恢复设置
+BACKUP_CHUNK_ROWS = 10000  # 备份和恢复时每条 INSERT ... SELECT 复制的记录数（每块提交一次）
+RESTORE_KEEP_OLD = False  # 覆盖恢复交换表后是否保留原表（改名为 <表名>_old_<时间>），默认删除
+BACKUP_DIR = 'backups'  # 文件备份目录，每个备份一个子目录（manifest.json 和按键区间切分的 .tsv.gz 数据块）
+BACKUP_WORKERS = 4  # 文件备份并行导出、恢复时并行加载的线程数
+BACKUP_GZIP_LEVEL = 1  # 文件备份数据块的 gzip 压缩级别（1 最快，9 压缩率最高）
 
 # 日志文件配置
 LOG_FILE = 'logs/import.log'
+LOG_CHUNK_BYTES = 256 * 1024  # 增量读取日志时单次返回的最大字节数
+JOB_LOG_DIR = 'logs/jobs'  # 每个导入任务单独的日志文件目录
 
 # Flask配置
 DEBUG = True
@@ -37,5 +108,7 @@ SECRET_KEY = 'your-secret-key-here'
 # 导入模式
 IMPORT_MODES = {
     'overwrite': '覆盖模式 (REPLACE INTO)',
-    'insert': '仅新增模式 (INSERT IGNORE)'
+    'insert': '仅新增模式 (INSERT IGNORE)',
+    'load_overwrite': '批量覆盖模式 (LOAD DATA ... REPLACE)',
+    'load_insert': '批量新增模式 (LOAD DATA ... IGNORE)'
 }
@@ -7,6 +7,11 @@ class DatabaseImporter {
         this.fieldMapping = {};
         this.defaultValues = {};
         this.logInterval = null;
+        this.logSource = null;
+        this.logOffset = 0;
+        this.logText = '';
+        this.jobId = null;
+        this.jobInterval = null;
         this.init();
     }
 
@@ -267,9 +272,11 @@ class DatabaseImporter {
 
             if (response.data.success) {
                 this.hideLoading();
-                this.showSuccess('导入任务已启动');
+                this.showSuccess('导入任务已提交');
+                this.jobId = response.data.job_id;
                 this.startLogPolling();
                 this.showProgressCard();
+                this.startJobPolling();
             } else {
                 this.hideLoading();
                 this.showError(response.data.message);
@@ -299,15 +306,31 @@ class DatabaseImporter {
     }
 
     startLogPolling() {
-        // 清除之前的轮询
-        if (this.logInterval) {
-            clearInterval(this.logInterval);
+        // 清除之前的轮询或推送连接
+        this.stopLogPolling();
+        this.logOffset = 0;
+        this.logText = '';
+
+        // 优先使用 Server-Sent Events 推送新日志，不支持时退回增量轮询
+        if (window.EventSource) {
+            this.logSource = new EventSource(`/log_stream?job_id=${this.jobId}&offset=${this.logOffset}`);
+            this.logSource.onmessage = (event) => {
+                this.appendLog(JSON.parse(event.data));
+            };
+            // 任务结束且日志推送完毕，关闭连接，避免浏览器自动重连
+            this.logSource.addEventListener('end', () => {
+                if (this.logSource) {
+                    this.logSource.close();
+                    this.logSource = null;
+                }
+            });
+            return;
         }
 
         // 立即获取一次日志
         this.refreshLog();
 
-        // 每秒轮询日志
+        // 每秒轮询一次增量日志
         this.logInterval = setInterval(() => {
             this.refreshLog();
         }, 1000);
@@ -318,54 +341,114 @@ class DatabaseImporter {
             clearInterval(this.logInterval);
             this.logInterval = null;
         }
+        if (this.logSource) {
+            this.logSource.close();
+            this.logSource = null;
+        }
     }
 
     async refreshLog() {
+        // 返回本次是否读到新日志
         try {
-            const response = await axios.get('/get_log');
+            // 只获取上次偏移之后的新日志
+            const response = await axios.get('/get_log', { params: { offset: this.logOffset, job_id: this.jobId } });
             if (response.data.success) {
-                const logContainer = document.getElementById('logContainer');
-                if (response.data.log) {
-                    logContainer.innerHTML = `<pre class="log-content">${response.data.log}</pre>`;
-                    // 滚动到底部
-                    logContainer.scrollTop = logContainer.scrollHeight;
-                    
-                    // 解析进度信息
-                    this.parseProgressFromLog(response.data.log);
-                    
-                    // 检查是否导入完成
-                    if (response.data.log.includes('数据导入完成！')) {
-                        this.stopLogPolling();
-                        this.updateProgress(100, '导入完成');
-                    }
-                } else {
-                    logContainer.innerHTML = '<div class="text-muted text-center py-3"><i class="fas fa-info-circle"></i> 等待导入任务开始...</div>';
-                }
+                this.appendLog(response.data);
+                return Boolean(response.data.log || response.data.reset);
             }
         } catch (error) {
             console.error('获取日志失败:', error);
         }
+        return false;
     }
 
-    parseProgressFromLog(logContent) {
-        // 解析进度百分比
-        const progressMatch = logContent.match(/进度: (\d+)%/);
-        if (progressMatch) {
-            const percent = parseInt(progressMatch[1]);
-            this.updateProgress(percent, `导入中... ${percent}%`);
+    async drainLog() {
+        // 任务已结束：停止定时轮询，连续读取剩余日志，直到一次请求没有新内容
+        if (this.logInterval) {
+            clearInterval(this.logInterval);
+            this.logInterval = null;
         }
-        
-        // 解析记录数信息
-        const recordMatch = logContent.match(/累计导入 (\d+)\/(\d+) 条/);
-        if (recordMatch) {
-            const imported = parseInt(recordMatch[1]);
-            const total = parseInt(recordMatch[2]);
-            const percent = Math.round((imported / total) * 100);
-            this.updateProgress(percent, `已导入 ${imported}/${total} 条记录`);
+        while (await this.refreshLog()) {
+            // 单次最多返回 LOG_CHUNK_BYTES，剩余日志较多时分多次读取
+        }
+    }
+
+    appendLog(chunk) {
+        if (chunk.reset) {
+            this.logText = '';
+        }
+        this.logOffset = chunk.offset;
+        this.logText += chunk.log;
+
+        const logContainer = document.getElementById('logContainer');
+        if (!this.logText) {
+            logContainer.innerHTML = '<div class="text-muted text-center py-3"><i class="fas fa-info-circle"></i> 等待导入任务开始...</div>';
+            return;
+        }
+        if (!chunk.log && !chunk.reset) {
+            return;
+        }
+
+        let pre = logContainer.querySelector('pre.log-content');
+        if (!pre) {
+            logContainer.innerHTML = '<pre class="log-content"></pre>';
+            pre = logContainer.querySelector('pre.log-content');
+        }
+        pre.textContent = this.logText;
+        // 滚动到底部
+        logContainer.scrollTop = logContainer.scrollHeight;
+    }
+
+    startJobPolling() {
+        // 进度取自任务进度接口，每次只返回一个小对象，与任务长短无关
+        if (this.jobInterval) {
+            clearInterval(this.jobInterval);
+        }
+        this.jobInterval = setInterval(() => {
+            this.refreshJobProgress();
+        }, 1000);
+    }
+
+    async refreshJobProgress() {
+        if (!this.jobId) {
+            return;
+        }
+        try {
+            const response = await axios.get(`/jobs/${this.jobId}`);
+            if (!response.data.success) {
+                return;
+            }
+            const job = response.data.job;
+
+            let text = `已导入 ${job.rows_written}/${job.total_records} 条记录，${job.rows_per_sec} 条/秒`;
+            if (job.eta_seconds !== null) {
+                text += `，预计剩余 ${Math.ceil(job.eta_seconds)} 秒`;
+            }
+            if (job.status === 'pending') {
+                text = '任务排队中...';
+            } else if (job.status === 'success') {
+                text = `导入完成，共 ${job.rows_written} 条记录`;
+            } else if (job.status === 'failed') {
+                text = '导入失败: ' + job.message;
+            }
+            this.updateProgress(job.percent, text);
+
+            // 任务结束后停止进度轮询；日志推送由服务端推送完剩余日志后的 end 事件关闭，
+            // 增量轮询则继续读取，直到一次请求没有新内容为止
+            if (job.status === 'success' || job.status === 'failed') {
+                clearInterval(this.jobInterval);
+                this.jobInterval = null;
+                if (!this.logSource) {
+                    await this.drainLog();
+                }
+            }
+        } catch (error) {
+            console.error('获取任务进度失败:', error);
         }
     }
 
     clearLog() {
+        this.logText = '';
         document.getElementById('logContainer').innerHTML = 
             '<div class="text-muted text-center py-3"><i class="fas fa-info-circle"></i> 等待导入任务开始...</div>';
     }
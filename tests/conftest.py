@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""单元测试公共设置：从项目根目录导入 app，日志写入临时目录"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def work_dir(tmp_path, monkeypatch):
+    """在临时目录中运行，LOG_FILE 等相对路径不写入项目目录"""
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('logs', exist_ok=True)
+    return tmp_path
+
+
+class FakeCursor:
+    """按顺序返回预设查询结果的游标，记录执行过的语句和参数"""
+
+    def __init__(self, results):
+        self.results = list(results)
+        self.executed = []
+
+    def execute(self, sql, params=None):
+        self.executed.append((sql, params))
+
+    def fetchone(self):
+        return self.results.pop(0) if self.results else None
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """只提供 cursor() 的连接，所有游标共用同一组预设结果"""
+
+    def __init__(self, results):
+        self.cursor_obj = FakeCursor(results)
+
+    def cursor(self):
+        return self.cursor_obj
+
+
+@pytest.fixture
+def fake_connection():
+    """按预设查询结果构造假连接: fake_connection([(1, 100), ...])"""
+    return FakeConnection
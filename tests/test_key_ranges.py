@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""并行导入的键区间切分"""
+
+import app
+
+
+def test_build_key_ranges():
+    assert app.build_key_ranges([]) == [(None, None)]
+    assert app.build_key_ranges([(10,), (20,)]) == [(None, (10,)), ((10,), (20,)), ((20,), None)]
+
+
+def test_split_key_ranges_single_chunk_does_not_query(fake_connection):
+    connection = fake_connection([])
+    assert app.split_key_ranges(connection, 't', ['id'], 1000, 1) == [(None, None)]
+    assert app.split_key_ranges(connection, 't', ['id'], 0, 4) == [(None, None)]
+    assert connection.cursor_obj.executed == []
+
+
+def test_split_key_ranges_integer_key(fake_connection):
+    connection = fake_connection([(1, 100)])
+    ranges = app.split_key_ranges(connection, 't', ['id'], 100, 4)
+    assert ranges == [(None, (25,)), ((25,), (50,)), ((50,), (75,)), ((75,), None)]
+    # 相邻区间首尾相接：上一区间的上界是下一区间的下界
+    assert all(ranges[i][1] == ranges[i + 1][0] for i in range(len(ranges) - 1))
+
+
+def test_split_key_ranges_small_integer_range(fake_connection):
+    # 键值范围比区间数小时不产生空区间
+    connection = fake_connection([(1, 2)])
+    assert app.split_key_ranges(connection, 't', ['id'], 2, 8) == [(None, (1,)), ((1,), None)]
+
+
+def test_split_key_ranges_samples_non_integer_key(fake_connection):
+    connection = fake_connection([('a', 'j'), ('d',), ('h',)])
+    ranges = app.split_key_ranges(connection, 't', ['code'], 10, 3)
+    assert ranges == [(None, ('d',)), (('d',), ('h',)), (('h',), None)]
+    # 第二次采样从上一个边界之后跳过 step 行
+    sql, params = connection.cursor_obj.executed[-1]
+    assert '`code` > %s' in sql and 'OFFSET 3' in sql
+    assert params == ('d',)
+
+
+def test_split_key_ranges_composite_key(fake_connection):
+    connection = fake_connection([('a', 1)])
+    ranges = app.split_key_ranges(connection, 't', ['code', 'seq'], 4, 2)
+    assert ranges == [(None, ('a', 1)), (('a', 1), None)]
+    sql, params = connection.cursor_obj.executed[0]
+    assert 'ORDER BY `code`, `seq` LIMIT 1 OFFSET 1' in sql
+    assert params is None
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""LOAD DATA 文本格式：NULL、转义字符、二进制和时间类型的序列化"""
+
+from datetime import timedelta
+
+import pytest
+
+import app
+
+
+@pytest.mark.parametrize('value, expected', [
+    (None, b'\\N'),
+    ('plain', b'plain'),
+    ('a\tb\nc\\d\re\x00f', b'a\\tb\\nc\\\\d\\re\\0f'),
+    ('\\N', b'\\\\N'),  # 字面量 \N 不能被当作 NULL
+    ('汉字', '汉字'.encode('utf-8')),
+    (b'\t\x00', b'\\t\\0'),
+    (True, b'1'),
+    (False, b'0'),
+    (0, b'0'),
+    (1.5, b'1.5'),
+    (timedelta(hours=25, minutes=1, seconds=2), b'25:01:02'),
+    (timedelta(seconds=-61), b'-00:01:01'),
+    ({'b', 'a'}, b'a,b'),
+])
+def test_format_load_data_value(value, expected):
+    assert app.format_load_data_value(value) == expected
+
+
+def test_format_load_data_value_as_hex():
+    assert app.format_load_data_value(b'\x00\xff\t', as_hex=True) == b'00ff09'
+    assert app.format_load_data_value('汉', as_hex=True) == '汉'.encode('utf-8').hex().encode('ascii')
+    assert app.format_load_data_value(None, as_hex=True) == b'\\N'
+
+
+def test_iter_load_data_lines():
+    lines = list(app.iter_load_data_lines([(1, 'a\tb', None), (2, b'\x01', 'x\ny')], {1}))
+    assert lines == [b'1\t' + b'a\tb'.hex().encode('ascii') + b'\t\\N\n', b'2\t01\tx\\ny\n']
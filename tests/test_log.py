@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""按字节偏移增量读取日志：只返回完整的行，偏移始终停在行首"""
+
+import app
+
+
+def write_bytes(path, text):
+    with open(path, 'wb') as f:
+        f.write(text.encode('utf-8'))
+
+
+def test_read_log_since_returns_complete_lines(tmp_path):
+    log_file = str(tmp_path / 'import.log')
+    write_bytes(log_file, '第一行\n第二行\n写入中')
+    chunk = app.read_log_since(0, log_file=log_file)
+    assert chunk == {'log': '第一行\n第二行\n', 'offset': len('第一行\n第二行\n'.encode('utf-8')), 'reset': False}
+    # 半行不返回，偏移不前进
+    assert app.read_log_since(chunk['offset'], log_file=log_file)['offset'] == chunk['offset']
+
+
+def test_read_log_since_line_longer_than_max_bytes(tmp_path):
+    log_file = str(tmp_path / 'import.log')
+    long_line = '汉字' * 100 + '\n'
+    write_bytes(log_file, long_line + 'ok\n')
+    chunk = app.read_log_since(0, max_bytes=7, log_file=log_file)
+    # 超长的行完整返回，不会截断多字节字符
+    assert chunk['log'] == long_line
+    assert chunk['offset'] == len(long_line.encode('utf-8'))
+    assert app.read_log_since(chunk['offset'], max_bytes=7, log_file=log_file)['log'] == 'ok\n'
+
+
+def test_read_log_since_unfinished_long_line(tmp_path):
+    log_file = str(tmp_path / 'import.log')
+    write_bytes(log_file, '汉' * 50)
+    assert app.read_log_since(0, max_bytes=8, log_file=log_file) == {'log': '', 'offset': 0, 'reset': False}
+
+
+def test_read_log_since_reset_and_missing_file(tmp_path):
+    log_file = str(tmp_path / 'import.log')
+    assert app.read_log_since(10, log_file=log_file) == {'log': '', 'offset': 0, 'reset': True}
+    write_bytes(log_file, 'new\n')
+    assert app.read_log_since(100, log_file=log_file) == {'log': 'new\n', 'offset': 4, 'reset': True}
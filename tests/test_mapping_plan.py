@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""字段映射转换计划：结果必须与旧版逐行逐列转换完全一致"""
+
+import pytest
+
+import app
+
+
+def legacy_convert_rows(source_data, source_fields, target_fields, field_mapping, default_values):
+    """旧版逐行逐列转换（每个单元格都查找下标、解析默认值），作为对照"""
+    converted_data = []
+    for row in source_data:
+        converted_row = []
+        for target_field in target_fields:
+            source_field = field_mapping.get(target_field)
+            if source_field and source_field in source_fields:
+                converted_row.append(row[source_fields.index(source_field)])
+            else:
+                default_value = default_values.get(target_field, '')
+                if default_value == '':
+                    converted_row.append(None)
+                elif default_value.isdigit():
+                    converted_row.append(int(default_value))
+                elif default_value.replace('.', '').isdigit():
+                    converted_row.append(float(default_value))
+                else:
+                    converted_row.append(default_value)
+        converted_data.append(converted_row)
+    return converted_data
+
+
+@pytest.mark.parametrize('target_fields, field_mapping, default_values', [
+    # 重新排列、部分字段使用默认值（空字符串、整数、小数、文本）
+    (['t1', 't2', 't3', 't4', 't5', 't6'],
+     {'t1': 'c', 't2': 'a', 't3': 'missing'},
+     {'t3': '', 't4': '12', 't5': '1.5', 't6': 'abc'}),
+    # 全部来自源表
+    (['t1', 't2', 't3'], {'t1': 'b', 't2': 'c', 't3': 'a'}, {}),
+    # 单个字段（itemgetter 返回标量的情况）
+    (['t1'], {'t1': 'b'}, {}),
+    (['t1'], {}, {'t1': '7'}),
+    # 同一源字段映射到多个目标字段
+    (['t1', 't2'], {'t1': 'a', 't2': 'a'}, {}),
+])
+def test_mapping_plan_matches_legacy_conversion(target_fields, field_mapping, default_values):
+    source_fields = ['a', 'b', 'c']
+    source_data = [(1, 'x', None), (2, '汉字', 3.5), [3, '', b'\x00']]
+    plan = app.build_mapping_plan(source_fields, target_fields, field_mapping, default_values)
+
+    legacy = legacy_convert_rows(source_data, source_fields, target_fields, field_mapping, default_values)
+    assert app.apply_mapping_plan(plan, source_data) == [tuple(row) for row in legacy]
+
+
+def test_mapping_plan_converts_default_values_once():
+    plan = app.build_mapping_plan(['a'], ['t1', 't2', 't3', 't4'], {'t1': 'a'}, {'t2': '', 't3': '42', 't4': '0.25'})
+    assert plan['constants'] == (None, 42, 0.25)
+    assert plan['indexes'] == [0, 1, 2, 3]
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""自适应页面大小：吞吐提升时放大，延迟突增时减半，吞吐下降时回到最佳大小"""
+
+import app
+
+
+def test_page_size_controller_clamps_initial_size():
+    assert app.new_page_size_controller(1)['size'] == app.PAGE_SIZE_MIN
+    assert app.new_page_size_controller(10 ** 9)['size'] == app.PAGE_SIZE_MAX
+
+
+def test_observe_page_grows_while_throughput_improves():
+    controller = app.new_page_size_controller(1000)
+    app.observe_page(controller, 1000, 1.0)
+    assert controller['size'] == 1500
+    app.observe_page(controller, 1500, 1.0)
+    assert controller['size'] == 2250
+    # 吞吐没有明显提升时保持不变
+    app.observe_page(controller, 2250, 1.5)
+    assert controller['size'] == 2250
+
+
+def test_observe_page_ignores_partial_pages():
+    controller = app.new_page_size_controller(1000)
+    app.observe_page(controller, 999, 0.01)
+    app.observe_page(controller, 1000, 0)
+    assert controller['size'] == 1000
+    assert controller['seconds_per_row'] is None
+
+
+def test_observe_page_halves_on_latency_spike():
+    controller = app.new_page_size_controller(1000)
+    app.observe_page(controller, 1000, 1.0)
+    app.observe_page(controller, 1500, 1.5)
+    app.observe_page(controller, 1500, 15.0)
+    assert controller['size'] == 750
+    assert controller['best_size'] == 750
+    # 减小后保持若干页不放大
+    for _ in range(app.PAGE_SIZE_HOLD_PAGES):
+        app.observe_page(controller, 750, 0.01)
+        assert controller['size'] == 750
+    app.observe_page(controller, 750, 0.005)
+    assert controller['size'] == 1125
+
+
+def test_observe_page_returns_to_best_size_when_throughput_drops():
+    controller = app.new_page_size_controller(1000)
+    app.observe_page(controller, 1000, 1.0)
+    assert controller['size'] == 1500
+    app.observe_page(controller, 1500, 2.0)
+    assert controller['size'] == 1000
+
+
+def test_observe_page_stays_within_limits():
+    controller = app.new_page_size_controller(app.PAGE_SIZE_MAX)
+    app.observe_page(controller, app.PAGE_SIZE_MAX, 0.1)
+    assert controller['size'] == app.PAGE_SIZE_MAX
+    controller = app.new_page_size_controller(app.PAGE_SIZE_MIN)
+    app.observe_page(controller, app.PAGE_SIZE_MIN, 1.0)
+    app.observe_page(controller, controller['size'], 100.0)
+    assert controller['size'] >= app.PAGE_SIZE_MIN
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""写入错误分类：只有连接断开、超时、锁冲突等错误才重试"""
+
+import mysql.connector
+import pytest
+from mysql.connector import Error
+
+import app
+
+
+@pytest.mark.parametrize('error, transient', [
+    (Error(msg='Lost connection to MySQL server during query', errno=2013), True),
+    (Error(msg='Deadlock found when trying to get lock', errno=1213), True),
+    (Error(msg='Lock wait timeout exceeded', errno=1205), True),
+    (Error(msg='Client was disconnected by the server because of inactivity', errno=4031), True),
+    (Error(msg="Duplicate entry '1' for key 'PRIMARY'", errno=1062), False),
+    (Error(msg="Data too long for column 'name'", errno=1406), False),
+    (Error(msg='Failed processing format-parameters'), False),  # 连接器自身错误没有错误码，errno 为 -1
+    (mysql.connector.InterfaceError(msg='Python type set cannot be converted'), False),
+    (mysql.connector.InterfaceError(msg='2013: Lost connection', errno=2013), True),
+    (Exception(2006, 'MySQL server has gone away'), True),  # aiomysql 的错误码在 args[0]
+    (Exception(1062, 'Duplicate entry'), False),
+])
+def test_is_transient_error(error, transient):
+    assert app.is_transient_error(error) is transient
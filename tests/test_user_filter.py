@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""用户过滤条件：字段和运算符白名单校验，值全部作为参数传递，并作用于键区间切分"""
+
+import pytest
+from mysql.connector import Error
+
+import app
+
+
+def test_build_user_filter():
+    conditions = [
+        {'column': 'status', 'op': '=', 'value': 'active'},
+        {'column': 'id', 'op': 'between', 'value': [1, 100]},
+        {'column': 'type', 'op': 'in', 'value': ['a', 'b']},
+        {'column': 'deleted_at', 'op': 'is null'},
+        {'column': 'name', 'value': 'x'},
+    ]
+    result = app.build_user_filter(conditions, ['id', 'status', 'type', 'deleted_at', 'name'])
+    assert result['sql'] == ("`status` = %s AND `id` BETWEEN %s AND %s AND `type` IN (%s, %s) "
+                             "AND `deleted_at` IS NULL AND `name` = %s")
+    assert result['params'] == ['active', 1, 100, 'a', 'b', 'x']
+
+
+def test_build_user_filter_empty():
+    assert app.build_user_filter(None, ['id']) is None
+    assert app.build_user_filter([], ['id']) is None
+
+
+@pytest.mark.parametrize('conditions', [
+    {'column': 'id'},
+    ['id = 1'],
+    [{'column': 'missing', 'op': '=', 'value': 1}],
+    [{'column': 'id', 'op': '; DROP TABLE t', 'value': 1}],
+    [{'column': 'id', 'op': 'IN', 'value': []}],
+    [{'column': 'id', 'op': 'IN', 'value': 1}],
+    [{'column': 'id', 'op': 'BETWEEN', 'value': [1]}],
+    [{'column': 'id', 'op': '=', 'value': None}],
+    [{'column': 'id', 'op': '>', 'value': [1, 2]}],
+])
+def test_build_user_filter_rejects_invalid_conditions(conditions):
+    with pytest.raises(Error):
+        app.build_user_filter(conditions, ['id'])
+
+
+def test_split_key_ranges_applies_source_filter(fake_connection):
+    source_filter = app.build_user_filter([{'column': 'status', 'op': '=', 'value': 'active'}], ['status'])
+    connection = fake_connection([('a', 1)])
+    ranges = app.split_key_ranges(connection, 't', ['code', 'seq'], 4, 2, source_filter)
+    assert ranges == [(None, ('a', 1)), (('a', 1), None)]
+    sql, params = connection.cursor_obj.executed[0]
+    assert 'WHERE (`status` = %s)' in sql
+    assert params == ('active',)